@@ -0,0 +1,186 @@
+"""
+================================================================================
+Office Optimizer Pro - End-to-End Compression Benchmark
+================================================================================
+CREATED BY: SHILEZI (https://github.com/shilezi)
+================================================================================
+
+Runs OfficeCompressor.compress() over the synthetic corpus (benchmarks/corpus.py)
+or over given documents and reports, per case: median wall time, throughput,
+compression ratio, the engine's per-stage times and peak memory. Every case
+runs in a fresh interpreter, so import cost, worker start-up and peak RSS are
+measured the same way for each one.
+
+Results can be saved as a baseline and later runs compared against it: a case
+whose median wall time or peak memory grows by more than --threshold (15% by
+default), or whose output grows, counts as a regression. Baselines are
+machine-specific; record one per machine rather than sharing them.
+
+Usage:
+    python benchmarks/bench_compress.py [--runs 3] [--profile NAME] [--workers N]
+                                        [--output results.json] [--save-baseline FILE]
+                                        [--baseline FILE] [--threshold 0.15] [doc.pptx ...]
+
+Exits with status 1 when a case fails or regresses against --baseline.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+DEFAULT_PROFILE = "Balanced (Recommended)"
+
+
+def run_case(path, runs, profile, workers, video):
+    """Compress path runs times in this process; the worker side of a case"""
+    from office_optimizer_core import CONFIG, OfficeCompressor, _peak_rss
+    
+    preset = CONFIG["presets"][profile]
+    engine = OfficeCompressor(quality=preset["quality"], max_width=preset["max_width"],
+                              target_dpi=preset.get("target_dpi"), compress_video=video,
+                              enable_backup=False, workers=workers)
+    original_size = os.path.getsize(path)
+    timings = []
+    output_size = None
+    out_dir = tempfile.mkdtemp()
+    try:
+        for run in range(runs):
+            out_path = os.path.join(out_dir, f"run{run}{os.path.splitext(path)[1]}")
+            start = time.perf_counter()
+            if not engine.compress(path, out_path):
+                return {"error": "compress() failed"}
+            timings.append(time.perf_counter() - start)
+            output_size = os.path.getsize(out_path)
+            os.remove(out_path)
+    finally:
+        engine.close()
+        os.rmdir(out_dir)
+    
+    wall = statistics.median(timings)
+    peak_rss = _peak_rss()
+    return {
+        "runs": runs,
+        "original_bytes": original_size,
+        "output_bytes": output_size,
+        "ratio": round(output_size / original_size, 4),
+        "median_s": round(wall, 3),
+        "min_s": round(min(timings), 3),
+        "mb_per_s": round(original_size / (1024 * 1024) / max(wall, 1e-6), 2),
+        # Summed over all runs by the engine; averaged per run here
+        "stage_s": {name: round(seconds / runs, 3)
+                    for name, seconds in sorted(engine.stats["stage_times"].items())},
+        "peak_rss_mb": round(peak_rss / (1024 * 1024), 1) if peak_rss else None,
+    }
+
+
+def measure(name, path, args):
+    """Run one case in a child interpreter and return its result dict"""
+    cmd = [sys.executable, os.path.abspath(__file__), "--case-worker", path,
+           "--runs", str(args.runs), "--profile", args.profile]
+    if args.workers:
+        cmd += ["--workers", str(args.workers)]
+    if args.video:
+        cmd.append("--video")
+    proc = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    try:
+        result = json.loads(proc.stdout.strip().splitlines()[-1])
+    except (ValueError, IndexError):
+        result = {"error": (proc.stderr.strip().splitlines() or ["no output"])[-1]}
+    return dict(case=name, **result)
+
+
+def compare(cases, baseline, threshold):
+    """List of regression messages against a saved baseline"""
+    previous = {case["case"]: case for case in baseline.get("cases", [])}
+    regressions = []
+    for case in cases:
+        old = previous.get(case["case"])
+        if not old or "error" in case or "error" in old:
+            continue
+        for key, label in (("median_s", "wall time"), ("peak_rss_mb", "peak memory")):
+            if old.get(key) and case.get(key) and case[key] > old[key] * (1 + threshold):
+                regressions.append(f"{case['case']}: {label} {old[key]} -> {case[key]} "
+                                   f"(+{(case[key] / old[key] - 1) * 100:.0f}%)")
+        if case["output_bytes"] > old["output_bytes"]:
+            regressions.append(f"{case['case']}: output {old['output_bytes']} -> {case['output_bytes']} bytes")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark end-to-end document compression")
+    parser.add_argument("documents", nargs="*", help="Office files to test (default: synthetic corpus)")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--profile", default=DEFAULT_PROFILE, help="compression profile name")
+    parser.add_argument("--workers", type=int, default=None, help="image worker processes (default: one per core)")
+    parser.add_argument("--video", action="store_true", help="compress embedded video (needs FFmpeg)")
+    parser.add_argument("--corpus-dir", help="build the synthetic corpus here and keep it (default: temp dir)")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    parser.add_argument("--save-baseline", metavar="FILE", help="save the results as a baseline")
+    parser.add_argument("--baseline", metavar="FILE", help="compare against a saved baseline")
+    parser.add_argument("--threshold", type=float, default=0.15,
+                        help="allowed growth of wall time and peak memory over the baseline")
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    parser.add_argument("--case-worker", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    
+    if args.case_worker:
+        print(json.dumps(run_case(args.case_worker, args.runs, args.profile, args.workers, args.video)))
+        return 0
+    
+    corpus_dir = None
+    if args.documents:
+        inputs = [(os.path.splitext(os.path.basename(path))[0], path) for path in args.documents]
+    else:
+        from benchmarks.corpus import build_corpus
+        corpus_dir = args.corpus_dir or tempfile.mkdtemp(prefix="office_optimizer_corpus_")
+        inputs = list(build_corpus(corpus_dir).items())
+    
+    try:
+        cases = [measure(name, path, args) for name, path in inputs]
+    finally:
+        if corpus_dir and not args.corpus_dir:
+            shutil.rmtree(corpus_dir, ignore_errors=True)
+    
+    results = {"profile": args.profile, "runs": args.runs, "python": sys.version.split()[0],
+               "cpus": os.cpu_count(), "cases": cases}
+    regressions = []
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            regressions = compare(cases, json.load(f), args.threshold)
+        results["regressions"] = regressions
+    failed = [case for case in cases if "error" in case]
+    results["passed"] = not failed and not regressions
+    
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(results, f, indent=2)
+    
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        for case in cases:
+            if "error" in case:
+                print(f"{case['case']}: ERROR {case['error']}")
+                continue
+            stages = ", ".join(f"{name} {seconds}s" for name, seconds in case["stage_s"].items())
+            print(f"{case['case']}: {case['median_s']}s median, {case['mb_per_s']} MB/s, "
+                  f"ratio {case['ratio']}, peak {case['peak_rss_mb']} MB | {stages}")
+        for message in regressions:
+            print(f"REGRESSION {message}")
+        print("OK" if results["passed"] else "FAIL")
+    
+    return 0 if results["passed"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
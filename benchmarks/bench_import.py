@@ -0,0 +1,112 @@
+"""
+================================================================================
+Office Optimizer Pro - Import Time Benchmark
+================================================================================
+CREATED BY: SHILEZI (https://github.com/shilezi)
+================================================================================
+
+Measures how long `import office_optimizer_core` takes in a fresh interpreter
+(the cost every image worker process and every CLI call pays) and checks that
+no GUI, Pillow or COM module is loaded as a side effect.
+
+Usage:
+    python benchmarks/bench_import.py [--runs 15] [--max-ms 60]
+
+Exits with status 1 when the median import time exceeds --max-ms or a heavy
+module is imported eagerly.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules that must only be loaded when actually needed
+HEAVY_MODULES = ("PIL", "customtkinter", "tkinter", "win32com", "pythoncom", "numpy")
+
+
+def _run_python(code, extra_args=()):
+    env = dict(os.environ)
+    # Measure the steady state: byte code must be cached, as on an installed copy
+    env.pop("PYTHONDONTWRITEBYTECODE", None)
+    env["PYTHONPATH"] = REPO_ROOT + os.pathsep + env.get("PYTHONPATH", "")
+    return subprocess.run(
+        [sys.executable, *extra_args, "-c", code],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+        env=env,
+        cwd=REPO_ROOT,
+        check=True
+    )
+
+
+def measure_import(module, runs):
+    """Return per-run cumulative import times (ms) of module from -X importtime"""
+    _run_python(f"import {module}")  # warm-up, writes __pycache__
+    
+    timings = []
+    for _ in range(runs):
+        result = _run_python(f"import {module}", ("-X", "importtime"))
+        for line in result.stderr.splitlines():
+            # "import time: self [us] | cumulative | imported package"
+            parts = [p.strip() for p in line.split("|")]
+            if len(parts) == 3 and parts[2] == module:
+                timings.append(int(parts[1]) / 1000.0)
+    return timings
+
+
+def loaded_heavy_modules(module):
+    """Heavy modules present in sys.modules right after importing module"""
+    code = (
+        f"import sys, {module}\n"
+        f"print(' '.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    )
+    return _run_python(code).stdout.split()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Import-time benchmark for the compression engine")
+    parser.add_argument("--module", default="office_optimizer_core")
+    parser.add_argument("--runs", type=int, default=15)
+    parser.add_argument("--max-ms", type=float, default=60.0,
+                        help="fail when the median import time exceeds this many milliseconds")
+    parser.add_argument("--json", action="store_true", help="print the result as JSON")
+    args = parser.parse_args(argv)
+    
+    timings = measure_import(args.module, args.runs)
+    heavy = loaded_heavy_modules(args.module)
+    median = statistics.median(timings)
+    
+    result = {
+        "module": args.module,
+        "runs": len(timings),
+        "median_ms": round(median, 2),
+        "min_ms": round(min(timings), 2),
+        "max_ms": round(max(timings), 2),
+        "target_ms": args.max_ms,
+        "heavy_modules_loaded": heavy,
+        "passed": median <= args.max_ms and not heavy
+    }
+    
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        print(f"import {args.module}: median {result['median_ms']} ms "
+              f"(min {result['min_ms']}, max {result['max_ms']}, {len(timings)} runs, target {args.max_ms} ms)")
+        if heavy:
+            print(f"FAIL: heavy modules imported eagerly: {', '.join(heavy)}")
+        elif not result["passed"]:
+            print("FAIL: import time above target")
+        else:
+            print("OK")
+    
+    return 0 if result["passed"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
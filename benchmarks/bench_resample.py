@@ -0,0 +1,172 @@
+"""
+================================================================================
+Office Optimizer Pro - Image Downscaling Benchmark
+================================================================================
+CREATED BY: SHILEZI (https://github.com/shilezi)
+================================================================================
+
+Compares the engine's reduced-resolution JPEG decoding and staged resampling
+(office_optimizer_core._downscale) with the previous full-size decode plus a
+single thumbnail() call. For each case it reports decode+resize time, the
+size of the decoded bitmap (the peak buffer) and the PSNR of both results
+against an exact reference (full decode, one LANCZOS pass), before and after
+the JPEG encode the engine applies.
+
+Usage:
+    python benchmarks/bench_resample.py [--runs 5] [--quality 70] [--min-psnr 38] [photo.jpg ...]
+
+Without arguments synthetic camera-sized JPEGs are generated. Exits with
+status 1 when the staged path falls below --min-psnr on any case.
+"""
+
+import argparse
+import io
+import json
+import math
+import os
+import random
+import statistics
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from PIL import Image, ImageChops, ImageDraw, ImageFilter, ImageStat  # noqa: E402
+
+from office_optimizer_core import _downscale  # noqa: E402
+
+TARGETS = (1920, 1280, 1024)
+
+
+def synthetic_photo(width, height, seed=1):
+    """JPEG with smooth shapes, fine detail and sensor-like noise"""
+    rnd = random.Random(seed)
+    img = Image.new("RGB", (width, height), (rnd.randrange(256), rnd.randrange(256), rnd.randrange(256)))
+    draw = ImageDraw.Draw(img)
+    for _ in range(300):
+        x, y = rnd.randrange(width), rnd.randrange(height)
+        r = rnd.randrange(20, width // 6)
+        draw.ellipse((x - r, y - r, x + r, y + r),
+                     fill=(rnd.randrange(256), rnd.randrange(256), rnd.randrange(256)))
+    img = img.filter(ImageFilter.GaussianBlur(3))
+    draw = ImageDraw.Draw(img)
+    for _ in range(2000):
+        # Thin lines stand in for text and edges, where resampling errors show
+        x, y = rnd.randrange(width), rnd.randrange(height)
+        draw.line((x, y, x + rnd.randrange(-200, 200), y + rnd.randrange(-200, 200)),
+                  fill=(rnd.randrange(256),) * 3, width=rnd.choice((1, 2, 3)))
+    noise = Image.effect_noise((width, height), 12).convert("RGB")
+    img = ImageChops.add(img, noise, scale=1.0, offset=-64)
+    
+    buffer = io.BytesIO()
+    img.save(buffer, "JPEG", quality=92)
+    return buffer.getvalue()
+
+
+def psnr(a, b):
+    """Peak signal-to-noise ratio of two same-sized RGB images in dB"""
+    diff = ImageChops.difference(a.convert("RGB"), b.convert("RGB"))
+    mse = statistics.mean(v * v for v in ImageStat.Stat(diff).rms)
+    return float("inf") if mse == 0 else 10 * math.log10(255 * 255 / mse)
+
+
+def encoded(img, quality):
+    """img after a JPEG round trip at the engine's quality setting"""
+    buffer = io.BytesIO()
+    img.convert("RGB").save(buffer, "JPEG", quality=quality, optimize=True)
+    buffer.seek(0)
+    return Image.open(buffer).convert("RGB")
+
+
+def reference(data, target):
+    with Image.open(io.BytesIO(data)) as img:
+        img.load()
+        scale = target / max(img.width, img.height)
+        size = (max(1, round(img.width * scale)), max(1, round(img.height * scale)))
+        return img.resize(size, Image.Resampling.LANCZOS, reducing_gap=None)
+
+
+def previous_path(data, target):
+    """The engine before staged downscaling: thumbnail() with a square box"""
+    img = Image.open(io.BytesIO(data))
+    img.thumbnail((target, target), Image.Resampling.LANCZOS)
+    return img, img.size
+
+
+def staged_path(data, target):
+    img = Image.open(io.BytesIO(data))
+    result = _downscale(img, target)
+    return result, img.size
+
+
+def measure(fn, data, target, runs):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        result, decoded = fn(data, target)
+        timings.append((time.perf_counter() - start) * 1000)
+    return result, decoded, statistics.median(timings)
+
+
+def run_case(name, data, target, runs, quality):
+    exact = reference(data, target)
+    case = {"image": name, "target": target}
+    for label, fn in (("previous", previous_path), ("staged", staged_path)):
+        result, decoded, ms = measure(fn, data, target, runs)
+        # thumbnail() resizes in place; replay its square draft box for the decode size
+        if label == "previous":
+            with Image.open(io.BytesIO(data)) as probe:
+                probe.draft(None, (target * 2, target * 2))
+                decoded = probe.size
+        case[label] = {
+            "median_ms": round(ms, 1),
+            "decoded": f"{decoded[0]}x{decoded[1]}",
+            "decoded_mb": round(decoded[0] * decoded[1] * 3 / (1024 * 1024), 1),
+            "psnr_db": round(psnr(result, exact), 2),
+            "encoded_psnr_db": round(psnr(encoded(result, quality), exact), 2),
+        }
+    case["speedup"] = round(case["previous"]["median_ms"] / max(case["staged"]["median_ms"], 0.001), 2)
+    return case
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark staged JPEG downscaling")
+    parser.add_argument("images", nargs="*", help="JPEG files to test (default: synthetic photos)")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--quality", type=int, default=70, help="JPEG quality of the encoded comparison")
+    parser.add_argument("--min-psnr", type=float, default=38.0,
+                        help="fail when the staged result is below this PSNR against the exact reference")
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    args = parser.parse_args(argv)
+    
+    if args.images:
+        inputs = []
+        for path in args.images:
+            with open(path, 'rb') as f:
+                inputs.append((os.path.basename(path), f.read()))
+    else:
+        inputs = [("synthetic 6000x4000", synthetic_photo(6000, 4000)),
+                  ("synthetic 4032x3024", synthetic_photo(4032, 3024, seed=2))]
+    
+    cases = [run_case(name, data, target, args.runs, args.quality) for name, data in inputs for target in TARGETS]
+    passed = all(case["staged"]["psnr_db"] >= args.min_psnr for case in cases)
+    
+    if args.json:
+        print(json.dumps({"cases": cases, "min_psnr": args.min_psnr, "passed": passed}, indent=2))
+    else:
+        for case in cases:
+            prev, staged = case["previous"], case["staged"]
+            print(f"{case['image']} -> {case['target']}px: "
+                  f"previous {prev['median_ms']} ms ({prev['decoded']}, {prev['psnr_db']} dB, "
+                  f"encoded {prev['encoded_psnr_db']} dB) | "
+                  f"staged {staged['median_ms']} ms ({staged['decoded']}, {staged['psnr_db']} dB, "
+                  f"encoded {staged['encoded_psnr_db']} dB) | "
+                  f"x{case['speedup']}")
+        print("OK" if passed else f"FAIL: staged result below {args.min_psnr} dB")
+    
+    return 0 if passed else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,362 @@
+"""
+================================================================================
+Office Optimizer Pro - Synthetic Benchmark Corpus
+================================================================================
+CREATED BY: SHILEZI (https://github.com/shilezi)
+================================================================================
+
+Builds deterministic .pptx/.docx/.xlsx packages for the benchmarks: the same
+spec always produces byte-identical files (fixed seeds and ZIP timestamps),
+so results from different runs and machines compare like for like.
+
+A spec is a dict with the document kind ("pptx", "docx" or "xlsx") and the
+number of photos (noisy camera-sized JPEGs), screenshots (flat RGB PNGs),
+transparent PNGs, kilobytes of extra XML and video clips. Clips need FFmpeg
+on PATH (lavfi test sources, no network); without it they are left out.
+
+Usage:
+    python benchmarks/corpus.py OUTPUT_DIR [--case NAME ...]
+"""
+
+import argparse
+import io
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import zipfile
+
+from PIL import Image, ImageChops, ImageDraw, ImageFilter
+
+# Fixed timestamp for every entry, so archives are reproducible
+ZIP_DATE = (2025, 1, 1, 0, 0, 0)
+EMU_PER_INCH = 914400
+
+CASES = {
+    "deck-photos": {"kind": "pptx", "photos": 8, "screenshots": 2, "transparent": 1, "xml_kb": 200},
+    "deck-screenshots": {"kind": "pptx", "photos": 1, "screenshots": 12, "transparent": 4, "xml_kb": 400},
+    "deck-video": {"kind": "pptx", "photos": 2, "screenshots": 2, "transparent": 0, "xml_kb": 100, "clips": 2},
+    "doc-mixed": {"kind": "docx", "photos": 4, "screenshots": 4, "transparent": 2, "xml_kb": 1500},
+    "sheet-xml": {"kind": "xlsx", "photos": 1, "screenshots": 2, "transparent": 0, "xml_kb": 8000},
+}
+
+NS_A = "http://schemas.openxmlformats.org/drawingml/2006/main"
+NS_R = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+NS_P = "http://schemas.openxmlformats.org/presentationml/2006/main"
+NS_PIC = "http://schemas.openxmlformats.org/drawingml/2006/picture"
+NS_WP = "http://schemas.openxmlformats.org/drawingml/2006/wordprocessingDrawing"
+NS_W = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+NS_S = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+NS_XDR = "http://schemas.openxmlformats.org/drawingml/2006/spreadsheetDrawing"
+REL = NS_R
+CT = "application/vnd.openxmlformats-officedocument"
+XML_HEAD = '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+
+
+def photo(width, height, seed):
+    """JPEG with smooth shapes, fine lines and sensor-like noise"""
+    rnd = random.Random(seed)
+    img = Image.new("RGB", (width, height), (rnd.randrange(256), rnd.randrange(256), rnd.randrange(256)))
+    draw = ImageDraw.Draw(img)
+    for _ in range(150):
+        x, y, r = rnd.randrange(width), rnd.randrange(height), rnd.randrange(20, width // 5)
+        draw.ellipse((x - r, y - r, x + r, y + r), fill=(rnd.randrange(256), rnd.randrange(256), rnd.randrange(256)))
+    img = img.filter(ImageFilter.GaussianBlur(2))
+    draw = ImageDraw.Draw(img)
+    for _ in range(600):
+        x, y = rnd.randrange(width), rnd.randrange(height)
+        draw.line((x, y, x + rnd.randrange(-150, 150), y + rnd.randrange(-150, 150)),
+                  fill=(rnd.randrange(256),) * 3, width=rnd.choice((1, 2)))
+    # Image.effect_noise is not seeded, so the noise comes from rnd as well
+    pixels = width * height
+    noise = Image.frombytes("L", (width, height), rnd.getrandbits(pixels * 8).to_bytes(pixels, "little"))
+    img = ImageChops.add(img, Image.merge("RGB", (noise.point(lambda v: v // 16),) * 3))
+    buffer = io.BytesIO()
+    img.save(buffer, "JPEG", quality=92)
+    return buffer.getvalue()
+
+
+def screenshot(width, height, seed, transparent=False):
+    """PNG with flat panels and text-like bars, optionally on a transparent canvas"""
+    rnd = random.Random(seed)
+    background = (255, 255, 255, 0) if transparent else (240, 240, 240, 255)
+    img = Image.new("RGBA" if transparent else "RGB", (width, height), background)
+    draw = ImageDraw.Draw(img)
+    for _ in range(12):
+        x, y = rnd.randrange(width - 200), rnd.randrange(height - 100)
+        draw.rectangle((x, y, x + rnd.randrange(100, 400), y + rnd.randrange(40, 200)),
+                       fill=(rnd.randrange(256), rnd.randrange(256), rnd.randrange(256), 255))
+    for row in range(0, height, 18):
+        for _ in range(rnd.randrange(3, 8)):
+            x = rnd.randrange(width - 60)
+            draw.rectangle((x, row + 4, x + rnd.randrange(20, 60), row + 12), fill=(30, 30, 30, 255))
+    buffer = io.BytesIO()
+    img.save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+def filler_xml(kilobytes, seed):
+    """Text runs worth roughly kilobytes of XML"""
+    rnd = random.Random(seed)
+    words = ["optimizer", "quarterly", "revenue", "slide", "summary", "growth", "market", "team", "plan"]
+    chunks = []
+    size = 0
+    while size < kilobytes * 1024:
+        text = " ".join(rnd.choice(words) for _ in range(12))
+        chunks.append(text)
+        size += len(text) + 40
+    return chunks
+
+
+def make_clip(path, seed, seconds=3):
+    """Small H.264 + AAC test clip from FFmpeg's lavfi sources; False without FFmpeg"""
+    ffmpeg = shutil.which("ffmpeg")
+    if not ffmpeg:
+        return False
+    cmd = [ffmpeg, "-y", "-v", "error",
+           "-f", "lavfi", "-i", f"testsrc2=size=1280x720:rate=30:duration={seconds}",
+           "-f", "lavfi", "-i", f"sine=frequency={200 + seed * 50}:duration={seconds}",
+           "-c:v", "mpeg4", "-q:v", "2", "-c:a", "aac", "-threads", "1",
+           "-fflags", "+bitexact", "-flags", "+bitexact", path]
+    return subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL).returncode == 0
+
+
+def media_parts(spec, seed):
+    """[(file name, bytes, (width, height) in px or None)] for a spec"""
+    parts = []
+    for n in range(spec.get("photos", 0)):
+        parts.append((f"photo{n + 1}.jpeg", photo(3000, 2000, seed + n), (3000, 2000)))
+    for n in range(spec.get("screenshots", 0)):
+        parts.append((f"screen{n + 1}.png", screenshot(1600, 1000, seed + 100 + n), (1600, 1000)))
+    for n in range(spec.get("transparent", 0)):
+        parts.append((f"overlay{n + 1}.png", screenshot(800, 600, seed + 200 + n, transparent=True), (800, 600)))
+    
+    clips = spec.get("clips", 0)
+    if clips:
+        temp_dir = tempfile.mkdtemp()
+        try:
+            for n in range(clips):
+                path = os.path.join(temp_dir, f"clip{n + 1}.mp4")
+                if make_clip(path, n):
+                    with open(path, 'rb') as f:
+                        parts.append((f"clip{n + 1}.mp4", f.read(), None))
+        finally:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+    return parts
+
+
+class _Package:
+    def __init__(self, path):
+        self.zip = zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED)
+        self.defaults = {"rels": "application/vnd.openxmlformats-package.relationships+xml",
+                         "xml": "application/xml", "jpeg": "image/jpeg", "png": "image/png", "mp4": "video/mp4"}
+        self.overrides = []
+    
+    def write(self, name, data, content_type=None):
+        info = zipfile.ZipInfo(name, ZIP_DATE)
+        # Media is usually stored, XML deflated, as Office writes them
+        info.compress_type = zipfile.ZIP_STORED if name.endswith((".jpeg", ".png", ".mp4")) else zipfile.ZIP_DEFLATED
+        self.zip.writestr(info, data.encode("utf-8") if isinstance(data, str) else data)
+        if content_type:
+            self.overrides.append((name, content_type))
+    
+    def rels(self, name, rels):
+        body = "".join(f'<Relationship Id="{rel_id}" Type="{rel_type}" Target="{target}"/>'
+                       for rel_id, rel_type, target in rels)
+        self.write(name, XML_HEAD + '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+                   + body + "</Relationships>")
+    
+    def close(self):
+        types = "".join(f'<Default Extension="{ext}" ContentType="{ct}"/>' for ext, ct in self.defaults.items())
+        types += "".join(f'<Override PartName="/{name}" ContentType="{ct}"/>' for name, ct in self.overrides)
+        info = zipfile.ZipInfo("[Content_Types].xml", ZIP_DATE)
+        info.compress_type = zipfile.ZIP_DEFLATED
+        self.zip.writestr(info, XML_HEAD + '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+                          + types + "</Types>")
+        self.zip.close()
+
+
+def _emu(px, dpi=96):
+    return int(px / dpi * EMU_PER_INCH)
+
+
+def build_pptx(path, spec, seed=1):
+    pkg = _Package(path)
+    media = media_parts(spec, seed)
+    pictures = [m for m in media if m[2]]
+    clips = [m for m in media if not m[2]]
+    slides = max(1, len(pictures) + len(clips))
+    text = filler_xml(spec.get("xml_kb", 0), seed)
+    per_slide = max(1, len(text) // slides)
+    
+    pkg.rels("_rels/.rels", [("rId1", f"{REL}/officeDocument", "ppt/presentation.xml")])
+    pres_rels = [("rId1", f"{REL}/slideMaster", "slideMasters/slideMaster1.xml")]
+    slide_ids = ""
+    for n in range(1, slides + 1):
+        pres_rels.append((f"rId{n + 1}", f"{REL}/slide", f"slides/slide{n}.xml"))
+        slide_ids += f'<p:sldId id="{255 + n}" r:id="rId{n + 1}"/>'
+    pkg.write("ppt/presentation.xml",
+              XML_HEAD + f'<p:presentation xmlns:a="{NS_A}" xmlns:r="{NS_R}" xmlns:p="{NS_P}">'
+              '<p:sldMasterIdLst><p:sldMasterId id="2147483648" r:id="rId1"/></p:sldMasterIdLst>'
+              f'<p:sldIdLst>{slide_ids}</p:sldIdLst><p:sldSz cx="12192000" cy="6858000"/></p:presentation>',
+              f"{CT}.presentationml.presentation.main+xml")
+    pkg.rels("ppt/_rels/presentation.xml.rels", pres_rels)
+    pkg.write("ppt/slideMasters/slideMaster1.xml",
+              f'<p:sldMaster xmlns:a="{NS_A}" xmlns:r="{NS_R}" xmlns:p="{NS_P}"><p:cSld/>'
+              '<p:sldLayoutIdLst><p:sldLayoutId id="2147483649" r:id="rId1"/></p:sldLayoutIdLst></p:sldMaster>',
+              f"{CT}.presentationml.slideMaster+xml")
+    pkg.rels("ppt/slideMasters/_rels/slideMaster1.xml.rels",
+             [("rId1", f"{REL}/slideLayout", "../slideLayouts/slideLayout1.xml")])
+    pkg.write("ppt/slideLayouts/slideLayout1.xml",
+              f'<p:sldLayout xmlns:a="{NS_A}" xmlns:r="{NS_R}" xmlns:p="{NS_P}"><p:cSld/></p:sldLayout>',
+              f"{CT}.presentationml.slideLayout+xml")
+    pkg.rels("ppt/slideLayouts/_rels/slideLayout1.xml.rels",
+             [("rId1", f"{REL}/slideMaster", "../slideMasters/slideMaster1.xml")])
+    
+    items = [("picture", m) for m in pictures] + [("clip", m) for m in clips]
+    for n in range(1, slides + 1):
+        rels = [("rId1", f"{REL}/slideLayout", "../slideLayouts/slideLayout1.xml")]
+        shapes = ""
+        if n <= len(items):
+            kind, (name, data, size) = items[n - 1]
+            pkg.write(f"ppt/media/{name}", data)
+            if kind == "picture":
+                rels.append(("rId2", f"{REL}/image", f"../media/{name}"))
+                # Shown at 8 inches wide, as a photo on a widescreen slide
+                cx = 8 * EMU_PER_INCH
+                shapes += (f'<p:pic><p:nvPicPr><p:cNvPr id="2" name="{name}"/><p:cNvPicPr/><p:nvPr/></p:nvPicPr>'
+                           f'<p:blipFill><a:blip r:embed="rId2"/><a:stretch><a:fillRect/></a:stretch></p:blipFill>'
+                           f'<p:spPr><a:xfrm><a:off x="0" y="0"/><a:ext cx="{cx}" cy="{cx * size[1] // size[0]}"/>'
+                           '</a:xfrm></p:spPr></p:pic>')
+            else:
+                rels.append(("rId2", f"{REL}/video", f"../media/{name}"))
+                rels.append(("rId3", "http://schemas.microsoft.com/office/2007/relationships/media", f"../media/{name}"))
+                shapes += ('<p:pic><p:nvPicPr><p:cNvPr id="2" name="clip"/><p:cNvPicPr/><p:nvPr>'
+                           '<a:videoFile r:link="rId2"/><p:extLst><p:ext uri="{DAA4B4D4-6D71-4841-9C94-3DE7FCFB9230}">'
+                           '<p14:media xmlns:p14="http://schemas.microsoft.com/office/powerpoint/2010/main" r:embed="rId3"/>'
+                           '</p:ext></p:extLst></p:nvPr></p:nvPicPr><p:blipFill/><p:spPr/></p:pic>')
+        runs = "".join(f"<a:r><a:t>{t}</a:t></a:r>" for t in text[(n - 1) * per_slide:n * per_slide])
+        shapes += f'<p:sp><p:txBody><a:bodyPr/><a:p>{runs}</a:p></p:txBody></p:sp>'
+        pkg.write(f"ppt/slides/slide{n}.xml",
+                  XML_HEAD + f'<p:sld xmlns:a="{NS_A}" xmlns:r="{NS_R}" xmlns:p="{NS_P}">'
+                  f'<p:cSld><p:spTree>{shapes}</p:spTree></p:cSld></p:sld>',
+                  f"{CT}.presentationml.slide+xml")
+        pkg.rels(f"ppt/slides/_rels/slide{n}.xml.rels", rels)
+    pkg.close()
+
+
+def build_docx(path, spec, seed=1):
+    pkg = _Package(path)
+    media = [m for m in media_parts(spec, seed) if m[2]]
+    text = filler_xml(spec.get("xml_kb", 0), seed)
+    
+    pkg.rels("_rels/.rels", [("rId1", f"{REL}/officeDocument", "word/document.xml")])
+    rels = []
+    body = ""
+    per_picture = max(1, len(text) // max(1, len(media)))
+    for n, (name, data, size) in enumerate(media, 1):
+        pkg.write(f"word/media/{name}", data)
+        rels.append((f"rId{n}", f"{REL}/image", f"media/{name}"))
+        # Inline at 6 inches wide, a full text column
+        cx = 6 * EMU_PER_INCH
+        cy = cx * size[1] // size[0]
+        body += "".join(f"<w:p><w:r><w:t>{t}</w:t></w:r></w:p>" for t in text[(n - 1) * per_picture:n * per_picture])
+        body += (f'<w:p><w:r><w:drawing><wp:inline><wp:extent cx="{cx}" cy="{cy}"/><wp:docPr id="{n}" name="{name}"/>'
+                 f'<a:graphic><a:graphicData uri="{NS_PIC}"><pic:pic><pic:nvPicPr><pic:cNvPr id="{n}" name="{name}"/>'
+                 f'<pic:cNvPicPr/></pic:nvPicPr><pic:blipFill><a:blip r:embed="rId{n}"/></pic:blipFill>'
+                 f'<pic:spPr><a:xfrm><a:ext cx="{cx}" cy="{cy}"/></a:xfrm></pic:spPr></pic:pic></a:graphicData>'
+                 '</a:graphic></wp:inline></w:drawing></w:r></w:p>')
+    pkg.write("word/document.xml",
+              XML_HEAD + f'<w:document xmlns:w="{NS_W}" xmlns:r="{NS_R}" xmlns:wp="{NS_WP}" xmlns:a="{NS_A}" '
+              f'xmlns:pic="{NS_PIC}"><w:body>{body}</w:body></w:document>',
+              f"{CT}.wordprocessingml.document.main+xml")
+    pkg.rels("word/_rels/document.xml.rels", rels)
+    pkg.close()
+
+
+def build_xlsx(path, spec, seed=1):
+    pkg = _Package(path)
+    media = [m for m in media_parts(spec, seed) if m[2]]
+    rnd = random.Random(seed)
+    
+    pkg.rels("_rels/.rels", [("rId1", f"{REL}/officeDocument", "xl/workbook.xml")])
+    pkg.write("xl/workbook.xml",
+              XML_HEAD + f'<workbook xmlns="{NS_S}" xmlns:r="{NS_R}"><sheets>'
+              '<sheet name="Data" sheetId="1" r:id="rId1"/></sheets></workbook>',
+              f"{CT}.spreadsheetml.sheet.main+xml")
+    pkg.rels("xl/_rels/workbook.xml.rels", [("rId1", f"{REL}/worksheet", "worksheets/sheet1.xml")])
+    
+    rows = []
+    size = 0
+    row = 0
+    while size < spec.get("xml_kb", 0) * 1024:
+        row += 1
+        cells = "".join(f'<c r="{col}{row}"><v>{rnd.randrange(10 ** 6)}</v></c>' for col in "ABCDEFGH")
+        rows.append(f'<row r="{row}">{cells}</row>')
+        size += len(rows[-1])
+    drawing = '<drawing r:id="rId1"/>' if media else ""
+    pkg.write("xl/worksheets/sheet1.xml",
+              XML_HEAD + f'<worksheet xmlns="{NS_S}" xmlns:r="{NS_R}"><sheetData>{"".join(rows)}</sheetData>'
+              f'{drawing}</worksheet>',
+              f"{CT}.spreadsheetml.worksheet+xml")
+    
+    if media:
+        pkg.rels("xl/worksheets/_rels/sheet1.xml.rels", [("rId1", f"{REL}/drawing", "../drawings/drawing1.xml")])
+        anchors = ""
+        rels = []
+        for n, (name, data, size) in enumerate(media, 1):
+            pkg.write(f"xl/media/{name}", data)
+            rels.append((f"rId{n}", f"{REL}/image", f"../media/{name}"))
+            cx, cy = _emu(size[0] // 2), _emu(size[1] // 2)
+            anchors += (f'<xdr:oneCellAnchor><xdr:from><xdr:col>{n * 10}</xdr:col><xdr:colOff>0</xdr:colOff>'
+                        '<xdr:row>0</xdr:row><xdr:rowOff>0</xdr:rowOff></xdr:from>'
+                        f'<xdr:ext cx="{cx}" cy="{cy}"/><xdr:pic><xdr:nvPicPr><xdr:cNvPr id="{n}" name="{name}"/>'
+                        f'<xdr:cNvPicPr/></xdr:nvPicPr><xdr:blipFill><a:blip r:embed="rId{n}"/></xdr:blipFill>'
+                        f'<xdr:spPr><a:xfrm><a:ext cx="{cx}" cy="{cy}"/></a:xfrm></xdr:spPr></xdr:pic>'
+                        '<xdr:clientData/></xdr:oneCellAnchor>')
+        pkg.write("xl/drawings/drawing1.xml",
+                  XML_HEAD + f'<xdr:wsDr xmlns:xdr="{NS_XDR}" xmlns:a="{NS_A}" xmlns:r="{NS_R}">{anchors}</xdr:wsDr>',
+                  f"{CT}.drawing+xml")
+        pkg.rels("xl/drawings/_rels/drawing1.xml.rels", rels)
+    pkg.close()
+
+
+BUILDERS = {"pptx": build_pptx, "docx": build_docx, "xlsx": build_xlsx}
+
+
+def build(path, spec, seed=1):
+    """Write the document described by spec to path"""
+    BUILDERS[spec["kind"]](path, spec, seed)
+    return path
+
+
+def build_corpus(output_dir, cases=None):
+    """Build the named cases (default: all) and return {case name: path}"""
+    os.makedirs(output_dir, exist_ok=True)
+    paths = {}
+    for name in cases or CASES:
+        spec = CASES[name]
+        if spec.get("clips") and not shutil.which("ffmpeg"):
+            continue
+        paths[name] = build(os.path.join(output_dir, f"{name}.{spec['kind']}"), spec)
+    return paths
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the synthetic benchmark corpus")
+    parser.add_argument("output_dir")
+    parser.add_argument("--case", action="append", choices=sorted(CASES),
+                        help="build only this case (repeatable; default: all)")
+    args = parser.parse_args(argv)
+    
+    paths = build_corpus(args.output_dir, args.case)
+    for name, path in paths.items():
+        print(json.dumps({"case": name, "path": path, "bytes": os.path.getsize(path)}))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
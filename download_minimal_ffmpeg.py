@@ -113,6 +113,7 @@ def download_minimal_ffmpeg():
                 # Extract only essential files from bin
                 essential_patterns = [
                     'ffmpeg.exe',
+                    'ffprobe.exe',
                     'avcodec',
                     'avformat',
                     'avutil',
@@ -0,0 +1,229 @@
+"""
+================================================================================
+Office Optimizer Pro v5.4 - Persistent Media Cache
+Content-addressed store of optimized media shared across runs and processes
+================================================================================
+CREATED BY: SHILEZI (https://github.com/shilezi)
+VERSION: 5.4.0 | RELEASE: 2025
+================================================================================
+PROPRIETARY SOFTWARE - ALL RIGHTS RESERVED
+Copyright © 2025 Shilezi. Unauthorized distribution is prohibited.
+================================================================================
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+
+from office_optimizer_core import CONFIG
+
+# Stored for parts where optimizing did not help, so the original is kept
+KEEP_ORIGINAL = b""
+
+
+def user_data_dir():
+    """Per-user state directory (LOCALAPPDATA on Windows, XDG cache elsewhere)"""
+    if os.name == 'nt':
+        base = os.environ.get("LOCALAPPDATA") or tempfile.gettempdir()
+    else:
+        base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "office_optimizer")
+
+
+def default_cache_dir():
+    """Media cache location: CONFIG["media_cache_dir"] or the per-user directory"""
+    if CONFIG.get("media_cache_dir"):
+        return CONFIG["media_cache_dir"]
+    return os.path.join(user_data_dir(), "media")
+
+
+class MediaCache:
+    """On-disk cache of optimized media parts with a size cap and LRU eviction
+    
+    Entries are keyed by the SHA-256 of the original part bytes plus a digest
+    of the effective encoder settings. Blobs live in sharded files written by
+    atomic rename; a small SQLite index (WAL mode) tracks sizes and last use,
+    so several worker processes can read and write the cache at once.
+    """
+    
+    # Hits refresh last_used at most this often, to keep readers off the write lock
+    TOUCH_INTERVAL = 60.0
+    
+    def __init__(self, directory=None, max_bytes=None):
+        self.directory = directory or default_cache_dir()
+        self.max_bytes = max_bytes if max_bytes is not None else CONFIG["media_cache_max_bytes"]
+        self.blob_dir = os.path.join(self.directory, "blobs")
+        os.makedirs(self.blob_dir, exist_ok=True)
+        
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(
+            os.path.join(self.directory, "index.sqlite3"),
+            timeout=30,
+            check_same_thread=False,
+            isolation_level=None
+        )
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "key TEXT PRIMARY KEY, size INTEGER NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS entries_lru ON entries (last_used)")
+        self._db.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+        self._db.execute("INSERT OR IGNORE INTO meta VALUES ('total_bytes', 0)")
+        
+        self.hits = 0
+        self.misses = 0
+    
+    @staticmethod
+    def make_key(data, settings):
+        """Cache key for a part: content hash plus a digest of the settings"""
+        return MediaCache.key_for_digest(hashlib.sha256(data).hexdigest(), settings)
+    
+    @staticmethod
+    def key_for_digest(content_digest, settings):
+        """Cache key from the SHA-256 hex digest of a part (for parts hashed while streaming)"""
+        params = hashlib.sha256(json.dumps(settings, sort_keys=True).encode("utf-8")).hexdigest()
+        return f"{content_digest}-{params[:16]}"
+    
+    def _blob_path(self, key):
+        return os.path.join(self.blob_dir, key[:2], key)
+    
+    def get(self, key):
+        """Return the cached bytes (KEEP_ORIGINAL for 'no gain'), or None on a miss"""
+        with self._lock:
+            row = self._db.execute("SELECT size, last_used FROM entries WHERE key = ?", (key,)).fetchone()
+        
+        if row is None:
+            with self._lock:
+                self.misses += 1
+            return None
+        
+        size, last_used = row
+        try:
+            if size:
+                with open(self._blob_path(key), 'rb') as f:
+                    data = f.read()
+                if len(data) != size:
+                    raise OSError("truncated cache blob")
+            else:
+                data = KEEP_ORIGINAL
+        except OSError:
+            # Evicted by another process in the meantime, or damaged
+            self._remove(key)
+            with self._lock:
+                self.misses += 1
+            return None
+        
+        now = time.time()
+        with self._lock:
+            if now - last_used > self.TOUCH_INTERVAL:
+                self._db.execute("UPDATE entries SET last_used = ? WHERE key = ?", (now, key))
+            self.hits += 1
+        return data
+    
+    def put(self, key, data):
+        """Store data under key (an atomic rename, safe against concurrent writers)"""
+        if data and not self._store_blob(key, lambda f: f.write(data)):
+            return
+        self._record(key, len(data))
+    
+    def put_file(self, key, source_path):
+        """Store the contents of a file under key without reading it into memory"""
+        def copy(f):
+            with open(source_path, 'rb') as src:
+                shutil.copyfileobj(src, f, 1024 * 1024)
+        
+        try:
+            size = os.path.getsize(source_path)
+        except OSError:
+            return
+        if size and not self._store_blob(key, copy):
+            return
+        self._record(key, size)
+    
+    def _store_blob(self, key, write):
+        path = self._blob_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                write(f)
+            os.replace(tmp_path, path)
+        except OSError:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            return False
+        return True
+    
+    def _record(self, key, size):
+        with self._lock:
+            cur = self._db.cursor()
+            cur.execute("BEGIN IMMEDIATE")
+            try:
+                old = cur.execute("SELECT size FROM entries WHERE key = ?", (key,)).fetchone()
+                delta = size - (old[0] if old else 0)
+                cur.execute("INSERT OR REPLACE INTO entries VALUES (?, ?, ?)", (key, size, time.time()))
+                cur.execute("UPDATE meta SET value = value + ? WHERE name = 'total_bytes'", (delta,))
+                total = cur.execute("SELECT value FROM meta WHERE name = 'total_bytes'").fetchone()[0]
+                evicted = self._evict(cur, total) if total > self.max_bytes else []
+                cur.execute("COMMIT")
+            except Exception:
+                cur.execute("ROLLBACK")
+                raise
+        
+        for old_key in evicted:
+            self._remove_blob(old_key)
+    
+    def _evict(self, cur, total):
+        """Drop least recently used entries down to 90% of the cap (transaction held)"""
+        target = int(self.max_bytes * 0.9)
+        evicted = []
+        # A second cursor on the same connection streams rows inside the transaction
+        for key, size in self._db.execute("SELECT key, size FROM entries ORDER BY last_used"):
+            if total <= target:
+                break
+            evicted.append(key)
+            total -= size
+        
+        for key in evicted:
+            cur.execute("DELETE FROM entries WHERE key = ?", (key,))
+        cur.execute("UPDATE meta SET value = ? WHERE name = 'total_bytes'", (max(total, 0),))
+        return evicted
+    
+    def _remove(self, key):
+        with self._lock:
+            cur = self._db.cursor()
+            cur.execute("BEGIN IMMEDIATE")
+            row = cur.execute("SELECT size FROM entries WHERE key = ?", (key,)).fetchone()
+            if row:
+                cur.execute("DELETE FROM entries WHERE key = ?", (key,))
+                cur.execute("UPDATE meta SET value = MAX(value - ?, 0) WHERE name = 'total_bytes'", (row[0],))
+            cur.execute("COMMIT")
+        self._remove_blob(key)
+    
+    def _remove_blob(self, key):
+        try:
+            os.remove(self._blob_path(key))
+        except OSError:
+            # Missing, or still open in another process on Windows
+            pass
+    
+    def stats(self):
+        """Entry count and total size currently in the cache"""
+        with self._lock:
+            count = self._db.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+            total = self._db.execute("SELECT value FROM meta WHERE name = 'total_bytes'").fetchone()[0]
+        return {"entries": count, "total_bytes": total, "max_bytes": self.max_bytes,
+                "hits": self.hits, "misses": self.misses}
+    
+    def close(self):
+        with self._lock:
+            self._db.close()
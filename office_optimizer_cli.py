@@ -0,0 +1,427 @@
+"""
+================================================================================
+Office Optimizer Pro v5.4 - Command Line Interface
+Headless batch compression for servers, cron jobs and CI pipelines
+================================================================================
+CREATED BY: SHILEZI (https://github.com/shilezi)
+VERSION: 5.4.0 | RELEASE: 2025
+================================================================================
+PROPRIETARY SOFTWARE - ALL RIGHTS RESERVED
+Copyright © 2025 Shilezi. Unauthorized distribution is prohibited.
+================================================================================
+
+Usage:
+    office-optimizer [options] FILE|DIR|GLOB [...]
+    python -m office_optimizer_cli [options] FILE|DIR|GLOB [...]
+
+One JSON object is written per input file (JSON lines), to stdout or to
+--results. This module never imports the GUI stack.
+"""
+
+import argparse
+import contextlib
+import glob
+import json
+import multiprocessing
+import os
+import sys
+import threading
+import time
+
+import office_optimizer_encoders
+from office_optimizer_core import CONFIG, OfficeCompressor, BatchScheduler
+
+OFFICE_EXTENSIONS = ('.pptx', '.docx', '.xlsx')
+DEFAULT_PROFILE = "Balanced (Recommended)"
+
+
+def resolve_profile(name):
+    """Match a preset by exact name or unique case-insensitive prefix"""
+    if name in CONFIG["presets"]:
+        return name
+    
+    matches = [p for p in CONFIG["presets"] if p.lower().startswith(name.lower())]
+    if len(matches) == 1:
+        return matches[0]
+    
+    choices = ", ".join(f'"{p}"' for p in CONFIG["presets"])
+    raise ValueError(f"Unknown profile '{name}'. Choose one of: {choices}")
+
+
+def collect_inputs(patterns):
+    """Expand files, directories and glob patterns into (path, base_dir) pairs
+    
+    base_dir is the directory an input was found under, used to mirror the
+    folder structure inside --output-dir. Duplicates are dropped.
+    """
+    found = []
+    seen = set()
+    
+    def add(path, base_dir):
+        key = os.path.normcase(os.path.abspath(path))
+        if key not in seen and path.lower().endswith(OFFICE_EXTENSIONS):
+            seen.add(key)
+            found.append((path, base_dir))
+    
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            for root, dirs, files in os.walk(pattern):
+                dirs.sort()
+                for file in sorted(files):
+                    add(os.path.join(root, file), pattern)
+        elif os.path.isfile(pattern):
+            add(pattern, os.path.dirname(pattern))
+        else:
+            for path in sorted(glob.glob(pattern, recursive=True)):
+                if os.path.isfile(path):
+                    add(path, os.path.dirname(path))
+    
+    return found
+
+
+def output_path_for(filepath, base_dir, output_dir, replace_original):
+    """Work out where the optimized copy of filepath is written"""
+    if replace_original:
+        return filepath + ".optimized"
+    
+    if output_dir:
+        relative = os.path.relpath(filepath, base_dir) if base_dir else os.path.basename(filepath)
+        if relative.startswith(os.pardir):
+            relative = os.path.basename(filepath)
+        return os.path.join(output_dir, relative)
+    
+    base, ext = os.path.splitext(filepath)
+    return f"{base}_Optimized{ext}"
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="office-optimizer",
+        description="Compress PowerPoint, Word and Excel files without the GUI."
+    )
+    parser.add_argument("inputs", nargs="*", metavar="PATH",
+                        help="Office files, directories (searched recursively) or glob patterns")
+    parser.add_argument("-p", "--profile", default=DEFAULT_PROFILE,
+                        help=f'compression profile name or prefix (default: "{DEFAULT_PROFILE}")')
+    parser.add_argument("--list-profiles", action="store_true",
+                        help="print the available profiles and exit")
+    parser.add_argument("-o", "--output-dir",
+                        help="write optimized copies here, mirroring input folders")
+    parser.add_argument("--replace", action="store_true",
+                        help="replace the original files (a backup is kept unless --no-backup)")
+    parser.add_argument("-j", "--jobs", type=int, default=None,
+                        help="documents processed at once (default: one per core, limited by free RAM)")
+    parser.add_argument("-w", "--workers", type=int, default=None,
+                        help="image worker processes shared by all documents (default: one per core)")
+    parser.add_argument("--target-dpi", type=int, metavar="DPI",
+                        help="pixels per inch kept for each picture's displayed size "
+                             "(default: from the profile; 0 disables)")
+    parser.add_argument("--target-ssim", type=float, metavar="SSIM",
+                        help="pick each JPEG's quality as the lowest that keeps this SSIM against "
+                             "the resized image, e.g. 0.98 (needs numpy; default: the profile's fixed quality)")
+    parser.add_argument("--jpeg-encoder", choices=office_optimizer_encoders.names("JPEG") + ["auto"],
+                        help="JPEG encoder backend; auto picks the fastest one on this machine whose "
+                             f"output stays within {office_optimizer_encoders.SIZE_TOLERANCE - 1:.0%} "
+                             f"of Pillow's (default: {CONFIG['image_encoders']['JPEG']})")
+    parser.add_argument("--png-encoder", choices=office_optimizer_encoders.names("PNG") + ["auto"],
+                        help=f"PNG encoder backend, or auto (default: {CONFIG['image_encoders']['PNG']})")
+    parser.add_argument("--video", action="store_true",
+                        help="compress embedded video and audio with FFmpeg")
+    parser.add_argument("--png-smart", action="store_true",
+                        help="convert PNGs without real transparency to JPEG")
+    parser.add_argument("--collapse-duplicates", action="store_true",
+                        help="store identical media parts once and repoint their relationships")
+    parser.add_argument("--keep-orphans", action="store_true",
+                        help="keep parts that no relationship refers to")
+    parser.add_argument("--keep-layouts", action="store_true",
+                        help="keep slide layouts and masters that no slide uses")
+    parser.add_argument("--keep-trimmed-media", action="store_true",
+                        help="with --video, keep the parts of clips that PowerPoint trims away")
+    parser.add_argument("--memory-budget", type=int, metavar="MB",
+                        help="memory all parts in flight may hold at once (default: share of free RAM)")
+    parser.add_argument("--no-backup", action="store_true",
+                        help="do not create backups before processing")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="do not use the persistent media cache")
+    parser.add_argument("--cache-dir", metavar="DIR",
+                        help="media cache location (default: per-user cache directory)")
+    parser.add_argument("--cache-size", type=int, metavar="MB",
+                        help=f"media cache size cap in MB (default: {CONFIG['media_cache_max_bytes'] // (1024 * 1024)})")
+    parser.add_argument("--index", metavar="PATH",
+                        help="incremental index database (default: per-user directory)")
+    parser.add_argument("--no-index", action="store_true",
+                        help="do not skip unchanged files or record processed ones")
+    parser.add_argument("--force", action="store_true",
+                        help="process files even when the index says they are unchanged")
+    parser.add_argument("--results", metavar="FILE",
+                        help="write JSON-lines results to FILE instead of stdout")
+    parser.add_argument("--metrics", metavar="FILE",
+                        help="append per-file metrics (parts by type, bytes, wall/CPU time, cache hits) "
+                             "to FILE as JSON lines")
+    parser.add_argument("--prometheus", metavar="FILE",
+                        help="write run totals to FILE in Prometheus text format (node-exporter textfile)")
+    parser.add_argument("--trace", metavar="FILE",
+                        help="write a timeline of every stage as Chrome Trace Event JSON "
+                             "(open in ui.perfetto.dev or chrome://tracing)")
+    parser.add_argument("--profiling", choices=("always", "auto"),
+                        help="save a cProfile dump and tracemalloc summary per file: for every file, "
+                             "or (auto) only for files slower than --profiling-threshold")
+    parser.add_argument("--profiling-threshold", type=float, metavar="SECONDS",
+                        help=f"wall time above which auto profiling keeps a report "
+                             f"(default: {CONFIG['profiling_threshold']:g}; implies --profiling auto)")
+    parser.add_argument("--profiling-dir", metavar="DIR",
+                        help="where profiling reports go (default: next to --results, else ./office_optimizer_profiles)")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="write nothing; predict each file's savings and processing time from its "
+                             "headers and a few sample encodes, and report them to stdout or --results")
+    parser.add_argument("--dry-run-format", choices=("json", "csv"), default="json",
+                        help="report format for --dry-run (default: json)")
+    parser.add_argument("-v", "--verbose", action="store_true",
+                        help="print engine log messages to stderr")
+    return parser
+
+
+def dry_run(args, engine, inputs, index, output_settings):
+    """Estimate every input instead of compressing it; returns the exit code"""
+    from office_optimizer_estimate import SavingsEstimator
+    estimator = SavingsEstimator(engine)
+    for filepath, base_dir in inputs:
+        out_path = output_path_for(filepath, base_dir, args.output_dir, args.replace)
+        if (index is not None and not args.force
+                and index.is_current(filepath, output_settings, filepath if args.replace else out_path)):
+            estimator.skipped(filepath, "Unchanged since last run")
+            continue
+        record = estimator.estimate(filepath)
+        if args.verbose:
+            print(f"[{os.path.basename(filepath)}] predicted {record['predicted_savings_percent']}% "
+                  f"in {record['predicted_seconds']}s ({record['sampled_parts']} sampled)", file=sys.stderr)
+    
+    # The report is one document, so --results is overwritten rather than appended to
+    with open(args.results, 'w', encoding='utf-8', newline='') if args.results else \
+            contextlib.nullcontext(sys.stdout) as f:
+        if args.dry_run_format == "csv":
+            estimator.write_csv(f)
+        else:
+            estimator.write_json(f)
+    return 0 if all(record["status"] != "error" for record in estimator.records) else 1
+
+
+def main(argv=None):
+    """Command line entry point; returns the process exit code"""
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    
+    if args.list_profiles:
+        for name, preset in CONFIG["presets"].items():
+            dpi = f"{preset['target_dpi']} dpi" if preset.get("target_dpi") else "no dpi limit"
+            print(f"{name}: quality {preset['quality']}, max width {preset['max_width']}px, {dpi}")
+        return 0
+    
+    if not args.inputs:
+        parser.error("no input files given")
+    if args.replace and args.output_dir:
+        parser.error("--replace and --output-dir are mutually exclusive")
+    
+    try:
+        profile = resolve_profile(args.profile)
+    except ValueError as e:
+        parser.error(str(e))
+    preset = CONFIG["presets"][profile]
+    if args.target_ssim is not None:
+        if not 0 < args.target_ssim < 1:
+            parser.error("--target-ssim must be between 0 and 1")
+        import office_optimizer_quality
+        if not office_optimizer_quality.available():
+            parser.error("--target-ssim needs numpy (pip install numpy)")
+    encoders = {}
+    for save_format, name in (("JPEG", args.jpeg_encoder), ("PNG", args.png_encoder)):
+        if name and name != "auto" and not office_optimizer_encoders.get_backend(name).available():
+            parser.error(f"--{save_format.lower()}-encoder {name} is not available on this machine")
+        if name:
+            encoders[save_format] = name
+    target_dpi = preset.get("target_dpi") if args.target_dpi is None else (args.target_dpi or None)
+    
+    inputs = collect_inputs(args.inputs)
+    if not inputs:
+        print("office-optimizer: no .pptx/.docx/.xlsx files found", file=sys.stderr)
+        return 1
+    
+    cache = None
+    if not args.no_cache and not args.dry_run:
+        # Imported here so --no-cache runs never load sqlite3
+        from office_optimizer_cache import MediaCache
+        cache_bytes = args.cache_size * 1024 * 1024 if args.cache_size is not None else None
+        cache = MediaCache(args.cache_dir, cache_bytes)
+    
+    metrics = None
+    if args.metrics or args.prometheus:
+        from office_optimizer_metrics import MetricsCollector
+        metrics = MetricsCollector(args.metrics, args.prometheus)
+    
+    profiler = None
+    profiling = args.profiling or ("auto" if args.profiling_threshold is not None else None)
+    if profiling:
+        from office_optimizer_profiling import Profiler
+        profiling_dir = args.profiling_dir
+        if not profiling_dir:
+            profiling_dir = (os.path.splitext(args.results)[0] + "_profiles" if args.results
+                             else "office_optimizer_profiles")
+        profiler = Profiler(profiling_dir, profiling, args.profiling_threshold)
+    
+    tracer = None
+    if args.trace:
+        from office_optimizer_trace import TraceRecorder
+        tracer = TraceRecorder()
+    
+    engine = OfficeCompressor(
+        quality=preset["quality"],
+        max_width=preset["max_width"],
+        compress_video=args.video,
+        png_smart_convert=args.png_smart,
+        enable_backup=not args.no_backup,
+        workers=args.workers,
+        cache=cache,
+        collapse_duplicates=args.collapse_duplicates,
+        target_dpi=target_dpi,
+        prune_orphans=not args.keep_orphans,
+        prune_layouts=not args.keep_layouts,
+        trim_media=not args.keep_trimmed_media,
+        target_ssim=args.target_ssim,
+        encoders=encoders,
+        memory_budget=args.memory_budget * 1024 * 1024 if args.memory_budget else None,
+        metrics=metrics,
+        profiler=profiler,
+        tracer=tracer
+    )
+    if args.verbose and encoders:
+        print("Image encoders: " + ", ".join(f"{save_format} {name}" for save_format, name
+                                             in sorted(engine.encoders.items())), file=sys.stderr)
+    index = None
+    if not args.no_index:
+        from office_optimizer_index import OptimizationIndex
+        index = OptimizationIndex(args.index)
+    output_settings = engine.output_settings()
+    if args.dry_run:
+        try:
+            return dry_run(args, engine, inputs, index, output_settings)
+        finally:
+            engine.close()
+            if cache is not None:
+                cache.close()
+            if index is not None:
+                index.close()
+    scheduler = BatchScheduler(max_documents=args.jobs)
+    base_dirs = dict(inputs)
+    
+    results_file = open(args.results, 'a', encoding='utf-8') if args.results else sys.stdout
+    output_lock = threading.Lock()
+    
+    def emit(record):
+        with output_lock:
+            results_file.write(json.dumps(record, ensure_ascii=False) + "\n")
+            results_file.flush()
+    
+    def process_file(filepath):
+        start_time = time.time()
+        out_path = output_path_for(filepath, base_dirs[filepath], args.output_dir, args.replace)
+        messages = []
+        
+        def log_callback(msg):
+            messages.append(msg)
+            if args.verbose:
+                with output_lock:
+                    print(f"[{os.path.basename(filepath)}] {msg.strip()}", file=sys.stderr)
+        
+        record = {
+            "input": filepath,
+            "output": None,
+            "profile": profile,
+            "status": "error",
+            "original_size": None,
+            "output_size": None,
+            "savings_bytes": None,
+            "savings_percent": None,
+            "seconds": None,
+            "message": None
+        }
+        
+        if not args.replace and os.path.abspath(out_path) == os.path.abspath(filepath):
+            record["message"] = "Output path is the input file; use --replace or another --output-dir"
+            record["seconds"] = 0.0
+            emit(record)
+            return False
+        
+        if index is not None and not args.force:
+            if index.is_current(filepath, output_settings, filepath if args.replace else out_path):
+                record["status"] = "skipped"
+                record["output"] = filepath if args.replace else out_path
+                record["original_size"] = os.path.getsize(filepath)
+                record["message"] = "Unchanged since last run"
+                record["seconds"] = round(time.time() - start_time, 3)
+                emit(record)
+                return True
+        
+        work_path = None
+        try:
+            record["original_size"] = os.path.getsize(filepath)
+            out_dir = os.path.dirname(out_path)
+            if out_dir:
+                os.makedirs(out_dir, exist_ok=True)
+            
+            # Write next to the output and rename on success, so a failed run
+            # never truncates or removes the output of an earlier one
+            work_path = out_path + ".partial"
+            success = engine.compress(filepath, work_path, log_callback=log_callback)
+            if success:
+                record["output_size"] = os.path.getsize(work_path)
+                if args.replace:
+                    with tracer.span("replace", file=filepath) if tracer else contextlib.nullcontext():
+                        os.replace(work_path, filepath)
+                    out_path = filepath
+                else:
+                    os.replace(work_path, out_path)
+                work_path = None
+                record["status"] = "ok"
+                record["output"] = out_path
+                record["savings_bytes"] = record["original_size"] - record["output_size"]
+                if record["original_size"]:
+                    record["savings_percent"] = round(record["savings_bytes"] / record["original_size"] * 100, 2)
+                if index is not None:
+                    index.record(filepath, output_settings, profile, record["original_size"], out_path)
+            elif messages:
+                record["message"] = messages[-1]
+        except Exception as e:
+            record["message"] = str(e)
+        
+        if work_path is not None:
+            # Do not leave half-written output behind
+            try:
+                os.remove(work_path)
+            except OSError:
+                pass
+        
+        record["seconds"] = round(time.time() - start_time, 3)
+        emit(record)
+        return record["status"] == "ok"
+    
+    try:
+        results = scheduler.run([path for path, base in inputs], process_file)
+    finally:
+        engine.close()
+        if cache is not None:
+            cache.close()
+        if index is not None:
+            index.close()
+        if metrics is not None:
+            metrics.close()
+        if tracer is not None:
+            tracer.save(args.trace)
+        if results_file is not sys.stdout:
+            results_file.close()
+    
+    return 0 if all(results) else 1
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    sys.exit(main())
@@ -0,0 +1,2267 @@
+"""
+================================================================================
+Office Optimizer Pro v5.4 - Compression Engine
+Headless core shared by the GUI, the command line and worker processes
+================================================================================
+CREATED BY: SHILEZI (https://github.com/shilezi)
+VERSION: 5.4.0 | RELEASE: 2025
+================================================================================
+PROPRIETARY SOFTWARE - ALL RIGHTS RESERVED
+Copyright © 2025 Shilezi. Unauthorized distribution is prohibited.
+================================================================================
+"""
+
+import zipfile
+import os
+import io
+import shutil
+import subprocess
+import tempfile
+import sys
+import threading
+import time
+import collections
+import concurrent.futures
+import contextlib
+from datetime import datetime
+from functools import lru_cache
+import hashlib
+import json
+import struct
+import math
+
+import office_optimizer_opc as opc
+from office_optimizer_zip import ZipWriter
+
+# Pillow and win32com are imported on first use: worker processes and
+# short CLI runs must not pay for them when a document has no media.
+
+
+@lru_cache(maxsize=None)
+def _has_com():
+    """Try to import win32com for PowerPoint automation (once per process)"""
+    try:
+        import win32com.client  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def __getattr__(name):
+    # Module-level HAS_COM is resolved lazily for existing imports
+    if name == "HAS_COM":
+        return _has_com()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+# ============================================================================
+# CONFIGURATION CONSTANTS
+# ============================================================================
+
+CONFIG = {
+    "version": "5.4.0",
+    "year": "2025",
+    "author": "Shilezi",
+    "repository": "https://github.com/shilezi/office-optimizer-pro",
+    "max_file_size": 2 * 1024 * 1024 * 1024,  # 2GB
+    "chunk_size": 10 * 1024 * 1024,
+    "temp_backup_dir": os.path.join(tempfile.gettempdir(), "office_optimizer_backups"),
+    "presets": {
+        "Balanced (Recommended)": {"quality": 70, "max_width": 1920, "target_dpi": 220},
+        "Strong (Smallest)": {"quality": 50, "max_width": 1280, "target_dpi": 150},
+        "High Quality (Print)": {"quality": 90, "max_width": 3840, "target_dpi": 330},
+        "Email (Light)": {"quality": 60, "max_width": 1024, "target_dpi": 96},
+        "Archive (Lossless)": {"quality": 95, "max_width": 1920, "target_dpi": None}
+    },
+    # Worker processes for image encoding inside one document (None = all cores)
+    "image_workers": None,
+    # Images in flight per worker before the writer waits for the oldest one
+    "image_queue_depth": 2,
+    # Batch scheduler: documents processed at once (None = one per core)
+    "batch_max_documents": None,
+    # Share of currently free RAM the batch scheduler may plan with
+    "batch_memory_fraction": 0.7,
+    # Fallback budget when free RAM cannot be determined
+    "batch_default_memory": 2 * 1024 * 1024 * 1024,
+    # Fixed per-document overhead added to the file size estimate
+    "batch_document_overhead": 64 * 1024 * 1024,
+    # Concurrent FFmpeg jobs (None = half the cores, at most 4); each gets
+    # -threads cores / media_workers, drawn from the same CPU budget as images
+    "media_workers": None,
+    # Persistent media cache (office_optimizer_cache); None = per-user cache dir
+    "media_cache_dir": None,
+    "media_cache_max_bytes": 2 * 1024 * 1024 * 1024,
+    # FFmpeg output read from a pipe stays in memory up to this size, then spills to disk
+    "media_spool_bytes": 32 * 1024 * 1024,
+    # Probe videos with ffprobe first and only re-encode when it is expected to pay off
+    "video_probe": True,
+    # Seconds kept on either side of a PowerPoint media trim when cutting the file
+    "media_trim_margin": 1.0,
+    # Incremental index of processed documents (office_optimizer_index); None = per-user dir
+    "index_path": None,
+    # Bytes all parts in flight in one engine may hold at once: compressed copies,
+    # decoded bitmaps, encoder output (None = batch_memory_fraction of free RAM)
+    "memory_budget": None,
+    # Image parts and encoded results above this size go through temp files
+    # instead of being passed between processes in memory
+    "spill_bytes": 16 * 1024 * 1024,
+    # Per-file profiling (office_optimizer_profiling): "auto" mode keeps reports
+    # only for documents slower than this many seconds
+    "profiling_threshold": 60.0,
+    # Functions and allocation sites listed in each profiling summary
+    "profiling_top": 30,
+    # SSIM-targeted JPEG quality (target_ssim): qualities searched and the
+    # most encode passes one image may take
+    "ssim_quality_range": (30, 95),
+    "ssim_max_passes": 6,
+    # Image encoder backend per output format (office_optimizer_encoders):
+    # a backend name, or "auto" to pick the fastest by a startup micro-benchmark
+    "image_encoders": {"JPEG": "pillow", "PNG": "pillow"},
+    # Dry-run estimates (office_optimizer_estimate): images really encoded per
+    # source format over the whole run and per document, and the largest parts
+    # listed per part type
+    "estimate_samples": 12,
+    "estimate_samples_per_file": 2,
+    "estimate_top_parts": 10
+}
+
+# Bump whenever the image pipeline produces different bytes for the same
+# settings, so persistent cache entries from older versions are not reused
+IMAGE_PIPELINE_VERSION = 3
+
+# Staged downscaling keeps at least this factor above the target size before
+# the final LANCZOS pass (Pillow's thumbnail() default)
+RESAMPLE_REDUCING_GAP = 2.0
+# Containers FFmpeg can demux from a pipe without seeking
+STREAMABLE_MEDIA = ('.mkv', '.webm', '.flv', '.wmv', '.asf', '.wma', '.mp3', '.wav', '.ogg', '.flac')
+# ISO media: streamable only when the moov box precedes mdat
+MP4_FAMILY = ('.mp4', '.m4v', '.mov', '.m4a', '.3gp')
+# Pipe buffer size between the archive and FFmpeg
+MEDIA_PIPE_CHUNK = 1024 * 1024
+
+# Bump whenever video/audio handling changes the output for the same settings
+MEDIA_PIPELINE_VERSION = 3
+# Codecs libx264 only beats when it gets to shrink the picture or the bitrate
+EFFICIENT_VIDEO_CODECS = ('h264', 'hevc', 'vp9', 'av1')
+# Codecs an MP4/MOV stream-copy remux can carry unchanged
+MP4_COPY_CODECS = ('h264', 'hevc', 'av1', 'mpeg4', 'aac', 'mp3', 'alac', 'ac3', 'eac3')
+# Rough libx264 bits per pixel per frame at CRF 23; each 6 CRF steps double it
+X264_BPP_AT_CRF23 = 0.1
+# Allowance for error in the predicted libx264 size before an encode is ruled out
+VIDEO_PREDICTION_MARGIN = 1.3
+# A remux is worth it when container overhead exceeds this share of the part
+REMUX_OVERHEAD_RATIO = 0.05
+
+# Display-based downscaling is skipped when it would keep more than this
+# share of the pixels per axis (not worth a resampling pass)
+DISPLAY_RESIZE_THRESHOLD = 0.9
+
+# JPEGs are decoded at 1/2, 1/4 or 1/8 scale while at least this factor
+# above the target remains (see benchmarks/bench_resample.py)
+JPEG_DRAFT_GAP = 1.5
+
+# Leading bytes of an image part read to learn its dimensions for the memory budget
+IMAGE_HEADER_PEEK = 256 * 1024
+# Decoded-to-compressed size ratio assumed when an image header cannot be read
+IMAGE_EXPANSION_ESTIMATE = 10
+
+# ============================================================================
+# CORE COMPRESSION ENGINE
+# ============================================================================
+
+_COM_LOCK = threading.Lock()
+
+
+class _Budget:
+    """Counted resource shared between threads, handed out in arrival order
+    
+    Used for CPU tokens (each running image encode holds one, each FFmpeg
+    job as many as its -threads value, so together they never oversubscribe
+    the cores) and for the bytes of parts in flight. Waiters are served in
+    arrival order, so a request for a large share is not starved by a
+    stream of small ones. Requests above the total are clamped to it.
+    """
+    
+    def __init__(self, total):
+        self.total = max(1, int(total))
+        self._available = self.total
+        self._cond = threading.Condition()
+        self._next_ticket = 0
+        self._serving = 0
+        self.peak = 0
+    
+    def acquire(self, count=1):
+        count = min(max(1, count), self.total)
+        with self._cond:
+            ticket = self._next_ticket
+            self._next_ticket += 1
+            while ticket != self._serving or self._available < count:
+                self._cond.wait()
+            self._take(count)
+            self._serving += 1
+            self._cond.notify_all()
+        return count
+    
+    def try_acquire(self, count=1):
+        """Take count at once if nobody is waiting and it is available; returns the amount or 0"""
+        count = min(max(1, count), self.total)
+        with self._cond:
+            if self._next_ticket != self._serving or self._available < count:
+                return 0
+            self._take(count)
+        return count
+    
+    def _take(self, count):
+        self._available -= count
+        self.peak = max(self.peak, self.total - self._available)
+    
+    def release(self, count=1):
+        with self._cond:
+            self._available = min(self.total, self._available + count)
+            self._cond.notify_all()
+
+
+_CPU_BUDGET = _Budget(os.cpu_count() or 1)
+
+
+def _has_actual_transparency(img):
+    """Check if PNG actually uses transparency (not just has alpha channel)
+    
+    Exact and deterministic: every pixel is considered, but the work runs
+    inside Pillow (band extrema and histograms) instead of a Python loop.
+    """
+    # Alpha below this counts as transparent (near-opaque edges are ignored)
+    threshold = 250
+    
+    if img.mode in ('RGBA', 'LA', 'PA'):
+        # LA = Luminance + Alpha, PA = Palette + Alpha
+        return img.getchannel('A').getextrema()[0] < threshold
+    
+    transparency = img.info.get('transparency')
+    if transparency is None:
+        return False
+    
+    if img.mode == 'P':
+        # tRNS is one transparent index (int) or an alpha value per palette entry (bytes)
+        if isinstance(transparency, int):
+            alpha_of = {transparency: 0}
+        else:
+            alpha_of = dict(enumerate(transparency))
+        histogram = img.histogram()
+        return any(count and alpha_of.get(index, 255) < threshold
+                   for index, count in enumerate(histogram[:256]))
+    
+    if img.mode == 'L' and isinstance(transparency, int):
+        # Grey color key: transparent only if that value occurs
+        return transparency < 256 and img.histogram()[transparency] > 0
+    
+    if img.mode == 'RGB' and isinstance(transparency, tuple):
+        # RGB color key: mark matching values per band and intersect the masks
+        from PIL import ImageChops
+        mask = None
+        for band, key in zip(img.split(), transparency):
+            band_mask = band.point(lambda v, k=key: 255 if v == k else 0)
+            mask = band_mask if mask is None else ImageChops.multiply(mask, band_mask)
+        return mask.getbbox() is not None
+    
+    return False
+
+
+def probe_number(value):
+    """float() of an ffprobe field, or None when it is missing or 'N/A'"""
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    return value if math.isfinite(value) and value > 0 else None
+
+
+def _probe_rate(value):
+    """Frames per second from an ffprobe rational such as '30000/1001'"""
+    if not isinstance(value, str) or '/' not in value:
+        return probe_number(value)
+    num, den = value.split('/', 1)
+    num, den = probe_number(num), probe_number(den)
+    return num / den if num and den else None
+
+
+def _downscale(img, max_side, timings=None):
+    """Shrink img to fit max_side x max_side, decoding JPEGs at reduced size
+    
+    draft() lets libjpeg decode at 1/2, 1/4 or 1/8 scale in the DCT domain,
+    never below JPEG_DRAFT_GAP x the target. The box is aspect-correct: the
+    square box thumbnail() passes stops most landscape photos from being
+    drafted at all. resize() with reducing_gap then does a cheap integer
+    reduce() first and the final LANCZOS pass on the small remainder.
+    
+    With a timings dict, img is decoded before resampling starts and the
+    perf_counter() of that moment is stored as timings["decoded"].
+    """
+    from PIL import Image
+    
+    scale = max_side / max(img.width, img.height)
+    target = (max(1, round(img.width * scale)), max(1, round(img.height * scale)))
+    
+    box = None
+    if img.format == 'JPEG':
+        draft_size = (int(target[0] * JPEG_DRAFT_GAP), int(target[1] * JPEG_DRAFT_GAP))
+        result = img.draft(None, draft_size)
+        if result is not None:
+            box = result[1]
+    
+    if timings is not None:
+        img.load()
+        timings["decoded"] = time.perf_counter()
+    return img.resize(target, Image.Resampling.LANCZOS, box=box, reducing_gap=RESAMPLE_REDUCING_GAP)
+
+class _SpilledPart:
+    """Encoded image left in a temp file by a worker instead of returned as bytes"""
+    
+    def __init__(self, path, size):
+        self.path = path
+        self.size = size
+
+
+# Stages an image worker times for stats["stage_times"]
+IMAGE_STAGES = ("image_decode", "image_resize", "image_encode")
+
+
+def _optimize_image_bytes(img_data, filename, settings, spill_dir=None, spill_bytes=None):
+    """Compress one image part; runs inside the image worker processes.
+    
+    img_data is the part's bytes, or the path of a temp file holding them.
+    Returns (optimized, notes, timings). optimized is None when the original
+    part should be kept because encoding did not save space, and a
+    _SpilledPart in spill_dir when it is larger than spill_bytes. timings
+    holds the seconds spent decoding, resizing and encoding (IMAGE_STAGES),
+    the CPU seconds of the whole call ("cpu"), and its perf_counter_ns()
+    start and process id for trace timelines ("started_ns", "pid").
+    Decoding errors propagate to the caller.
+    """
+    from PIL import Image
+    
+    notes = []
+    started_ns = time.perf_counter_ns()
+    started = time.perf_counter()
+    started_cpu = time.thread_time()
+    if isinstance(img_data, str):
+        # Spilled input: Pillow reads the file as it decodes
+        source, original_size = img_data, os.path.getsize(img_data)
+    else:
+        # Use BytesIO for in-memory processing
+        source, original_size = io.BytesIO(img_data), len(img_data)
+    with Image.open(source) as img:
+        max_width = settings["max_width"]
+        
+        # Pictures shown small in the document need no more pixels than
+        # their largest placement at the target DPI (both axes covered)
+        display_px = settings.get("display_px")
+        if display_px:
+            width, height = img.width, img.height
+            if img.getexif().get(0x0112, 1) in (5, 6, 7, 8):
+                # Stored sideways, displayed rotated by EXIF orientation
+                width, height = height, width
+            scale = max(display_px[0] / width, display_px[1] / height)
+            if scale < DISPLAY_RESIZE_THRESHOLD:
+                max_width = min(max_width, max(1, math.ceil(max(img.width, img.height) * scale)))
+                notes.append(f"  Sized for display: {os.path.basename(filename)} "
+                             f"({display_px[0]}x{display_px[1]}px needed)")
+        
+        # Resize if needed
+        marks = {}
+        if img.width > max_width or img.height > max_width:
+            img = _downscale(img, max_width, marks)
+        else:
+            img.load()
+        resized = time.perf_counter()
+        decoded = marks.get("decoded", resized)
+        
+        is_png = filename.lower().endswith('.png')
+        save_format = 'JPEG'
+        
+        # PNG handling with smart conversion
+        if is_png:
+            save_format = 'PNG'  # Default
+            
+            if settings["png_smart_convert"]:
+                # Check if PNG actually uses transparency
+                if not _has_actual_transparency(img):
+                    # Opaque PNG - convert to JPEG for better compression
+                    save_format = 'JPEG'
+                    img = img.convert('RGB')
+                    notes.append(f"  Converted PNG to JPEG: {os.path.basename(filename)}")
+        
+        # Handle other formats
+        if not is_png and img.mode != 'RGB':
+            img = img.convert('RGB')
+        
+        # Save with appropriate settings, through the configured encoder backend
+        import office_optimizer_encoders
+        backend = office_optimizer_encoders.get_backend((settings.get("encoders") or {}).get(save_format))
+        if save_format == 'JPEG' and settings.get("target_ssim"):
+            # Lowest quality that still looks the same, searched on the pixels already in memory
+            import office_optimizer_quality as perceptual
+            low, high = settings["ssim_quality_range"]
+            data, quality, score, passes = perceptual.search_jpeg_quality(
+                img, settings["target_ssim"], low, high, settings["ssim_max_passes"],
+                encoder=lambda image, q: backend.encode(image, 'JPEG', q))
+            notes.append(f"  Quality {quality} for SSIM {score:.4f} ({passes} passes): {os.path.basename(filename)}")
+        else:
+            data = backend.encode(img, save_format, settings["quality"])
+        
+        timings = {"image_decode": decoded - started, "image_resize": resized - decoded,
+                   "image_encode": time.perf_counter() - resized,
+                   "cpu": time.thread_time() - started_cpu, "started_ns": started_ns, "pid": os.getpid()}
+        
+        # Only replace if we actually saved space
+        if len(data) < original_size:
+            if spill_dir and len(data) > spill_bytes:
+                fd, path = tempfile.mkstemp(dir=spill_dir, suffix=".out")
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(data)
+                return _SpilledPart(path, len(data)), notes, timings
+            return data, notes, timings
+        return None, notes, timings
+
+
+class _PackagePlan:
+    """Decisions taken by the pre-pass over a package before any entry is written"""
+    
+    def __init__(self):
+        # Image zip name -> (width, height) in pixels needed for its largest placement
+        self.display_px = {}
+        # Duplicate media part -> first identical part in archive order
+        self.duplicates = {}
+        # Zip names left out of the output archive
+        self.dropped = set()
+        # Part key -> zip name that relationship targets are redirected to
+        self.renames = {}
+        # Zip name -> new bytes for structural XML edits (layout removal)
+        self.replacements = {}
+        # Media zip name -> PowerPoint trim shared by all its uses (see opc.media_trims)
+        self.media_trims = {}
+        # Slide XML parts holding those trims; written last, once the cuts are known
+        self.trim_sources = set()
+        # Media zip name -> (start_ms, tail_ms) actually cut (filled by the writer)
+        self.applied_cuts = {}
+        # Temp directory for spilled image parts (created on first use)
+        self.spill_dir = None
+        # Image worker pool the document's parts are submitted to (None: in-process)
+        self.pool = None
+        # Image zip names served from the media cache
+        self.cache_hits = set()
+        # office_optimizer_metrics.FileMetrics of this document, when collecting
+        self.metrics = None
+    
+    @property
+    def rewrites_xml(self):
+        return bool(self.renames or self.dropped or self.replacements or self.trim_sources)
+
+
+class OfficeCompressor:
+    """Main compression engine with enhanced features - Shilezi v5.4 (2025)"""
+    
+    def __init__(self, quality=70, max_width=1920, compress_video=False, 
+                 png_smart_convert=False, enable_backup=True, workers=None,
+                 cache=None, collapse_duplicates=False, target_dpi=None,
+                 prune_orphans=True, prune_layouts=True, trim_media=True,
+                 memory_budget=None, metrics=None, profiler=None, tracer=None,
+                 target_ssim=None, encoders=None):
+        self.quality = quality
+        self.max_width = max_width
+        # JPEG quality searched per image to reach this SSIM (None = fixed quality)
+        if target_ssim:
+            import office_optimizer_quality as perceptual
+            if not perceptual.available():
+                # The search needs numpy; without it the preset quality is used
+                target_ssim = None
+        self.target_ssim = target_ssim
+        # Encoder backend per output format; "auto" benchmarks the available ones
+        encoders = dict(CONFIG["image_encoders"], **(encoders or {}))
+        if any(name != "pillow" for name in encoders.values()):
+            import office_optimizer_encoders
+            encoders = office_optimizer_encoders.resolve(encoders, quality)
+        self.encoders = encoders
+        # Pixels per inch kept for each picture's rendered size (None = max_width only)
+        self.target_dpi = target_dpi
+        self.compress_video_flag = compress_video
+        self.png_smart_convert = png_smart_convert
+        self.enable_backup = enable_backup
+        self.collapse_duplicates = collapse_duplicates
+        self.prune_orphans = prune_orphans
+        # Unused slide layouts/masters are unlinked, then removed by orphan pruning
+        self.prune_layouts = prune_layouts
+        # Cut video/audio to the range PowerPoint trims it to when transcoding
+        self.trim_media = trim_media
+        self.chunk_size = CONFIG["chunk_size"]
+        
+        # Image worker pool (created on first use, shared by all compress calls)
+        if workers is None:
+            workers = CONFIG["image_workers"] or os.cpu_count() or 1
+        self.workers = max(1, int(workers))
+        self._pool = None
+        self._pool_lock = threading.Lock()
+        
+        # FFmpeg jobs run on threads (each drives one subprocess)
+        cores = os.cpu_count() or 1
+        self.media_workers = max(1, CONFIG["media_workers"] or min(4, cores // 2))
+        self.ffmpeg_threads = max(1, cores // self.media_workers)
+        self._media_pool = None
+        
+        # Bytes held by parts in flight, shared by all compress calls on this engine
+        if memory_budget is None:
+            memory_budget = CONFIG["memory_budget"]
+        if memory_budget is None:
+            available = _available_memory()
+            memory_budget = (int(available * CONFIG["batch_memory_fraction"]) if available
+                             else CONFIG["batch_default_memory"])
+        self._memory = _Budget(memory_budget)
+        
+        # Optional office_optimizer_cache.MediaCache shared across runs
+        self.cache = cache
+        # Optional office_optimizer_metrics.MetricsCollector (per-file and per-part counters)
+        self.metrics = metrics
+        # Optional office_optimizer_profiling.Profiler (cProfile/tracemalloc per document)
+        self.profiler = profiler
+        # Optional office_optimizer_trace.TraceRecorder (timeline of every stage)
+        self.tracer = tracer
+        self.stats = {
+            "files_processed": 0,
+            "total_savings_bytes": 0,
+            "total_original_size": 0,
+            "processing_time": 0,
+            "media_cache_hits": 0,
+            "peak_rss_bytes": None,
+            # Seconds per pipeline stage, summed over files (worker stages over processes)
+            "stage_times": collections.defaultdict(float),
+            "started_at": None,
+            "finished_at": None
+        }
+        # compress() may run on several batch threads sharing this engine
+        self._stats_lock = threading.Lock()
+        
+        # Locate FFmpeg (ffprobe is optional and only used to plan video work)
+        self.ffmpeg_path = self._find_ffmpeg()
+        self.ffprobe_path = self._find_ffprobe()
+        self._probe_cache = {}
+        
+        # Create backup directory
+        if enable_backup and not os.path.exists(CONFIG["temp_backup_dir"]):
+            os.makedirs(CONFIG["temp_backup_dir"], exist_ok=True)
+    
+    def _find_ffmpeg(self):
+        """Find FFmpeg executable in various locations"""
+        # Check in current directory
+        if getattr(sys, 'frozen', False):
+            base_path = os.path.dirname(sys.executable)
+        else:
+            base_path = os.path.dirname(os.path.abspath(__file__))
+        
+        # Check local directory first
+        local_ffmpeg = os.path.join(base_path, "ffmpeg.exe")
+        if os.path.exists(local_ffmpeg):
+            return local_ffmpeg
+        
+        # Check in ffmpeg/ subdirectory
+        ffmpeg_dir = os.path.join(base_path, "ffmpeg")
+        if os.path.exists(ffmpeg_dir):
+            local_ffmpeg = os.path.join(ffmpeg_dir, "ffmpeg.exe")
+            if os.path.exists(local_ffmpeg):
+                return local_ffmpeg
+        
+        # Check system PATH
+        return shutil.which("ffmpeg")
+    
+    def _find_ffprobe(self):
+        """Find ffprobe next to the FFmpeg executable, then on PATH"""
+        if self.ffmpeg_path:
+            directory, name = os.path.split(self.ffmpeg_path)
+            local_ffprobe = os.path.join(directory, name.replace("ffmpeg", "ffprobe", 1))
+            if local_ffprobe != self.ffmpeg_path and os.path.exists(local_ffprobe):
+                return local_ffprobe
+        return shutil.which("ffprobe")
+    
+    def close(self):
+        """Shut down the image worker pool and the FFmpeg job threads"""
+        with self._pool_lock:
+            pool, self._pool = self._pool, None
+            media_pool, self._media_pool = self._media_pool, None
+        if pool is not None:
+            pool.shutdown(wait=True)
+        if media_pool is not None:
+            media_pool.shutdown(wait=True)
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+    
+    def _get_pool(self):
+        """Return the image worker pool, or None when running single-process"""
+        if self.workers <= 1:
+            return None
+        with self._pool_lock:
+            if self._pool is None:
+                try:
+                    self._pool = concurrent.futures.ProcessPoolExecutor(max_workers=self.workers)
+                except Exception:
+                    # Process pools are unavailable in some sandboxes; stay in-process
+                    self.workers = 1
+                    return None
+            return self._pool
+    
+    def _reset_pool(self, pool):
+        """Drop a broken image worker pool so the next _get_pool() starts a new one"""
+        if pool is None:
+            return
+        with self._pool_lock:
+            # Another job may already have replaced it
+            if self._pool is pool:
+                self._pool = None
+        pool.shutdown(wait=False)
+    
+    def _get_media_pool(self):
+        """Return the thread pool that runs FFmpeg jobs"""
+        with self._pool_lock:
+            if self._media_pool is None:
+                self._media_pool = concurrent.futures.ThreadPoolExecutor(
+                    max_workers=self.media_workers, thread_name_prefix="ffmpeg")
+            return self._media_pool
+    
+    def _image_settings(self):
+        """Settings shipped to the image workers with every part"""
+        settings = {
+            "pipeline": IMAGE_PIPELINE_VERSION,
+            "quality": self.quality,
+            "max_width": self.max_width,
+            "png_smart_convert": self.png_smart_convert
+        }
+        if self.target_ssim:
+            # Only present when enabled, so fixed-quality cache keys stay the same
+            settings.update({
+                "target_ssim": self.target_ssim,
+                "ssim_quality_range": list(CONFIG["ssim_quality_range"]),
+                "ssim_max_passes": CONFIG["ssim_max_passes"]
+            })
+        if any(name != "pillow" for name in self.encoders.values()):
+            # Backends produce different bytes; Pillow-only keys stay the same
+            settings["encoders"] = dict(self.encoders)
+        return settings
+    
+    def part_settings(self, zip_info, plan=None):
+        """Image settings for one part, including its display size when known"""
+        settings = self._image_settings()
+        if plan is not None and zip_info.filename in plan.display_px:
+            settings["display_px"] = plan.display_px[zip_info.filename]
+        return settings
+    
+    def encode_image(self, zip_info, in_zip, plan=None):
+        """Encode an image part in this process exactly as a worker would
+        
+        Returns (bytes or None when encoding does not help, notes, timings).
+        """
+        return _optimize_image_bytes(in_zip.read(zip_info.filename), zip_info.filename,
+                                     self.part_settings(zip_info, plan))
+    
+    def output_settings(self):
+        """Everything that affects the output file (used by the incremental index)"""
+        settings = self._image_settings()
+        settings.update({
+            "version": CONFIG["version"],
+            "target_dpi": self.target_dpi,
+            "compress_video": bool(self.compress_video_flag),
+            "media_pipeline": MEDIA_PIPELINE_VERSION if self.compress_video_flag else None,
+            "trim_media": bool(self.compress_video_flag and self.trim_media),
+            "collapse_duplicates": bool(self.collapse_duplicates),
+            "prune_orphans": bool(self.prune_orphans),
+            "prune_layouts": bool(self.prune_orphans and self.prune_layouts)
+        })
+        return settings
+    
+    def check_ffmpeg(self):
+        """Check if FFmpeg is available and working"""
+        if not self.ffmpeg_path:
+            return False, "FFmpeg not found. Video/Audio compression disabled."
+        
+        try:
+            startupinfo = None
+            if os.name == 'nt':
+                startupinfo = subprocess.STARTUPINFO()
+                startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
+            
+            result = subprocess.run(
+                [self.ffmpeg_path, "-version"],
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                startupinfo=startupinfo,
+                timeout=5
+            )
+            
+            if result.returncode == 0:
+                return True, f"Ready: {os.path.basename(self.ffmpeg_path)}"
+            else:
+                return False, "FFmpeg returned error code"
+        
+        except subprocess.TimeoutExpired:
+            return False, "FFmpeg check timeout"
+        except Exception as e:
+            return False, f"FFmpeg Error: {str(e)}"
+    
+    def validate_file(self, filepath):
+        """Validate if file is a valid Office file and within size limits"""
+        # Check file exists
+        if not os.path.exists(filepath):
+            return False, "File does not exist"
+        
+        # Check file size
+        size = os.path.getsize(filepath)
+        if size > CONFIG["max_file_size"]:
+            return False, f"File too large ({self._format_bytes(size)} > {self._format_bytes(CONFIG['max_file_size'])})"
+        
+        # Check if it's a valid Office file (zip with specific structure)
+        if not filepath.lower().endswith(('.pptx', '.docx', '.xlsx')):
+            return False, "Not a supported Office file (.pptx, .docx, .xlsx)"
+        
+        try:
+            with zipfile.ZipFile(filepath, 'r') as zf:
+                # Quick validation by checking for required Office file structure
+                required = ['[Content_Types].xml']
+                has_required = any(f in zf.namelist() for f in required)
+                if not has_required:
+                    return False, "Not a valid Office file (missing required structure)"
+            return True, "Valid"
+        except zipfile.BadZipFile:
+            return False, "Not a valid ZIP/Office file"
+        except Exception as e:
+            return False, f"Validation error: {str(e)}"
+    
+    def create_backup(self, filepath):
+        """Create timestamped backup of original file"""
+        if not self.enable_backup:
+            return None
+        
+        # Microseconds keep names unique when same-named files run concurrently
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+        backup_name = f"{os.path.basename(filepath)}.backup_{timestamp}"
+        backup_path = os.path.join(CONFIG["temp_backup_dir"], backup_name)
+        
+        try:
+            shutil.copy2(filepath, backup_path)
+            return backup_path
+        except Exception:
+            return None
+    
+    def restore_backup(self, backup_path, original_path):
+        """Restore file from backup"""
+        if backup_path and os.path.exists(backup_path):
+            try:
+                shutil.copy2(backup_path, original_path)
+                return True
+            except Exception:
+                return False
+        return False
+    
+    def _has_actual_transparency(self, img):
+        """Check if PNG actually uses transparency (not just has alpha channel)"""
+        return _has_actual_transparency(img)
+    
+    def compress(self, input_path, output_path, progress_callback=None, log_callback=None):
+        """Main compression method with enhanced error handling"""
+        if self.metrics is None and self.profiler is None and self.tracer is None:
+            return self._compress(input_path, output_path, progress_callback, log_callback)
+        
+        file_metrics = self.metrics.start_file(input_path) if self.metrics is not None else None
+        capture = self.profiler.start(input_path) if self.profiler is not None else None
+        started_ns = time.perf_counter_ns()
+        success = False
+        try:
+            success = self._compress(input_path, output_path, progress_callback, log_callback, file_metrics)
+        finally:
+            if self.tracer is not None:
+                self.tracer.add_span(os.path.basename(input_path), "document", started_ns,
+                                     time.perf_counter_ns() - started_ns, file=input_path, ok=success)
+            if capture is not None:
+                report = self.profiler.finish(capture, success)
+                if report and log_callback:
+                    log_callback(f"Profile saved: {report}")
+            if file_metrics is not None:
+                self.metrics.finish_file(file_metrics, success, output_path)
+        return success
+    
+    def _compress(self, input_path, output_path, progress_callback=None, log_callback=None, file_metrics=None):
+        start_time = time.time()
+        original_size = os.path.getsize(input_path)
+        working_input = input_path
+        temp_cleaned = None
+        backup_path = None
+        
+        try:
+            # Validate input file
+            with self._stage("validate"):
+                is_valid, msg = self.validate_file(input_path)
+            if not is_valid:
+                if log_callback:
+                    log_callback(f"Validation failed: {msg}")
+                return False
+            
+            # Create backup if enabled
+            if self.enable_backup:
+                with self._stage("backup"):
+                    backup_path = self.create_backup(input_path)
+                if backup_path and log_callback:
+                    log_callback(f"Backup created: {os.path.basename(backup_path)}")
+            
+            # Step 0: Structure Clean (PowerPoint only)
+            if input_path.lower().endswith('.pptx') and _has_com():
+                # One PowerPoint automation session at a time across batch threads
+                with _COM_LOCK, self._stage("structure_clean"):
+                    working_input = self._clean_presentation_structure(input_path, log_callback)
+                if working_input != input_path:
+                    temp_cleaned = working_input
+            
+            # Open input and output ZIP files
+            with zipfile.ZipFile(working_input, 'r') as in_zip:
+                with ZipWriter(output_path, compression=zipfile.ZIP_DEFLATED) as out_zip:
+                    
+                    file_list = in_zip.infolist()
+                    total_files = len(file_list)
+                    with self._stage("plan"):
+                        plan = self.plan_package(in_zip, file_list, log_callback)
+                    plan.metrics = file_metrics
+                    
+                    # Images are encoded in the worker pool while this thread
+                    # stays the only writer, emitting entries in original order
+                    image_count = sum(1 for item in file_list if self._is_image(item.filename.lower()))
+                    transcode_media = self.compress_video_flag and self.ffmpeg_path
+                    pool = self._get_pool() if image_count > 1 else None
+                    plan.pool = pool
+                    queue_limit = self.workers * CONFIG["image_queue_depth"]
+                    pending = collections.deque()
+                    in_flight = 0
+                    deferred = []
+                    shared_jobs = {}
+                    canonicals = set(plan.duplicates.values())
+                    
+                    def write_head():
+                        nonlocal in_flight
+                        head, head_job, head_submitted, head_reserved = pending.popleft()
+                        if head_submitted:
+                            in_flight -= 1
+                        try:
+                            self._write_entry(head, head_job, in_zip, out_zip, log_callback, plan)
+                        finally:
+                            if head_reserved:
+                                self._memory.release(head_reserved)
+                    
+                    def reserve(item):
+                        # Parts only start once their memory fits the engine budget;
+                        # finish this document's own queue before waiting on others
+                        cost = self._part_memory(item, in_zip)
+                        reserved = self._memory.try_acquire(cost)
+                        while not reserved and pending:
+                            write_head()
+                            reserved = self._memory.try_acquire(cost)
+                        return reserved or self._memory.acquire(cost)
+                    
+                    try:
+                        for i, item in enumerate(file_list):
+                            # Update progress
+                            if progress_callback and i % 10 == 0:
+                                progress_pct = (i / total_files) * 100
+                                progress_callback(progress_pct)
+                            
+                            if item.filename in plan.dropped:
+                                if file_metrics is not None:
+                                    file_metrics.record_dropped(self.part_type(item.filename),
+                                                                item.file_size)
+                                continue
+                            if item.filename in plan.trim_sources:
+                                # Retimed after the media it trims has been cut
+                                deferred.append(item)
+                                continue
+                            
+                            job = None
+                            submitted = False
+                            reserved = 0
+                            if self._is_image(item.filename.lower()):
+                                canonical = plan.duplicates.get(item.filename)
+                                if canonical in shared_jobs:
+                                    # Identical bytes are already queued - reuse that encode
+                                    job = (shared_jobs[canonical][0], None)
+                                else:
+                                    reserved = reserve(item)
+                                    try:
+                                        # Reading the part and waiting for a free CPU slot
+                                        with self._stage("submit_images", item.filename):
+                                            job = self._submit_image(item, in_zip, pool, plan)
+                                    except BaseException:
+                                        self._memory.release(reserved)
+                                        raise
+                                    submitted = True
+                                    in_flight += 1
+                                    if item.filename in canonicals:
+                                        shared_jobs[item.filename] = job
+                            elif transcode_media and self._is_media(item.filename.lower()):
+                                # FFmpeg runs alongside image encoding and other clips
+                                reserved = reserve(item)
+                                job = self._submit_media(item, in_zip, trim=plan.media_trims.get(item.filename))
+                                submitted = True
+                                in_flight += 1
+                            pending.append((item, job, submitted, reserved))
+                            
+                            # Write everything that is ready; block on the oldest
+                            # job only when too many are in flight
+                            while pending:
+                                head_job = pending[0][1]
+                                if head_job is not None and not head_job[0].done() and in_flight < queue_limit:
+                                    break
+                                write_head()
+                        
+                        while pending:
+                            write_head()
+                        for item in deferred:
+                            self._write_entry(item, None, in_zip, out_zip, log_callback, plan)
+                    except BaseException:
+                        # Stop queued work and wait for running FFmpeg jobs before the input closes
+                        self._discard_jobs(pending)
+                        raise
+                    finally:
+                        if plan.spill_dir:
+                            shutil.rmtree(plan.spill_dir, ignore_errors=True)
+            
+            # Calculate statistics
+            compressed_size = os.path.getsize(output_path)
+            end_time = time.time()
+            peak_rss = _peak_rss()
+            with self._stats_lock:
+                self.stats["files_processed"] += 1
+                self.stats["total_original_size"] += original_size
+                self.stats["total_savings_bytes"] += (original_size - compressed_size)
+                self.stats["processing_time"] += (end_time - start_time)
+                if self.stats["started_at"] is None or start_time < self.stats["started_at"]:
+                    self.stats["started_at"] = start_time
+                self.stats["finished_at"] = max(self.stats["finished_at"] or end_time, end_time)
+                if peak_rss is not None:
+                    self.stats["peak_rss_bytes"] = max(self.stats["peak_rss_bytes"] or 0, peak_rss)
+            
+            if log_callback:
+                savings_pct = ((original_size - compressed_size) / original_size * 100) if original_size > 0 else 0
+                log_callback(f"Complete: Saved {self._format_bytes(original_size - compressed_size)} ({savings_pct:.1f}%)")
+            
+            # Clean up temporary files
+            if temp_cleaned and os.path.exists(temp_cleaned):
+                try:
+                    shutil.rmtree(os.path.dirname(temp_cleaned), ignore_errors=True)
+                except:
+                    pass
+            
+            return True
+        
+        except Exception as e:
+            if log_callback:
+                log_callback(f"Error: {str(e)}")
+            
+            # Try to restore from backup on error
+            if backup_path and os.path.exists(backup_path):
+                self.restore_backup(backup_path, input_path)
+                if log_callback:
+                    log_callback("Restored from backup due to error")
+            
+            return False
+    
+    def _clean_presentation_structure(self, input_path, log_callback=None):
+        """Clean PowerPoint presentation structure (remove unused layouts)"""
+        if not _has_com():
+            return input_path
+        
+        try:
+            temp_dir = tempfile.mkdtemp()
+            temp_pptx = os.path.join(temp_dir, "clean_" + os.path.basename(input_path))
+            shutil.copy2(input_path, temp_pptx)
+            
+            if log_callback:
+                log_callback("Optimizing PowerPoint structure...")
+            
+            ppt_app = None
+            presentation = None
+            
+            try:
+                # Initialize PowerPoint
+                import win32com.client
+                ppt_app = win32com.client.Dispatch("PowerPoint.Application")
+                ppt_app.Visible = False
+                ppt_app.DisplayAlerts = False
+                
+                # Open presentation
+                abs_path = os.path.abspath(temp_pptx)
+                presentation = ppt_app.Presentations.Open(abs_path, WithWindow=False)
+                
+                # Save cleaned copy
+                cleaned_path = os.path.join(temp_dir, "cleaned_structure.pptx")
+                presentation.SaveCopyAs(os.path.abspath(cleaned_path))
+                
+                return cleaned_path
+            
+            except Exception as e:
+                if log_callback:
+                    log_callback(f"PowerPoint optimization skipped: {str(e)}")
+                return input_path
+            
+            finally:
+                # Clean up COM objects properly
+                if presentation:
+                    presentation.Close()
+                if ppt_app:
+                    ppt_app.Quit()
+                
+                # Force garbage collection
+                import gc
+                gc.collect()
+        
+        except Exception:
+            return input_path
+    
+    def _submit_image(self, zip_info, in_zip, pool, plan=None):
+        """Queue an image part for encoding; returns a (future, cache_key) job"""
+        settings = self.part_settings(zip_info, plan)
+        spill_dir = None
+        if plan is not None and zip_info.file_size > CONFIG["spill_bytes"]:
+            # Large parts reach the worker as a file; it decodes straight from disk
+            spill_dir = self._spill_dir(plan)
+            img_data, digest = self._spill_part(zip_info, in_zip, spill_dir)
+        else:
+            img_data, digest = in_zip.read(zip_info.filename), None
+        
+        # Persistent cache: a hit skips decoding and encoding entirely
+        cache_key = None
+        if self.cache is not None:
+            if digest is not None:
+                cache_key = self.cache.key_for_digest(digest, settings)
+            else:
+                cache_key = self.cache.make_key(img_data, settings)
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                with self._stats_lock:
+                    self.stats["media_cache_hits"] += 1
+                if plan is not None:
+                    plan.cache_hits.add(zip_info.filename)
+                future = concurrent.futures.Future()
+                future.set_result((cached or None, [], {}))
+                self._remove_spilled(img_data)
+                return future, None
+        
+        # One CPU token per encode, returned when it finishes
+        _CPU_BUDGET.acquire(1)
+        
+        metrics = plan.metrics if plan is not None else None
+        pooled = pool is not None
+        
+        def finished(done):
+            _CPU_BUDGET.release(1)
+            self._remove_spilled(img_data)
+            if not done.cancelled() and done.exception() is None:
+                timings = done.result()[2]
+                for stage in IMAGE_STAGES:
+                    self._add_stage_time(stage, timings[stage])
+                if pooled and metrics is not None:
+                    # In-process encodes are already in the writer thread's CPU time
+                    metrics.add_worker_cpu(timings["cpu"])
+                if self.tracer is not None:
+                    self._trace_worker(zip_info.filename, timings, pooled)
+        
+        spill_bytes = CONFIG["spill_bytes"]
+        if pool is not None:
+            try:
+                future = pool.submit(_optimize_image_bytes, img_data, zip_info.filename, settings,
+                                     spill_dir, spill_bytes)
+                future.add_done_callback(finished)
+                return future, cache_key
+            except concurrent.futures.BrokenExecutor:
+                self._reset_pool(pool)
+                pooled = False
+            except RuntimeError:
+                pooled = False
+        
+        future = concurrent.futures.Future()
+        try:
+            future.set_result(_optimize_image_bytes(img_data, zip_info.filename, settings, spill_dir, spill_bytes))
+        except Exception as e:
+            future.set_exception(e)
+        finally:
+            finished(future)
+        return future, cache_key
+    
+    def _spill_dir(self, plan):
+        """Per-document temp directory for spilled parts, removed when the document is done"""
+        if plan.spill_dir is None:
+            plan.spill_dir = tempfile.mkdtemp(prefix="office_optimizer_spill_")
+        return plan.spill_dir
+    
+    def _spill_part(self, zip_info, in_zip, spill_dir):
+        """Copy a part to a temp file in chunks; returns (path, SHA-256 hex digest)"""
+        digest = hashlib.sha256()
+        fd, path = tempfile.mkstemp(dir=spill_dir, suffix=os.path.splitext(zip_info.filename)[1])
+        with os.fdopen(fd, 'wb') as dst, in_zip.open(zip_info) as src:
+            for chunk in iter(lambda: src.read(self.chunk_size), b""):
+                digest.update(chunk)
+                dst.write(chunk)
+        return path, digest.hexdigest()
+    
+    def _part_digest(self, zip_info, in_zip):
+        """SHA-256 hex digest of a part, read in chunks"""
+        digest = hashlib.sha256()
+        with in_zip.open(zip_info) as src:
+            for chunk in iter(lambda: src.read(self.chunk_size), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+    
+    def _remove_spilled(self, img_data):
+        if isinstance(img_data, str):
+            try:
+                os.remove(img_data)
+            except OSError:
+                pass
+    
+    def _part_memory(self, zip_info, in_zip):
+        """Bytes a part is expected to hold while in flight
+        
+        Images: the compressed bytes in the writer and in the worker (unless
+        spilled), the decoded bitmap (Pillow keeps 4 bytes per pixel; JPEGs
+        decode at the draft scale) plus a resized copy, and the output;
+        with target_ssim, the quality search's planes and bands as well.
+        Media: FFmpeg output spooled in memory and the pipe buffers.
+        """
+        if self._is_media(zip_info.filename.lower()):
+            return CONFIG["media_spool_bytes"] + 2 * MEDIA_PIPE_CHUNK
+        
+        size = zip_info.file_size
+        compressed = size if size > CONFIG["spill_bytes"] else 3 * size
+        dimensions = self._image_dimensions(zip_info, in_zip)
+        if dimensions is None:
+            return compressed + size * IMAGE_EXPANSION_ESTIMATE
+        
+        (width, height), is_jpeg = dimensions
+        longest = max(width, height, 1)
+        target = min(self.max_width, longest)
+        reduction = 1
+        if is_jpeg:
+            while reduction < 8 and longest / (reduction * 2) >= target * JPEG_DRAFT_GAP:
+                reduction *= 2
+        decoded = (width // reduction) * (height // reduction) * 4
+        resized = decoded * (target / longest * reduction) ** 2
+        search = 0
+        if self.target_ssim:
+            import office_optimizer_quality as perceptual
+            search = perceptual.working_set(int(resized // 4))
+        return int(compressed + decoded + resized + search)
+    
+    def _image_dimensions(self, zip_info, in_zip):
+        """((width, height), is_jpeg) read from the start of an image part, or None"""
+        try:
+            from PIL import Image
+            with in_zip.open(zip_info) as src:
+                head = src.read(IMAGE_HEADER_PEEK)
+            with Image.open(io.BytesIO(head)) as img:
+                return img.size, img.format == 'JPEG'
+        except Exception:
+            return None
+    
+    def _discard_jobs(self, pending):
+        """Cancel queued jobs after a failure, remove finished media temp files and free their memory"""
+        for item, job, submitted, reserved in pending:
+            if reserved:
+                self._memory.release(reserved)
+            if job is None or not submitted or job[0].cancel():
+                continue
+            if self._is_media(item.filename.lower()):
+                try:
+                    result = job[0].result()
+                except Exception:
+                    continue
+                output = result[0] if result is not None else None
+                if output is not None:
+                    output[1].close()
+                    shutil.rmtree(output[0], ignore_errors=True)
+    
+    @contextlib.contextmanager
+    def _stage(self, name, part=None):
+        """Add the wall time of the enclosed block to stats["stage_times"][name]
+        
+        With a tracer the block is also recorded as a span (part: the zip entry it handled).
+        """
+        started_ns = time.perf_counter_ns()
+        try:
+            yield
+        finally:
+            elapsed_ns = time.perf_counter_ns() - started_ns
+            self._add_stage_time(name, elapsed_ns / 1e9)
+            if self.tracer is not None:
+                if part is None:
+                    self.tracer.add_span(name, "stage", started_ns, elapsed_ns)
+                else:
+                    self.tracer.add_span(name, "part", started_ns, elapsed_ns, part=part)
+    
+    def _trace_worker(self, part, timings, pooled):
+        """Decode, resize and encode spans of one image job, on its worker process track"""
+        # In-process encodes stay on the calling thread's track
+        track = timings["pid"] if pooled else None
+        start_ns = timings["started_ns"]
+        for stage in IMAGE_STAGES:
+            duration_ns = int(timings[stage] * 1e9)
+            self.tracer.add_span(stage, "worker", start_ns, duration_ns, pid=track, tid=track, part=part)
+            start_ns += duration_ns
+    
+    def _add_stage_time(self, name, seconds):
+        with self._stats_lock:
+            self.stats["stage_times"][name] += seconds
+        if self.metrics is not None:
+            self.metrics.add_stage(name, seconds)
+    
+    def _entry_stage(self, zip_info, job):
+        """Stage an entry's write time is booked under (waiting for its job included)"""
+        f_lower = zip_info.filename.lower()
+        if self._is_media(f_lower) and (job is not None or self.compress_video_flag):
+            return "write_media"
+        if job is not None:
+            return "write_images"
+        if f_lower.endswith(('.xml', '.rels')):
+            return "write_xml"
+        return "write_other"
+    
+    def _write_entry(self, zip_info, job, in_zip, out_zip, log_callback=None, plan=None):
+        """Write one entry to the output archive (called from the writer thread only)"""
+        with self._stage(self._entry_stage(zip_info, job), zip_info.filename):
+            if plan is None or plan.metrics is None:
+                self._write_part(zip_info, job, in_zip, out_zip, log_callback, plan)
+                return
+            
+            if job is not None:
+                # Time spent waiting for the worker is queueing, not this part's latency
+                concurrent.futures.wait([job[0]])
+            written = len(out_zip.filelist)
+            started, started_cpu = time.perf_counter(), time.thread_time()
+            self._write_part(zip_info, job, in_zip, out_zip, log_callback, plan)
+            wall, cpu = time.perf_counter() - started, time.thread_time() - started_cpu
+        
+        name = zip_info.filename
+        # Duplicate images share the first copy's encode; duplicate media run their own
+        reused = job is not None and name in plan.duplicates and self._is_image(name.lower())
+        if job is not None and not reused:
+            try:
+                timings = job[0].result()[2]
+            except Exception:
+                timings = {}
+            # Image workers report decode/encode and CPU; FFmpeg jobs their wall time
+            wall += sum(timings.get(stage, 0.0) for stage in IMAGE_STAGES + ("ffmpeg",))
+            cpu += timings.get("cpu", 0.0)
+        bytes_out = out_zip.filelist[-1].file_size if len(out_zip.filelist) > written else 0
+        plan.metrics.record_part(self.part_type(name), zip_info.file_size, bytes_out, wall, cpu,
+                                 cache_hit=name in plan.cache_hits, reused=reused)
+    
+    def part_type(self, filename):
+        """Category of a part for metrics and estimates: image, video, audio, xml or other"""
+        f_lower = filename.lower()
+        if self._is_image(f_lower):
+            return "image"
+        if self._is_video(f_lower):
+            return "video"
+        if self._is_audio(f_lower):
+            return "audio"
+        if f_lower.endswith(('.xml', '.rels')):
+            return "xml"
+        return "other"
+    
+    def _write_part(self, zip_info, job, in_zip, out_zip, log_callback=None, plan=None):
+        f_lower = zip_info.filename.lower()
+        
+        # Process based on file type
+        if plan is not None and plan.rewrites_xml and self._write_package_xml(zip_info, in_zip, out_zip, plan):
+            return
+        elif job is not None and self._is_media(f_lower):
+            if log_callback:
+                kind = "Video" if self._is_video(f_lower) else "Audio"
+                log_callback(f"{kind}: {self._truncate_name(zip_info.filename)}...")
+            self._write_media_result(zip_info, job[0], in_zip, out_zip, log_callback, plan)
+        elif job is not None:
+            future, cache_key = job
+            result = self._collect_image(zip_info, future, in_zip, log_callback, plan)
+            if result is None:
+                self._copy_file(zip_info, in_zip, out_zip)
+                return
+            if cache_key is not None and isinstance(result[0], _SpilledPart):
+                self.cache.put_file(cache_key, result[0].path)
+            elif cache_key is not None:
+                self.cache.put(cache_key, result[0] or b"")
+            self._write_image_result(zip_info, result, in_zip, out_zip, log_callback)
+        elif self.compress_video_flag and self._is_video(f_lower):
+            if self.ffmpeg_path:
+                if log_callback:
+                    log_callback(f"Video: {self._truncate_name(zip_info.filename)}...")
+                self._process_video(zip_info, in_zip, out_zip)
+            else:
+                self._copy_file(zip_info, in_zip, out_zip)
+        elif self.compress_video_flag and self._is_audio(f_lower):
+            if self.ffmpeg_path:
+                if log_callback:
+                    log_callback(f"Audio: {self._truncate_name(zip_info.filename)}...")
+                self._process_audio(zip_info, in_zip, out_zip)
+            else:
+                self._copy_file(zip_info, in_zip, out_zip)
+        else:
+            self._copy_file(zip_info, in_zip, out_zip)
+    
+    def plan_package(self, in_zip, file_list=None, log_callback=None, verify_duplicates=True):
+        """Pre-pass over the package: find dead parts, duplicate media and display sizes before writing anything
+        
+        Returns the plan compress() writes by (see _PackagePlan). With
+        verify_duplicates=False duplicate media is matched on CRC-32, size
+        and extension alone, without hashing the parts (used by estimates).
+        """
+        if file_list is None:
+            file_list = in_zip.infolist()
+        plan = _PackagePlan()
+        
+        if self.prune_orphans:
+            if self.prune_layouts:
+                plan.replacements = self._find_unused_layouts(in_zip, file_list)
+                if plan.replacements and log_callback:
+                    log_callback("Unlinked slide layouts not used by any slide")
+            orphans = self._find_orphans(in_zip, file_list, plan.replacements)
+            if orphans:
+                plan.dropped.update(orphans)
+                if log_callback:
+                    freed = sum(in_zip.getinfo(name).compress_size for name in orphans)
+                    log_callback(f"Removed {len(orphans)} unreferenced part(s) ({self._format_bytes(freed)})")
+            # Dead parts are neither deduplicated nor measured
+            file_list = [item for item in file_list if item.filename not in plan.dropped]
+        
+        plan.duplicates = self._find_duplicate_media(in_zip, file_list, verify_duplicates)
+        if self.target_dpi:
+            plan.display_px = self._find_display_sizes(in_zip, file_list, plan.duplicates)
+        if self.trim_media and self.compress_video_flag and self.ffmpeg_path:
+            plan.media_trims, plan.trim_sources = self._find_media_trims(in_zip, file_list, plan.duplicates)
+            if plan.media_trims and log_callback:
+                log_callback(f"Found {len(plan.media_trims)} trimmed media part(s)")
+        
+        if plan.duplicates:
+            if self.collapse_duplicates:
+                # Drop the copies and point their relationships at the first one
+                plan.dropped.update(plan.duplicates)
+                plan.renames = {opc.part_key(dup): canonical for dup, canonical in plan.duplicates.items()}
+                if log_callback:
+                    log_callback(f"Merged {len(plan.duplicates)} duplicate media part(s)")
+            elif log_callback:
+                log_callback(f"Found {len(plan.duplicates)} duplicate media part(s)")
+        
+        return plan
+    
+    def _find_orphans(self, in_zip, file_list, replacements=None):
+        """Parts unreachable from the package root through relationships"""
+        replacements = replacements or {}
+        
+        def read(name):
+            # The graph is walked as it will be written, edits included
+            return replacements[name] if name in replacements else in_zip.read(name)
+        
+        try:
+            return opc.unreachable_parts([item.filename for item in file_list], read)
+        except Exception:
+            # Malformed relationships: keep everything rather than guess
+            return []
+    
+    def _find_unused_layouts(self, in_zip, file_list):
+        """Edits unlinking slide layouts and masters that no slide uses (.pptx only)"""
+        try:
+            return opc.unused_layout_edits([item.filename for item in file_list], in_zip.read)
+        except Exception:
+            return {}
+    
+    def _find_display_sizes(self, in_zip, file_list, duplicates):
+        """Pixels each image needs for its largest placement at target_dpi"""
+        # Imported here so documents without target_dpi never load ElementTree
+        import office_optimizer_layout as layout
+        
+        try:
+            sizes = layout.image_display_sizes(in_zip, file_list, self._is_image)
+        except Exception:
+            # Unreadable layout XML: fall back to max_width for every image
+            return {}
+        
+        # Identical parts share one encode, so it must satisfy every placement
+        for dup, canonical in duplicates.items():
+            if dup in sizes and canonical in sizes:
+                sizes[canonical] = (max(sizes[dup][0], sizes[canonical][0]), max(sizes[dup][1], sizes[canonical][1]))
+            else:
+                sizes.pop(canonical, None)
+            sizes.pop(dup, None)
+        
+        per_inch = self.target_dpi / layout.EMU_PER_INCH
+        return {name: (max(1, math.ceil(cx * per_inch)), max(1, math.ceil(cy * per_inch)))
+                for name, (cx, cy) in sizes.items()}
+    
+    def _find_media_trims(self, in_zip, file_list, duplicates):
+        """PowerPoint trims of media parts and the slide parts that hold them (.pptx only)"""
+        try:
+            trims, sources = opc.media_trim_ranges([item.filename for item in file_list],
+                                                   in_zip.read, self._is_media)
+        except Exception:
+            return {}, set()
+        
+        if self.collapse_duplicates:
+            # Merged copies play through the first part, which must cover every trim
+            for dup, canonical in duplicates.items():
+                if dup in trims and canonical in trims:
+                    merged = trims[canonical]
+                    merged["start"] = min(merged["start"], trims[dup]["start"])
+                    merged["end"] = min(merged["end"], trims[dup]["end"])
+                    merged["bookmarks"] += trims[dup]["bookmarks"]
+                    sources[canonical] |= sources[dup]
+                else:
+                    trims.pop(canonical, None)
+                trims.pop(dup, None)
+        
+        return trims, {name for part in trims for name in sources[part]}
+    
+    def _find_duplicate_media(self, in_zip, file_list, verify=True):
+        """Map each duplicated media part to the first identical part in the archive"""
+        groups = collections.defaultdict(list)
+        for item in file_list:
+            name = item.filename.lower()
+            if 'media/' in name and item.file_size > 0 and not item.is_dir():
+                groups[(item.CRC, item.file_size, os.path.splitext(name)[1])].append(item)
+        
+        duplicates = {}
+        for items in groups.values():
+            if len(items) < 2:
+                continue
+            if not verify:
+                duplicates.update((item.filename, items[0].filename) for item in items[1:])
+                continue
+            # CRC-32 and size only nominate candidates; SHA-256 confirms them
+            first_by_digest = {}
+            for item in items:
+                digest = hashlib.sha256()
+                with in_zip.open(item) as src:
+                    for chunk in iter(lambda: src.read(self.chunk_size), b""):
+                        digest.update(chunk)
+                canonical = first_by_digest.setdefault(digest.digest(), item.filename)
+                if canonical != item.filename:
+                    duplicates[item.filename] = canonical
+        return duplicates
+    
+    def _write_package_xml(self, zip_info, in_zip, out_zip, plan):
+        """Rewrite .rels targets, content type overrides and edited structural parts
+        
+        Returns True when the entry was written here.
+        """
+        name = zip_info.filename
+        data = plan.replacements.get(name)
+        if opc.is_rels(name) and plan.renames:
+            renamed = opc.rewrite_rels_targets(data if data is not None else in_zip.read(zip_info),
+                                               opc.source_part_for_rels(name), plan.renames)
+            if renamed is not None:
+                data = renamed
+        elif name == opc.CONTENT_TYPES and plan.dropped:
+            data = opc.remove_content_type_overrides(in_zip.read(zip_info),
+                                                     {opc.part_key(n) for n in plan.dropped})
+        elif name in plan.trim_sources:
+            retimed = self._retime_media_xml(name, data if data is not None else in_zip.read(zip_info), in_zip, plan)
+            if retimed is not None:
+                data = retimed
+        
+        if data is None:
+            return False
+        self._write_bytes(zip_info, data, out_zip)
+        return True
+    
+    def _retime_media_xml(self, name, data, in_zip, plan):
+        """Slide XML with trims and bookmarks shifted for media that was cut, or None"""
+        rels_name = opc.rels_path_for(name)
+        if rels_name not in in_zip.NameToInfo:
+            return None
+        cuts = {}
+        for rel in opc.parse_rels(in_zip.read(rels_name)):
+            if rel.get("TargetMode") == "External" or "Target" not in rel or "Id" not in rel:
+                continue
+            key = opc.resolve_target(name, rel["Target"])
+            target = plan.renames.get(key, key)
+            if target in plan.applied_cuts:
+                cuts[rel["Id"]] = plan.applied_cuts[target]
+        if not cuts:
+            return None
+        try:
+            return opc.retime_media(data, cuts)
+        except UnicodeDecodeError:
+            return None
+    
+    def _write_bytes(self, zip_info, data, out_zip):
+        """Write new content for an entry, keeping its name, date and compression"""
+        new_info = zipfile.ZipInfo(zip_info.filename, zip_info.date_time)
+        new_info.compress_type = zip_info.compress_type
+        new_info.external_attr = zip_info.external_attr
+        out_zip.writestr(new_info, data)
+    
+    def _collect_image(self, zip_info, future, in_zip, log_callback=None, plan=None):
+        """Wait for an image job; returns (optimized, notes, timings) or None on error"""
+        try:
+            try:
+                return future.result()
+            except concurrent.futures.BrokenExecutor:
+                # A worker died (e.g. out of memory) - redo this part in-process,
+                # holding a CPU token like any other encode
+                spill_dir = None
+                if plan is not None:
+                    self._reset_pool(plan.pool)
+                    spill_dir = self._spill_dir(plan)
+                _CPU_BUDGET.acquire(1)
+                try:
+                    return _optimize_image_bytes(in_zip.read(zip_info.filename), zip_info.filename,
+                                                 self.part_settings(zip_info, plan), spill_dir,
+                                                 CONFIG["spill_bytes"])
+                finally:
+                    _CPU_BUDGET.release(1)
+        except Exception as e:
+            if log_callback:
+                log_callback(f"  Image processing error: {str(e)}")
+            return None
+    
+    def _write_image_result(self, zip_info, result, in_zip, out_zip, log_callback=None):
+        """Store an encoded image, or the original part if encoding did not help"""
+        optimized, notes, _ = result
+        if log_callback:
+            for note in notes:
+                log_callback(note)
+        
+        if optimized is not None:
+            if isinstance(optimized, _SpilledPart):
+                with open(optimized.path, 'rb') as src:
+                    self._write_stream(zip_info, src, optimized.size, out_zip, out_zip.compression)
+                size = optimized.size
+            else:
+                out_zip.writestr(zip_info.filename, optimized)
+                size = len(optimized)
+            if log_callback:
+                savings = zip_info.file_size - size
+                log_callback(f"  Compressed: {os.path.basename(zip_info.filename)} (-{self._format_bytes(savings)})")
+        else:
+            # Keep original if compression didn't help
+            self._copy_file(zip_info, in_zip, out_zip)
+    
+    def _process_image(self, zip_info, in_zip, out_zip, log_callback=None):
+        """Process and compress image files"""
+        self._write_entry(zip_info, self._submit_image(zip_info, in_zip, None), in_zip, out_zip, log_callback)
+    
+    def _process_video(self, zip_info, in_zip, out_zip):
+        """Compress video files using FFmpeg"""
+        self._write_media_result(zip_info, self._submit_media(zip_info, in_zip, inline=True)[0], in_zip, out_zip)
+    
+    def _process_audio(self, zip_info, in_zip, out_zip):
+        """Compress audio files using FFmpeg"""
+        self._write_media_result(zip_info, self._submit_media(zip_info, in_zip, inline=True)[0], in_zip, out_zip)
+    
+    def _submit_media(self, zip_info, in_zip, inline=False, trim=None):
+        """Queue a video/audio transcode on the FFmpeg threads; returns a (future, None) job"""
+        if not inline:
+            return self._get_media_pool().submit(self._transcode_media, zip_info, in_zip, trim), None
+        
+        future = concurrent.futures.Future()
+        try:
+            future.set_result(self._transcode_media(zip_info, in_zip, trim))
+        except Exception as e:
+            future.set_exception(e)
+        return future, None
+    
+    def _transcode_media(self, zip_info, in_zip, trim=None):
+        """Run one FFmpeg job under the shared CPU budget
+        
+        Returns (output, notes, timings). output is (temp_dir, file object,
+        size, cut) when the result is worth keeping, else None; cut is the
+        (start_ms, tail_ms, duration_ms) removed for a PowerPoint trim, or
+        None. timings holds the seconds FFmpeg work took ("ffmpeg"). The
+        caller writes the result and removes temp_dir.
+        """
+        temp_dir = tempfile.mkdtemp()
+        notes = []
+        threads = _CPU_BUDGET.acquire(self.ffmpeg_threads)
+        started_ns = time.perf_counter_ns()
+        try:
+            if self._is_video(zip_info.filename.lower()):
+                result = self._encode_video(zip_info, in_zip, temp_dir, threads, notes, trim)
+            else:
+                result = self._encode_audio(zip_info, in_zip, temp_dir, threads, notes, trim)
+        except Exception:
+            result = None
+        finally:
+            _CPU_BUDGET.release(threads)
+            elapsed_ns = time.perf_counter_ns() - started_ns
+            timings = {"ffmpeg": elapsed_ns / 1e9}
+            self._add_stage_time("ffmpeg", timings["ffmpeg"])
+            if self.tracer is not None:
+                self.tracer.add_span("ffmpeg", "part", started_ns, elapsed_ns,
+                                     part=zip_info.filename, threads=threads)
+        
+        if result is None:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+            return None, notes, timings
+        return (temp_dir,) + result, notes, timings
+    
+    def _write_media_result(self, zip_info, future, in_zip, out_zip, log_callback=None, plan=None):
+        """Store a transcoded part, or the original when FFmpeg did not help"""
+        try:
+            output, notes, _ = future.result()
+        except Exception:
+            output, notes = None, []
+        if log_callback:
+            for note in notes:
+                log_callback(note)
+        
+        if output is None:
+            self._copy_file(zip_info, in_zip, out_zip)
+            return
+        
+        temp_dir, compressed, size, cut = output
+        try:
+            with compressed:
+                self._write_stream(zip_info, compressed, size, out_zip)
+        finally:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+        if cut is not None and plan is not None:
+            # The slides holding this trim are written last and retimed from here
+            plan.applied_cuts[zip_info.filename] = cut[:2]
+        if log_callback and size < zip_info.file_size:
+            log_callback(f"  Compressed: {os.path.basename(zip_info.filename)} "
+                         f"(-{self._format_bytes(zip_info.file_size - size)})")
+    
+    def _video_settings(self):
+        """libx264 parameters for the current quality and width limit"""
+        # Determine compression settings based on quality
+        if self.quality <= 50:  # Strong compression
+            settings = {"crf": 12, "audio_bitrate": '192k', "scale_width": 1280, "max_fps": 30, "preset": 'fast'}
+        elif self.quality <= 70:  # Balanced
+            settings = {"crf": 4, "audio_bitrate": '256k', "scale_width": 1920, "max_fps": None, "preset": 'medium'}
+        else:  # High quality
+            settings = {"crf": 1, "audio_bitrate": '320k', "scale_width": 3840, "max_fps": None, "preset": 'slow'}
+        
+        # Limit scale width
+        if self.max_width < settings["scale_width"]:
+            settings["scale_width"] = self.max_width
+        return settings
+    
+    def _encode_video(self, zip_info, in_zip, temp_dir, threads, notes=None, trim=None):
+        """Transcode or remux a video part; returns (file object, size, cut) if it paid off"""
+        original_size = zip_info.file_size
+        settings = self._video_settings()
+        notes = notes if notes is not None else []
+        name = os.path.basename(zip_info.filename)
+        
+        action, reason = "transcode", None
+        info = None
+        if (CONFIG["video_probe"] or trim) and self.ffprobe_path:
+            info = self._probe_media(zip_info, in_zip, temp_dir)
+        cut = self._media_cut(trim, info) if trim else None
+        if CONFIG["video_probe"] and info is not None:
+            action, reason, _ = self.video_decision(zip_info, in_zip, info, cut)
+            if action == "skip":
+                notes.append(f"  Kept: {name} ({reason})")
+                return None
+        
+        if action == "remux":
+            # Stream copy: rewrites the container only, with the index up front
+            ext = os.path.splitext(zip_info.filename.lower())[1]
+            output_args = ['-map', '0:v', '-map', '0:a?', '-c', 'copy', '-dn',
+                           '-map_metadata', '0', '-movflags', '+faststart']
+            result = self._run_ffmpeg(zip_info, in_zip, output_args, temp_dir,
+                                      timeout=120, output_name="remux" + ext)
+            if result is None or result[1] > original_size:
+                if result is not None:
+                    result[0].close()
+                return None
+            notes.append(f"  Remuxed: {name} ({reason}, streams copied)")
+            return result + (None,)
+        
+        fps_filter = f",fps={settings['max_fps']}" if settings["max_fps"] else ""
+        # FFmpeg arguments after the input
+        output_args = [
+            '-vcodec', 'libx264', '-crf', str(settings["crf"]),
+            '-preset', settings["preset"],
+            '-vf', f"scale='min({settings['scale_width']},iw)':-2{fps_filter}",
+            '-ac', '2', '-b:a', settings["audio_bitrate"],
+            '-threads', str(threads),
+            '-movflags', '+faststart'
+        ]
+        
+        input_args, cut_args = self._cut_args(cut)
+        
+        # +faststart rewrites the file after encoding, so MP4 output needs a real file
+        result = self._run_ffmpeg(zip_info, in_zip, cut_args + output_args, temp_dir,
+                                  timeout=300, output_name="comp.mp4", input_args=input_args)  # 5 minute timeout
+        
+        # Check if compression was beneficial
+        if result is None or result[1] >= original_size * 0.95:  # At least 5% savings
+            if result is not None:
+                result[0].close()
+            return None
+        if cut is not None:
+            notes.append(f"  Trimmed: {name} to the range the slides play")
+        return result + (cut,)
+    
+    def _media_cut(self, trim, info):
+        """(start_ms, tail_ms, duration_ms) to remove from a trimmed part, or None
+        
+        CONFIG["media_trim_margin"] is kept on both sides of the trim and no
+        bookmark is cut away. The tail is only cut when ffprobe reported the
+        duration; the start needs no duration.
+        """
+        duration = None
+        if info is not None:
+            duration = probe_number((info.get("format") or {}).get("duration"))
+        duration_ms = duration * 1000 if duration else None
+        margin = CONFIG["media_trim_margin"] * 1000
+        
+        start = max(0.0, trim["start"] - margin)
+        tail = max(0.0, trim["end"] - margin) if duration_ms else 0.0
+        if trim["bookmarks"]:
+            start = min(start, min(trim["bookmarks"]))
+            if duration_ms:
+                tail = min(tail, max(0.0, duration_ms - max(trim["bookmarks"])))
+        
+        if duration_ms and start + tail >= duration_ms - margin:
+            # The trim does not fit this file; leave it alone
+            return None
+        if start < 1 and tail < 1:
+            return None
+        return start, tail, duration_ms
+    
+    def _cut_args(self, cut):
+        """FFmpeg (input, output) arguments that cut a part to the kept range"""
+        if cut is None:
+            return [], []
+        start, tail, duration_ms = cut
+        # Seeking before -i while re-encoding is frame accurate
+        input_args = ['-ss', f"{start / 1000:.3f}"] if start else []
+        output_args = ['-t', f"{(duration_ms - start - tail) / 1000:.3f}"] if tail else []
+        return input_args, output_args
+    
+    def video_decision(self, zip_info, in_zip, info, cut=None):
+        """Choose 'transcode', 'remux' or 'skip' for a video from its ffprobe data
+        
+        Returns (action, reason, prediction), prediction being what
+        _predict_video() expects of a libx264 encode, or None. Codecs older
+        than H.264 are always re-encoded. For modern codecs the libx264
+        output size is predicted from the output pixel rate, the CRF and the
+        duration left after any trim cut, and the encode only runs when that
+        prediction (with VIDEO_PREDICTION_MARGIN of slack) beats the 5%
+        savings threshold. Otherwise an MP4/MOV whose index sits at the end,
+        or that carries notable container overhead, is remuxed with a stream
+        copy; everything else is kept as it is.
+        """
+        streams = info.get("streams") or []
+        video = next((s for s in streams if s.get("codec_type") == "video"
+                      and not (s.get("disposition") or {}).get("attached_pic")), None)
+        if video is None:
+            # No picture to re-encode; leave audio-only containers to the old path
+            return "transcode", "no video stream", None
+        
+        prediction = self._predict_video(info, self._video_settings(), cut)
+        codec = video.get("codec_name", "")
+        if codec not in EFFICIENT_VIDEO_CODECS:
+            return "transcode", f"{codec or 'unknown'} codec", prediction
+        
+        if prediction is None:
+            return "transcode", "incomplete stream details", None
+        predicted, _, _ = prediction
+        if predicted < zip_info.file_size * 0.95 * VIDEO_PREDICTION_MARGIN:
+            return "transcode", f"predicted {self._format_bytes(predicted)}", prediction
+        
+        duration = probe_number((info.get("format") or {}).get("duration")) or probe_number(video.get("duration"))
+        source_kbps = zip_info.file_size * 8 / duration / 1000
+        reason = f"already efficient {codec}, {source_kbps:.0f} kbps"
+        ext = os.path.splitext(zip_info.filename.lower())[1]
+        if ext not in MP4_FAMILY or any(s.get("codec_name") not in MP4_COPY_CODECS
+                                        for s in streams if s.get("codec_type") in ("video", "audio")):
+            return "skip", reason, prediction
+        
+        stream_bytes = sum(probe_number(s.get("bit_rate")) or 0 for s in streams
+                           if s.get("codec_type") in ("video", "audio")) * duration / 8
+        overhead = zip_info.file_size - stream_bytes if stream_bytes else 0
+        if not self._is_streamable_media(zip_info, in_zip):
+            return "remux", "index at the end", prediction
+        if overhead > zip_info.file_size * REMUX_OVERHEAD_RATIO:
+            return "remux", f"{self._format_bytes(overhead)} container overhead", prediction
+        return "skip", reason, prediction
+    
+    def _predict_video(self, info, settings, cut=None):
+        """(bytes, output pixels per second, seconds kept) of a libx264 encode, or None
+        
+        The size comes from X264_BPP_AT_CRF23 scaled by the CRF, the output
+        pixel rate and the duration left after any trim cut, plus the audio
+        bitrate. None when ffprobe reported no picture or incomplete details.
+        """
+        streams = info.get("streams") or []
+        video = next((s for s in streams if s.get("codec_type") == "video"
+                      and not (s.get("disposition") or {}).get("attached_pic")), None)
+        if video is None:
+            return None
+        duration = probe_number((info.get("format") or {}).get("duration")) or probe_number(video.get("duration"))
+        width, height = video.get("width") or 0, video.get("height") or 0
+        fps = _probe_rate(video.get("avg_frame_rate")) or _probe_rate(video.get("r_frame_rate"))
+        if not duration or not width or not height or not fps:
+            return None
+        
+        out_width = min(width, settings["scale_width"])
+        out_height = height * out_width / width
+        out_fps = min(fps, settings["max_fps"]) if settings["max_fps"] else fps
+        bpp = X264_BPP_AT_CRF23 * 2 ** ((23 - settings["crf"]) / 6)
+        audio_bps = int(settings["audio_bitrate"].rstrip('k')) * 1000 if any(
+            s.get("codec_type") == "audio" for s in streams) else 0
+        kept = duration - (cut[0] + cut[1]) / 1000 if cut else duration
+        pixel_rate = out_width * out_height * out_fps
+        return (bpp * pixel_rate + audio_bps) * kept / 8, pixel_rate, kept
+    
+    def _probe_media(self, zip_info, in_zip, temp_dir):
+        """ffprobe format and stream data for a part, or None
+        
+        Results are remembered by the part's SHA-256 for this engine, and in
+        the persistent media cache when one is attached (keyed with
+        MEDIA_PIPELINE_VERSION), so the same clip in another deck (or the
+        next run) is not probed again.
+        """
+        key = self._part_digest(zip_info, in_zip)
+        with self._stats_lock:
+            if key in self._probe_cache:
+                return self._probe_cache[key]
+        
+        cache_key = f"probe-v{MEDIA_PIPELINE_VERSION}-{key}"
+        data = self.cache.get(cache_key) if self.cache is not None else None
+        fresh = not data
+        if fresh:
+            result = self._run_media_command(
+                zip_info, in_zip,
+                lambda input_arg: [self.ffprobe_path, '-v', 'error', '-print_format', 'json',
+                                   '-show_format', '-show_streams', input_arg],
+                temp_dir, timeout=30
+            )
+            if result is None:
+                return None
+            with result[0]:
+                data = result[0].read()
+        
+        try:
+            info = json.loads(data.decode("utf-8", errors="replace"))
+        except ValueError:
+            return None
+        if not isinstance(info, dict):
+            return None
+        
+        if fresh and self.cache is not None:
+            self.cache.put(cache_key, data)
+        with self._stats_lock:
+            self._probe_cache[key] = info
+        return info
+    
+    def _encode_audio(self, zip_info, in_zip, temp_dir, threads, notes=None, trim=None):
+        """Transcode an audio part; returns (file object, size, cut) if it got smaller"""
+        # Build FFmpeg arguments based on file type
+        ext = zip_info.filename.lower()
+        bitrate = self.audio_bitrate(ext)
+        
+        if ext.endswith('.wav'):
+            # Convert WAV to MP3
+            output_args = ['-codec:a', 'libmp3lame', '-b:a', bitrate, '-ac', '2', '-ar', '44100']
+        else:
+            # Re-encode other formats
+            output_args = ['-b:a', bitrate]
+        
+        cut = None
+        if trim:
+            info = self._probe_media(zip_info, in_zip, temp_dir) if self.ffprobe_path else None
+            cut = self._media_cut(trim, info)
+        input_args, cut_args = self._cut_args(cut)
+        
+        # MP3 is written to stdout and collected in a spooled buffer
+        output_args += cut_args + ['-threads', str(threads), '-f', 'mp3']
+        result = self._run_ffmpeg(zip_info, in_zip, output_args, temp_dir, timeout=60, input_args=input_args)
+        
+        # Replace if compressed version is smaller
+        if result is None or result[1] >= zip_info.file_size:
+            if result is not None:
+                result[0].close()
+            return None
+        if cut is not None and notes is not None:
+            notes.append(f"  Trimmed: {os.path.basename(zip_info.filename)} to the range the slides play")
+        return result + (cut,)
+    
+    def audio_bitrate(self, filename):
+        """MP3 bitrate (FFmpeg notation, e.g. '192k') an audio part is re-encoded at"""
+        if filename.lower().endswith('.wav'):
+            return '128k' if self.quality <= 50 else '192k'
+        return '128k' if self.quality <= 50 else ('192k' if self.quality <= 70 else '256k')
+    
+    def _run_ffmpeg(self, zip_info, in_zip, output_args, temp_dir, timeout, output_name=None, input_args=None):
+        """Run FFmpeg on a media part without holding it in memory
+        
+        Output goes to temp_dir/output_name, or (output_name=None) through
+        stdout into a SpooledTemporaryFile. Returns (file object at offset 0,
+        size), or None when FFmpeg failed or timed out.
+        """
+        output_path = os.path.join(temp_dir, output_name) if output_name else None
+        return self._run_media_command(
+            zip_info, in_zip,
+            lambda input_arg: ([self.ffmpeg_path, '-y', '-nostdin'] + (input_args or []) + ['-i', input_arg]
+                               + output_args + [output_path or 'pipe:1']),
+            temp_dir, timeout, output_path
+        )
+    
+    def _media_input(self, zip_info, in_zip, temp_dir):
+        """FFmpeg input for a part: 'pipe:0' when streamable, else a copy extracted once into temp_dir"""
+        if self._is_streamable_media(zip_info, in_zip):
+            return 'pipe:0'
+        input_path = os.path.join(temp_dir, "orig" + os.path.splitext(zip_info.filename)[1])
+        if not os.path.exists(input_path):
+            with in_zip.open(zip_info) as src, open(input_path, 'wb') as dst:
+                shutil.copyfileobj(src, dst, self.chunk_size)
+        return input_path
+    
+    def _run_media_command(self, zip_info, in_zip, make_command, temp_dir, timeout, output_path=None):
+        """Run FFmpeg or ffprobe on a part, streaming it in through stdin when possible
+        
+        make_command(input_arg) builds the command line. stdout is collected
+        unless output_path is given, in which case that file is the result.
+        """
+        startupinfo = None
+        if os.name == 'nt':
+            startupinfo = subprocess.STARTUPINFO()
+            startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
+        
+        input_arg = self._media_input(zip_info, in_zip, temp_dir)
+        streamed = input_arg == 'pipe:0'
+        cmd = make_command(input_arg)
+        
+        proc = subprocess.Popen(
+            cmd,
+            stdin=subprocess.PIPE if streamed else subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL if output_path else subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            startupinfo=startupinfo
+        )
+        timer = threading.Timer(timeout, proc.kill)
+        timer.start()
+        
+        feeder = None
+        if streamed:
+            def feed():
+                try:
+                    with in_zip.open(zip_info) as src:
+                        shutil.copyfileobj(src, proc.stdin, MEDIA_PIPE_CHUNK)
+                except OSError:
+                    # The tool stopped reading (finished early, failed or was killed)
+                    pass
+                finally:
+                    try:
+                        proc.stdin.close()
+                    except OSError:
+                        pass
+            
+            feeder = threading.Thread(target=feed, daemon=True)
+            feeder.start()
+        
+        output = None
+        try:
+            if output_path is None:
+                output = tempfile.SpooledTemporaryFile(max_size=CONFIG["media_spool_bytes"], dir=temp_dir)
+                shutil.copyfileobj(proc.stdout, output, MEDIA_PIPE_CHUNK)
+                proc.stdout.close()
+            proc.wait()
+        finally:
+            timer.cancel()
+            if proc.poll() is None:
+                proc.kill()
+                proc.wait()
+            if feeder is not None:
+                feeder.join()
+        
+        if proc.returncode != 0:
+            if output is not None:
+                output.close()
+            return None
+        
+        if output is None:
+            if not os.path.exists(output_path):
+                return None
+            output = open(output_path, 'rb')
+        size = output.seek(0, os.SEEK_END)
+        output.seek(0)
+        return output, size
+    
+    def _is_streamable_media(self, zip_info, in_zip):
+        """True when FFmpeg can demux the part from a pipe (no seeking needed)"""
+        ext = os.path.splitext(zip_info.filename.lower())[1]
+        if ext in STREAMABLE_MEDIA:
+            return True
+        if ext not in MP4_FAMILY:
+            return False
+        
+        # MP4/MOV is only streamable with the moov index in front of the media data
+        try:
+            with in_zip.open(zip_info) as src:
+                for _ in range(32):
+                    header = src.read(8)
+                    if len(header) < 8:
+                        return False
+                    size, box = struct.unpack('>I4s', header)
+                    if box == b'moov':
+                        return True
+                    if box == b'mdat' or size == 0:
+                        return False
+                    if size == 1:
+                        size = struct.unpack('>Q', src.read(8))[0] - 8
+                    if size < 8:
+                        return False
+                    src.seek(size - 8, os.SEEK_CUR)
+        except Exception:
+            pass
+        return False
+    
+    def _write_stream(self, zip_info, src, size, out_zip, compress_type=None):
+        """Write size bytes from a file object as the new content of an entry, in chunks"""
+        new_info = zipfile.ZipInfo(zip_info.filename, zip_info.date_time)
+        new_info.compress_type = zip_info.compress_type if compress_type is None else compress_type
+        new_info.external_attr = zip_info.external_attr
+        new_info.file_size = size
+        with out_zip.open(new_info, 'w') as dst:
+            shutil.copyfileobj(src, dst, self.chunk_size)
+    
+    def _copy_file(self, zip_info, in_zip, out_zip):
+        """Copy file without modification"""
+        if not zip_info.flag_bits & 0x1 and self._copy_raw(zip_info, in_zip, out_zip):
+            return
+        
+        with in_zip.open(zip_info) as src, out_zip.open(zip_info, 'w') as dst:
+            shutil.copyfileobj(src, dst, self.chunk_size)
+    
+    def _copy_raw(self, zip_info, in_zip, out_zip):
+        """Transfer an entry's compressed bytes and CRC without inflating them
+        
+        Needs the input on disk; returns False (nothing written) otherwise
+        or when ZipWriter cannot locate the entry's data.
+        """
+        if not in_zip.filename:
+            return False
+        return out_zip.copy_raw(zip_info, in_zip.filename, self.chunk_size)
+    
+    def get_statistics(self):
+        """Get compression statistics"""
+        with self._stats_lock:
+            stats = dict(self.stats)
+            stats["stage_times"] = dict(stats["stage_times"])
+        
+        if stats["total_original_size"] == 0:
+            return {}
+        
+        savings_pct = (stats["total_savings_bytes"] / stats["total_original_size"] * 100)
+        
+        # Files overlap in batch runs, so report wall time rather than the per-file sum
+        elapsed = stats["finished_at"] - stats["started_at"]
+        
+        return {
+            "files_processed": stats["files_processed"],
+            "original_size": self._format_bytes(stats["total_original_size"]),
+            "savings_bytes": self._format_bytes(stats["total_savings_bytes"]),
+            "savings_percent": f"{savings_pct:.1f}%",
+            "processing_time": f"{elapsed:.1f}s",
+            "average_speed": self._format_bytes(stats["total_original_size"] / max(elapsed, 1)) + "/s",
+            "peak_memory": self._format_bytes(stats["peak_rss_bytes"]) if stats["peak_rss_bytes"] else "n/a",
+            "peak_in_flight": (f"{self._format_bytes(self._memory.peak)} of "
+                               f"{self._format_bytes(self._memory.total)} budget"),
+            "stage_times": {name: f"{seconds:.2f}s" for name, seconds in sorted(stats["stage_times"].items())}
+        }
+    
+    def _is_image(self, filename):
+        return 'media/' in filename and filename.endswith(('.png', '.jpg', '.jpeg', '.tiff', '.tif', '.bmp'))
+    
+    def _is_video(self, filename):
+        return 'media/' in filename and filename.endswith(('.mp4', '.m4v', '.mov', '.avi', '.wmv', '.mkv', '.flv', '.webm'))
+    
+    def _is_media(self, filename):
+        return self._is_video(filename) or self._is_audio(filename)
+    
+    def _is_audio(self, filename):
+        return 'media/' in filename and filename.endswith(('.wav', '.mp3', '.m4a', '.wma', '.ogg', '.flac'))
+    
+    def _truncate_name(self, text, limit=40):
+        return text[:limit-3] + "..." if len(text) > limit else text
+    
+    def _format_bytes(self, size):
+        for unit in ['B', 'KB', 'MB', 'GB']:
+            if size < 1024.0:
+                return f"{size:.1f} {unit}"
+            size /= 1024.0
+        return f"{size:.1f} TB"
+
+
+# ============================================================================
+# BATCH SCHEDULER
+# ============================================================================
+
+def _available_memory():
+    """Return currently available physical memory in bytes, or None if unknown"""
+    try:
+        if sys.platform.startswith('linux'):
+            with open('/proc/meminfo', 'r') as f:
+                for line in f:
+                    if line.startswith('MemAvailable:'):
+                        return int(line.split()[1]) * 1024
+        elif os.name == 'nt':
+            import ctypes
+            
+            class MEMORYSTATUSEX(ctypes.Structure):
+                _fields_ = [
+                    ("dwLength", ctypes.c_ulong),
+                    ("dwMemoryLoad", ctypes.c_ulong),
+                    ("ullTotalPhys", ctypes.c_ulonglong),
+                    ("ullAvailPhys", ctypes.c_ulonglong),
+                    ("ullTotalPageFile", ctypes.c_ulonglong),
+                    ("ullAvailPageFile", ctypes.c_ulonglong),
+                    ("ullTotalVirtual", ctypes.c_ulonglong),
+                    ("ullAvailVirtual", ctypes.c_ulonglong),
+                    ("sullAvailExtendedVirtual", ctypes.c_ulonglong),
+                ]
+            
+            status = MEMORYSTATUSEX()
+            status.dwLength = ctypes.sizeof(MEMORYSTATUSEX)
+            if ctypes.windll.kernel32.GlobalMemoryStatusEx(ctypes.byref(status)):
+                return int(status.ullAvailPhys)
+        else:
+            return os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_AVPHYS_PAGES')
+    except Exception:
+        pass
+    return None
+
+
+def _peak_rss():
+    """Peak resident memory of this process in bytes, or None if unknown
+    
+    On POSIX the peak of finished child processes (FFmpeg, retired image
+    workers) is taken into account as well.
+    """
+    try:
+        if os.name == 'nt':
+            import ctypes
+            from ctypes import wintypes
+            
+            class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+                _fields_ = [
+                    ("cb", wintypes.DWORD),
+                    ("PageFaultCount", wintypes.DWORD),
+                    ("PeakWorkingSetSize", ctypes.c_size_t),
+                    ("WorkingSetSize", ctypes.c_size_t),
+                    ("QuotaPeakPagedPoolUsage", ctypes.c_size_t),
+                    ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                    ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t),
+                    ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                    ("PagefileUsage", ctypes.c_size_t),
+                    ("PeakPagefileUsage", ctypes.c_size_t),
+                ]
+            
+            counters = PROCESS_MEMORY_COUNTERS()
+            counters.cb = ctypes.sizeof(PROCESS_MEMORY_COUNTERS)
+            process = ctypes.windll.kernel32.GetCurrentProcess()
+            if ctypes.windll.psapi.GetProcessMemoryInfo(process, ctypes.byref(counters), counters.cb):
+                return int(counters.PeakWorkingSetSize)
+        else:
+            import resource
+            # ru_maxrss is in kilobytes, except on macOS (bytes)
+            scale = 1 if sys.platform == 'darwin' else 1024
+            return max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+                       resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss) * scale
+    except Exception:
+        pass
+    return None
+
+
+class BatchScheduler:
+    """Run several documents at once, admitting each by its estimated memory use
+    
+    Document concurrency is capped by the core count; on top of that every
+    running document reserves a memory slot proportional to its size, so a
+    2 GB deck occupies most of the budget while small files run side by side.
+    """
+    
+    def __init__(self, max_documents=None, memory_budget=None):
+        if max_documents is None:
+            max_documents = CONFIG["batch_max_documents"] or os.cpu_count() or 1
+        self.max_documents = max(1, int(max_documents))
+        
+        if memory_budget is None:
+            available = _available_memory()
+            if available:
+                memory_budget = int(available * CONFIG["batch_memory_fraction"])
+            else:
+                memory_budget = CONFIG["batch_default_memory"]
+        self.memory_budget = memory_budget
+        
+        self._cond = threading.Condition()
+        self._running = 0
+        self._reserved = 0
+    
+    def estimate_memory(self, filepath):
+        """Estimated peak working set for compressing one document"""
+        try:
+            size = os.path.getsize(filepath)
+        except OSError:
+            size = 0
+        return size + CONFIG["batch_document_overhead"]
+    
+    def run(self, files, process_file, should_continue=None):
+        """Call process_file(path) for every file on worker threads
+        
+        Returns the results in input order (None for files that were not
+        started because should_continue() returned False).
+        """
+        costs = [self.estimate_memory(f) for f in files]
+        # Largest first, so a huge document never ends up running alone at the tail
+        queue = sorted(range(len(files)), key=lambda i: costs[i], reverse=True)
+        results = [None] * len(files)
+        futures = []
+        
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_documents,
+                                                   thread_name_prefix="document") as pool:
+            while queue:
+                if should_continue is not None and not should_continue():
+                    break
+                
+                with self._cond:
+                    index = self._next_fitting(queue, costs)
+                    if index is None:
+                        # Wake up periodically to honour should_continue()
+                        self._cond.wait(0.5)
+                        continue
+                    queue.remove(index)
+                    self._running += 1
+                    self._reserved += costs[index]
+                
+                futures.append(pool.submit(self._run_one, process_file, files, index, costs[index], results))
+        
+        # Surface unexpected errors from process_file
+        for future in futures:
+            future.result()
+        return results
+    
+    def _next_fitting(self, queue, costs):
+        """Pick the first queued file that fits the free slots and memory (lock held)"""
+        if self._running >= self.max_documents:
+            return None
+        for index in queue:
+            # A document larger than the whole budget still runs, just alone
+            if self._running == 0 or self._reserved + costs[index] <= self.memory_budget:
+                return index
+        return None
+    
+    def _run_one(self, process_file, files, index, cost, results):
+        try:
+            results[index] = process_file(files[index])
+        finally:
+            with self._cond:
+                self._running -= 1
+                self._reserved -= cost
+                self._cond.notify_all()
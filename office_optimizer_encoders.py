@@ -0,0 +1,284 @@
+"""
+================================================================================
+Office Optimizer Pro v5.4 - Image Encoder Backends
+Pluggable JPEG/PNG encoders, picked per machine by a startup micro-benchmark
+================================================================================
+CREATED BY: SHILEZI (https://github.com/shilezi)
+VERSION: 5.4.0 | RELEASE: 2025
+================================================================================
+PROPRIETARY SOFTWARE - ALL RIGHTS RESERVED
+Copyright © 2025 Shilezi. Unauthorized distribution is prohibited.
+================================================================================
+
+The image workers encode through a backend chosen per output format:
+
+    pillow      Pillow's own encoders (default, always available)
+    simplejpeg  libjpeg-turbo via the simplejpeg package (needs numpy)
+    cjpeg       the cjpeg binary on PATH (libjpeg-turbo or mozjpeg)
+    oxipng      Pillow's PNG recompressed losslessly by the oxipng binary
+    pngquant    the pngquant binary for the images the engine reduces to a
+                256-colour palette (RGBA); other PNGs go through Pillow
+
+"auto" encodes a small synthetic sample with every available backend and
+keeps the fastest one whose output is at most SIZE_TOLERANCE larger than
+Pillow's. Backends are referred to by name in the worker settings, so they
+are part of the media cache key. An external backend that fails on an image
+falls back to Pillow for that image.
+"""
+
+import abc
+import io
+import os
+import random
+import shutil
+import subprocess
+import time
+
+# A backend qualifies for "auto" when its sample output is at most this much
+# larger than Pillow's
+SIZE_TOLERANCE = 1.05
+
+# Encodes per backend and sample in the micro-benchmark (the best one counts)
+BENCHMARK_REPEAT = 3
+
+# Seconds an external encoder may take for one image
+EXTERNAL_TIMEOUT = 60
+
+# Benchmark winners per (format, quality), so each process measures once
+_selected = {}
+
+
+class EncoderBackend(abc.ABC):
+    """Encodes a decoded, resized PIL image to JPEG or PNG bytes"""
+    
+    name = None
+    formats = ()
+    
+    def available(self):
+        return True
+    
+    def encode(self, img, save_format, quality):
+        """Encoded bytes; falls back to Pillow when this backend fails"""
+        if self is not PILLOW:
+            try:
+                return self._encode(img, save_format, quality)
+            except Exception:
+                pass
+        return PILLOW._encode(img, save_format, quality)
+    
+    @abc.abstractmethod
+    def _encode(self, img, save_format, quality):
+        """Encoded bytes; may raise, encode() then falls back to Pillow"""
+
+
+class PillowEncoder(EncoderBackend):
+    """Pillow's encoders with the engine's historical settings"""
+    
+    name = "pillow"
+    formats = ("JPEG", "PNG")
+    
+    def _encode(self, img, save_format, quality):
+        buffer = io.BytesIO()
+        if save_format == 'JPEG':
+            img.save(buffer, format='JPEG', quality=quality, optimize=True)
+        else:
+            # Optimize PNG (quantize if RGBA)
+            if img.mode == 'RGBA':
+                img = img.quantize(colors=256, method=2)
+            img.save(buffer, format='PNG', optimize=True)
+        return buffer.getvalue()
+
+
+class SimpleJpegEncoder(EncoderBackend):
+    """libjpeg-turbo through the simplejpeg binding"""
+    
+    name = "simplejpeg"
+    formats = ("JPEG",)
+    
+    def available(self):
+        import importlib.util
+        return (importlib.util.find_spec("simplejpeg") is not None
+                and importlib.util.find_spec("numpy") is not None)
+    
+    def _encode(self, img, save_format, quality):
+        import numpy as np
+        import simplejpeg
+        if img.mode != 'RGB':
+            img = img.convert('RGB')
+        return simplejpeg.encode_jpeg(np.ascontiguousarray(np.asarray(img)), quality=quality,
+                                      colorspace='RGB', colorsubsampling='420')
+
+
+class _ExternalEncoder(EncoderBackend):
+    """Backend driving a command line encoder through stdin/stdout"""
+    
+    executable = None
+    
+    def available(self):
+        return shutil.which(self.executable) is not None
+    
+    def _run(self, args, data):
+        startupinfo = None
+        if os.name == 'nt':
+            startupinfo = subprocess.STARTUPINFO()
+            startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
+        result = subprocess.run(
+            [shutil.which(self.executable) or self.executable] + args,
+            input=data,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            startupinfo=startupinfo,
+            timeout=EXTERNAL_TIMEOUT
+        )
+        if result.returncode != 0 or not result.stdout:
+            raise RuntimeError(f"{self.executable} exited with code {result.returncode}")
+        return result.stdout
+
+
+class CjpegEncoder(_ExternalEncoder):
+    """cjpeg (libjpeg-turbo or mozjpeg) fed a PPM on stdin"""
+    
+    name = "cjpeg"
+    formats = ("JPEG",)
+    executable = "cjpeg"
+    
+    def _encode(self, img, save_format, quality):
+        if img.mode != 'RGB':
+            img = img.convert('RGB')
+        buffer = io.BytesIO()
+        img.save(buffer, format='PPM')
+        return self._run(["-quality", str(quality), "-optimize"], buffer.getvalue())
+
+
+class OxipngEncoder(_ExternalEncoder):
+    """Pillow's PNG, recompressed losslessly by oxipng"""
+    
+    name = "oxipng"
+    formats = ("PNG",)
+    executable = "oxipng"
+    
+    def _encode(self, img, save_format, quality):
+        if img.mode == 'RGBA':
+            img = img.quantize(colors=256, method=2)
+        buffer = io.BytesIO()
+        # oxipng redoes the deflate step, so Pillow only needs to be fast
+        img.save(buffer, format='PNG', compress_level=1)
+        return self._run(["--opt", "2", "--strip", "safe", "--stdout", "-"], buffer.getvalue())
+
+
+class PngquantEncoder(_ExternalEncoder):
+    """pngquant in place of Pillow's palette reduction of RGBA images"""
+    
+    name = "pngquant"
+    formats = ("PNG",)
+    executable = "pngquant"
+    
+    def _encode(self, img, save_format, quality):
+        if img.mode != 'RGBA':
+            # The engine keeps these lossless
+            return PILLOW._encode(img, save_format, quality)
+        buffer = io.BytesIO()
+        img.save(buffer, format='PNG', compress_level=1)
+        return self._run(["--speed", "3", "--strip", "256", "-"], buffer.getvalue())
+
+
+PILLOW = PillowEncoder()
+
+BACKENDS = {backend.name: backend for backend in (
+    PILLOW, SimpleJpegEncoder(), CjpegEncoder(), OxipngEncoder(), PngquantEncoder())}
+
+
+def names(save_format):
+    """Backend names that can encode save_format ("JPEG" or "PNG")"""
+    return [name for name, backend in BACKENDS.items() if save_format in backend.formats]
+
+
+def get_backend(name):
+    """Backend by name; unknown names get Pillow"""
+    return BACKENDS.get(name or PILLOW.name, PILLOW)
+
+
+def _samples(save_format):
+    """Deterministic sample images resembling what the engine encodes"""
+    from PIL import Image, ImageDraw
+    rng = random.Random(5)
+    width, height = 640, 480
+    
+    # Photo: smooth colour gradients with sensor-like noise
+    pixels = width * height
+    noise = Image.frombytes('L', (width, height), rng.getrandbits(pixels * 8).to_bytes(pixels, 'little'))
+    gradient = Image.linear_gradient('L').resize((width, height))
+    radial = Image.radial_gradient('L').resize((width, height))
+    photo = Image.merge('RGB', (gradient, radial, gradient.transpose(Image.FLIP_LEFT_RIGHT)))
+    photo = Image.blend(photo, Image.merge('RGB', (noise, noise, noise)), 0.15)
+    if save_format == 'JPEG':
+        return [photo]
+    
+    # Diagram: flat fills, lines and soft edges, opaque and with transparency
+    diagram = Image.new('RGBA', (width, height), (0, 0, 0, 0))
+    draw = ImageDraw.Draw(diagram)
+    for _ in range(40):
+        x, y = rng.randrange(width - 60), rng.randrange(height - 40)
+        colour = (rng.randrange(256), rng.randrange(256), rng.randrange(256), rng.choice((255, 255, 160)))
+        draw.rectangle((x, y, x + rng.randrange(20, 60), y + rng.randrange(10, 40)), fill=colour)
+        draw.line((x, y, rng.randrange(width), rng.randrange(height)), fill=colour, width=2)
+    return [diagram, Image.alpha_composite(Image.new('RGBA', diagram.size, (255, 255, 255, 255)),
+                                           diagram).convert('RGB')]
+
+
+def benchmark(save_format, quality, candidates=None, repeat=BENCHMARK_REPEAT):
+    """Encode the samples with each available backend
+    
+    Returns {name: (seconds, bytes)}, seconds being the best of repeat runs
+    summed over the samples. Backends that are missing or fail are left out.
+    """
+    samples = _samples(save_format)
+    results = {}
+    for name in candidates or names(save_format):
+        backend = get_backend(name)
+        if save_format not in backend.formats or not backend.available():
+            continue
+        try:
+            seconds, size = 0.0, 0
+            for img in samples:
+                best = None
+                for _ in range(repeat):
+                    started = time.perf_counter()
+                    data = backend._encode(img, save_format, quality)
+                    elapsed = time.perf_counter() - started
+                    best = elapsed if best is None else min(best, elapsed)
+                seconds += best
+                size += len(data)
+            results[name] = (seconds, size)
+        except Exception:
+            continue
+    return results
+
+
+def select(save_format, quality):
+    """Fastest backend whose output stays within SIZE_TOLERANCE of Pillow's"""
+    key = (save_format, quality)
+    if key not in _selected:
+        results = benchmark(save_format, quality)
+        baseline = results.get(PILLOW.name)
+        qualifying = [(seconds, name) for name, (seconds, size) in results.items()
+                      if baseline is None or size <= baseline[1] * SIZE_TOLERANCE]
+        _selected[key] = min(qualifying)[1] if qualifying else PILLOW.name
+    return _selected[key]
+
+
+def resolve(encoders, quality):
+    """Concrete backend names for {"JPEG": name, "PNG": name}
+    
+    "auto" runs the micro-benchmark; backends that are unknown or not
+    available on this machine become Pillow.
+    """
+    resolved = {}
+    for save_format, name in encoders.items():
+        if name == "auto":
+            name = select(save_format, quality)
+        backend = BACKENDS.get(name)
+        if backend is None or save_format not in backend.formats or not backend.available():
+            name = PILLOW.name
+        resolved[save_format] = name
+    return resolved
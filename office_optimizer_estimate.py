@@ -0,0 +1,509 @@
+"""
+================================================================================
+Office Optimizer Pro v5.4 - Savings Estimator
+Dry-run prediction of the savings and run time of a batch before it starts
+================================================================================
+CREATED BY: SHILEZI (https://github.com/shilezi)
+VERSION: 5.4.0 | RELEASE: 2025
+================================================================================
+PROPRIETARY SOFTWARE - ALL RIGHTS RESERVED
+Copyright © 2025 Shilezi. Unauthorized distribution is prohibited.
+================================================================================
+
+SavingsEstimator(engine).estimate(path) predicts what engine.compress()
+would do to a document without writing anything. Per document it reads:
+
+    - the ZIP central directory (sizes, CRCs, stored sizes of every part)
+    - the relationship and layout XML the engine plans with (orphans,
+      unused layouts, displayed picture sizes)
+    - the first IMAGE_HEADER_PEEK bytes of each image (format, dimensions)
+    - ffprobe data of video/audio parts, when video compression is on,
+      from at most MEDIA_PROBE_BYTES of each part (stored MP4/MOV: the
+      boxes around the media data, so an index at the end is found too)
+
+Only a bounded subset of images is really encoded: at most
+CONFIG["estimate_samples"] per source format over the whole run (and
+CONFIG["estimate_samples_per_file"] per document). They calibrate, per
+format, the encoded bytes per output pixel and the encode seconds per input
+pixel; every other image is predicted from its header. Video sizes use the
+engine's own libx264 prediction, audio sizes the target bitrate.
+
+Nothing is written to the media cache. Media cache hits, PowerPoint trims and the COM structure cleanup are not
+modelled, so the predicted time and size err on the high side.
+"""
+
+import csv
+import heapq
+import io
+import itertools
+import json
+import math
+import os
+import shutil
+import struct
+import subprocess
+import tempfile
+import time
+import zipfile
+
+from office_optimizer_core import CONFIG, DISPLAY_RESIZE_THRESHOLD, IMAGE_HEADER_PEEK, MP4_FAMILY, probe_number
+
+# Throughput of copying and rewriting the parts the engine does not re-encode
+COPY_BYTES_PER_SECOND = 200 * 1024 * 1024
+# Fixed cost per document: validation, planning, opening and closing archives
+DOCUMENT_SECONDS = 0.05
+# Rough libx264 speed per FFmpeg thread (output pixels per second); about
+# 1080p at 10 fps per thread for the engine's presets
+X264_PIXELS_PER_THREAD_SECOND = 20e6
+# Seconds of audio the MP3 encoder gets through per second
+AUDIO_SPEED = 50.0
+# Bytes of a media part handed to ffprobe (MP4/MOV: every box but the media data)
+MEDIA_PROBE_BYTES = 4 * 1024 * 1024
+# Encoded size follows (output pixels / input pixels) ** SCALE_EXPONENT of the
+# input size: shrinking a picture keeps its detail in fewer, busier pixels
+SCALE_EXPONENT = 0.5
+
+CSV_FIELDS = ("kind", "input", "part", "type", "status", "original_size", "predicted_size",
+              "predicted_savings_bytes", "predicted_savings_percent", "predicted_seconds", "message")
+
+
+def _scaled_size(size, in_pixels, out_pixels):
+    """Input size adjusted for the resize, before the encoder's own gain"""
+    return size * (out_pixels / max(in_pixels, 1)) ** SCALE_EXPONENT
+
+
+class _ImageModel:
+    """Encoder gain over the resize-adjusted size, and seconds per input pixel, of one source format"""
+    
+    def __init__(self):
+        self.samples = 0
+        self.scaled_bytes = 0.0
+        self.out_bytes = 0
+        self.in_pixels = 0
+        self.seconds = 0.0
+    
+    def add(self, size, in_pixels, out_pixels, out_bytes, seconds):
+        self.samples += 1
+        self.scaled_bytes += _scaled_size(size, in_pixels, out_pixels)
+        self.out_bytes += out_bytes
+        self.in_pixels += in_pixels
+        self.seconds += seconds
+    
+    def predict(self, size, in_pixels, out_pixels):
+        """(stored bytes, encode seconds), or None before any sample"""
+        if not self.samples:
+            return None
+        out_bytes = _scaled_size(size, in_pixels, out_pixels) * self.out_bytes / max(self.scaled_bytes, 1)
+        # The engine keeps the original when encoding does not save space
+        return min(size, int(out_bytes)), in_pixels * self.seconds / max(self.in_pixels, 1)
+
+
+def _image_header(zip_info, in_zip):
+    """(format, (width, height), EXIF orientation) from the start of an image part, or None"""
+    try:
+        from PIL import Image
+        with in_zip.open(zip_info) as src:
+            head = src.read(IMAGE_HEADER_PEEK)
+        with Image.open(io.BytesIO(head)) as img:
+            return img.format, img.size, img.getexif().get(0x0112, 1)
+    except Exception:
+        return None
+
+
+def _target_size(size, orientation, settings):
+    """Pixels the worker would encode an image at (max_width and display size)"""
+    width, height = size
+    max_side = settings["max_width"]
+    display_px = settings.get("display_px")
+    if display_px:
+        shown = (height, width) if orientation in (5, 6, 7, 8) else (width, height)
+        scale = max(display_px[0] / shown[0], display_px[1] / shown[1])
+        if scale < DISPLAY_RESIZE_THRESHOLD:
+            max_side = min(max_side, max(1, math.ceil(max(width, height) * scale)))
+    if width <= max_side and height <= max_side:
+        return width, height
+    scale = max_side / max(width, height)
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+class SavingsEstimator:
+    """Predict engine.compress() results from headers and a few sample encodes
+    
+    engine: the OfficeCompressor whose settings a real run would use; only
+    its planning, probing and settings helpers are called.
+    samples / samples_per_file: image encode budget per source format for the
+    whole run, and per document (defaults from CONFIG).
+    top: largest parts kept per part type for the report.
+    """
+    
+    def __init__(self, engine, samples=None, samples_per_file=None, top=None):
+        self.engine = engine
+        self.samples = CONFIG["estimate_samples"] if samples is None else samples
+        self.samples_per_file = (CONFIG["estimate_samples_per_file"] if samples_per_file is None
+                                 else samples_per_file)
+        self.top = top or CONFIG["estimate_top_parts"]
+        self.records = []
+        self._models = {}
+        self._largest = {}
+        self._order = itertools.count()
+        self.started = time.perf_counter()
+    
+    def skipped(self, path, message):
+        """Record a document a real run would skip (e.g. unchanged per the index)"""
+        record = self._record(path)
+        record.update({"status": "skipped", "predicted_size": record["original_size"],
+                       "predicted_savings_bytes": 0, "predicted_savings_percent": 0.0,
+                       "predicted_seconds": 0.0, "message": message})
+        self.records.append(record)
+        return record
+    
+    def estimate(self, path):
+        """Predicted size, savings and processing time of one document"""
+        started = time.perf_counter()
+        record = self._record(path)
+        try:
+            is_valid, msg = self.engine.validate_file(path)
+            if not is_valid:
+                record["message"] = msg
+            else:
+                self._estimate(path, record)
+                record["status"] = "ok"
+        except Exception as e:
+            record["message"] = str(e)
+        record["seconds"] = round(time.perf_counter() - started, 3)
+        self.records.append(record)
+        return record
+    
+    def _record(self, path):
+        try:
+            original_size = os.path.getsize(path)
+        except OSError:
+            original_size = None
+        return {
+            "input": path,
+            "status": "error",
+            "original_size": original_size,
+            "predicted_size": None,
+            "predicted_savings_bytes": None,
+            "predicted_savings_percent": None,
+            "predicted_seconds": None,
+            "sampled_parts": 0,
+            "parts": {},
+            "seconds": 0.0,
+            "message": None
+        }
+    
+    def _estimate(self, path, record):
+        engine = self.engine
+        with zipfile.ZipFile(path, 'r') as in_zip:
+            file_list = in_zip.infolist()
+            # Duplicates come from the central directory alone: no part is hashed
+            plan = engine.plan_package(in_zip, file_list, verify_duplicates=False)
+            
+            # name -> [type, stored bytes, predicted bytes, seconds]; images still
+            # to predict wait in `images` until this document's samples are in
+            parts = {}
+            images = []
+            temp_dir = None
+            media_seconds = 0.0
+            try:
+                for item in file_list:
+                    name = item.filename
+                    part_type = engine.part_type(name)
+                    if name in plan.dropped:
+                        parts[name] = [part_type, item.compress_size, 0, 0.0]
+                        continue
+                    parts[name] = [part_type, item.compress_size, item.compress_size, 0.0]
+                    if name in plan.duplicates:
+                        # Shares the first copy's encode and result
+                        continue
+                    if part_type == "image":
+                        header = _image_header(item, in_zip)
+                        if header is not None:
+                            images.append((item, header))
+                    elif part_type in ("video", "audio") and engine.compress_video_flag and engine.ffprobe_path:
+                        if temp_dir is None:
+                            temp_dir = tempfile.mkdtemp()
+                        predicted, seconds = self._media(item, in_zip, temp_dir)
+                        parts[name][2] = predicted
+                        media_seconds += seconds
+                
+                self._images(images, in_zip, plan, parts, record)
+            finally:
+                if temp_dir is not None:
+                    shutil.rmtree(temp_dir, ignore_errors=True)
+        
+        for dup, canonical in plan.duplicates.items():
+            if dup not in plan.dropped:
+                parts[dup][2] = parts[canonical][2]
+        
+        # Images run on the worker pool and FFmpeg jobs side by side on their threads
+        image_seconds = sum(seconds for part_type, _, _, seconds in parts.values() if part_type == "image")
+        copied = sum(stored for part_type, stored, _, _ in parts.values()
+                     if part_type not in ("image", "video", "audio"))
+        seconds = (DOCUMENT_SECONDS + copied / COPY_BYTES_PER_SECOND
+                   + max(image_seconds / engine.workers, media_seconds / engine.media_workers))
+        
+        stored_before = sum(item.compress_size for item in file_list)
+        stored_after = sum(predicted for _, _, predicted, _ in parts.values())
+        predicted_size = max(0, record["original_size"] - stored_before + stored_after)
+        record["predicted_size"] = predicted_size
+        record["predicted_savings_bytes"] = record["original_size"] - predicted_size
+        if record["original_size"]:
+            record["predicted_savings_percent"] = round(
+                record["predicted_savings_bytes"] / record["original_size"] * 100, 2)
+        record["predicted_seconds"] = round(seconds, 3)
+        
+        by_type = record["parts"]
+        for name, (part_type, stored, predicted, _) in parts.items():
+            counters = by_type.setdefault(part_type, {"count": 0, "bytes": 0, "predicted_bytes": 0,
+                                                      "dropped": 0})
+            counters["count"] += 1
+            counters["bytes"] += stored
+            counters["predicted_bytes"] += predicted
+            counters["dropped"] += int(name in plan.dropped)
+            self._keep_largest(record["input"], name, part_type, stored, predicted)
+        record["parts"] = dict(sorted(by_type.items()))
+    
+    def _images(self, images, in_zip, plan, parts, record):
+        """Sample-encode the images the budget allows, then predict the rest"""
+        remaining = list(images)
+        sampled = 0
+        while sampled < self.samples_per_file:
+            # The format with the fewest samples first, its largest image within it
+            open_formats = [entry for entry in remaining if self._model(entry[1][0]).samples < self.samples]
+            if not open_formats:
+                break
+            entry = min(open_formats, key=lambda e: (self._model(e[1][0]).samples, -e[0].file_size))
+            remaining.remove(entry)
+            sampled += self._sample(entry, in_zip, plan, parts)
+        
+        for item, (fmt, size, orientation) in remaining:
+            out_size = _target_size(size, orientation, self.engine.part_settings(item, plan))
+            prediction = self._model(fmt).predict(item.compress_size, size[0] * size[1],
+                                                  out_size[0] * out_size[1])
+            if prediction is not None:
+                parts[item.filename][2], parts[item.filename][3] = prediction
+        record["sampled_parts"] = sampled
+    
+    def _sample(self, entry, in_zip, plan, parts):
+        """Encode one image as the worker would and add it to its format's model"""
+        item, (fmt, size, orientation) = entry
+        out_size = _target_size(size, orientation, self.engine.part_settings(item, plan))
+        started = time.perf_counter()
+        try:
+            optimized = self.engine.encode_image(item, in_zip, plan)[0]
+        except Exception:
+            # The engine stores undecodable images as they are
+            return False
+        seconds = time.perf_counter() - started
+        # Sizes are stored bytes throughout, as predict() is given them
+        out_bytes = len(optimized) if optimized is not None else item.compress_size
+        self._model(fmt).add(item.compress_size, size[0] * size[1], out_size[0] * out_size[1], out_bytes, seconds)
+        parts[item.filename][2] = min(item.compress_size, out_bytes)
+        parts[item.filename][3] = seconds
+        return True
+    
+    def _model(self, fmt):
+        return self._models.setdefault(fmt, _ImageModel())
+    
+    def _media(self, zip_info, in_zip, temp_dir):
+        """(stored bytes, FFmpeg seconds) predicted for a video or audio part"""
+        engine = self.engine
+        size = zip_info.compress_size
+        info = self._probe(zip_info, in_zip, temp_dir)
+        if info is None:
+            return size, 0.0
+        
+        if engine.part_type(zip_info.filename) == "audio":
+            duration = _probe_seconds(info)
+            if not duration:
+                return size, 0.0
+            bitrate = int(engine.audio_bitrate(zip_info.filename).rstrip('k')) * 1000
+            return min(size, int(bitrate * duration / 8)), duration / AUDIO_SPEED
+        
+        action, _, prediction = engine.video_decision(zip_info, in_zip, info)
+        if CONFIG["video_probe"] and action == "skip":
+            return size, 0.0
+        if CONFIG["video_probe"] and action == "remux":
+            return size, zip_info.file_size / COPY_BYTES_PER_SECOND
+        if prediction is None:
+            return size, 0.0
+        predicted, pixel_rate, kept = prediction
+        seconds = pixel_rate * kept / (X264_PIXELS_PER_THREAD_SECOND * engine.ffmpeg_threads)
+        # Results that save less than 5% are thrown away
+        return (int(predicted) if predicted < size * 0.95 else size), seconds
+    
+    def _probe(self, zip_info, in_zip, temp_dir):
+        """ffprobe data from the head of a media part, or None
+        
+        Unlike the engine's probe this never reads the whole part and never
+        touches the media cache. When the part was cut short, the duration
+        is also derived from the stream bitrates and the full part size, as
+        ffprobe estimates it from the bytes it saw for formats such as MP3.
+        """
+        if not self.engine.ffprobe_path:
+            return None
+        head, complete = _media_head(zip_info, in_zip)
+        if not head:
+            return None
+        path = os.path.join(temp_dir, "probe" + os.path.splitext(zip_info.filename)[1])
+        with open(path, 'wb') as f:
+            f.write(head)
+        
+        startupinfo = None
+        if os.name == 'nt':
+            startupinfo = subprocess.STARTUPINFO()
+            startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
+        try:
+            result = subprocess.run(
+                [self.engine.ffprobe_path, '-v', 'error', '-print_format', 'json',
+                 '-show_format', '-show_streams', path],
+                stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, startupinfo=startupinfo, timeout=30
+            )
+            info = json.loads(result.stdout.decode("utf-8", errors="replace"))
+        except (OSError, subprocess.SubprocessError, ValueError):
+            return None
+        finally:
+            os.remove(path)
+        if not isinstance(info, dict):
+            return None
+        
+        if not complete:
+            bit_rate = sum(probe_number(stream.get("bit_rate")) or 0 for stream in info.get("streams") or [])
+            if bit_rate:
+                fmt = info.setdefault("format", {})
+                full = zip_info.file_size * 8 / bit_rate
+                fmt["duration"] = str(max(probe_number(fmt.get("duration")) or 0, full))
+        return info
+    
+    def _keep_largest(self, path, name, part_type, stored, predicted):
+        heap = self._largest.setdefault(part_type, [])
+        entry = (stored, next(self._order), {"input": path, "part": name, "type": part_type,
+                                             "original_size": stored, "predicted_size": predicted})
+        if len(heap) < self.top:
+            heapq.heappush(heap, entry)
+        elif stored > heap[0][0]:
+            heapq.heapreplace(heap, entry)
+    
+    def totals(self):
+        """Run totals over every document recorded so far"""
+        files = {}
+        original = predicted = 0
+        seconds = 0.0
+        sampled = 0
+        for record in self.records:
+            files[record["status"]] = files.get(record["status"], 0) + 1
+            if record["status"] == "error":
+                continue
+            original += record["original_size"] or 0
+            predicted += record["predicted_size"] or 0
+            seconds += record["predicted_seconds"] or 0.0
+            sampled += record["sampled_parts"]
+        return {
+            "files": files,
+            "original_size": original,
+            "predicted_size": predicted,
+            "predicted_savings_bytes": original - predicted,
+            "predicted_savings_percent": round((original - predicted) / original * 100, 2) if original else None,
+            "predicted_seconds": round(seconds, 3),
+            "sampled_parts": sampled,
+            "seconds": round(time.perf_counter() - self.started, 3)
+        }
+    
+    def largest_parts(self):
+        """The biggest parts seen, per part type, largest first"""
+        return {part_type: [entry[2] for entry in sorted(heap, key=lambda e: (-e[0], e[1]))]
+                for part_type, heap in sorted(self._largest.items())}
+    
+    def report(self):
+        return {"files": self.records, "totals": self.totals(), "largest_parts": self.largest_parts()}
+    
+    def write_json(self, f):
+        json.dump(self.report(), f, ensure_ascii=False, indent=2)
+        f.write("\n")
+    
+    def write_csv(self, f):
+        """One row per document, per largest part and for the totals (column "kind")"""
+        writer = csv.DictWriter(f, fieldnames=CSV_FIELDS, extrasaction='ignore', lineterminator="\n")
+        writer.writeheader()
+        for record in self.records:
+            writer.writerow(dict(record, kind="file"))
+        for entries in self.largest_parts().values():
+            for entry in entries:
+                savings = entry["original_size"] - entry["predicted_size"]
+                writer.writerow(dict(entry, kind="part", predicted_savings_bytes=savings))
+        writer.writerow(dict(self.totals(), kind="total"))
+
+
+def _media_head(zip_info, in_zip, limit=MEDIA_PROBE_BYTES):
+    """(bytes, complete): up to limit bytes for ffprobe from the start of a media part
+    
+    A compressed part can only be read front to back (ZipExtFile.seek reads
+    and decompresses what it skips), so it gives its first limit bytes.
+    Stored MP4/MOV parts of an archive on disk are walked box by box in the
+    file itself instead, seeking over their mdat boxes, so the moov index is
+    included wherever it sits. complete is True when nothing else was cut.
+    """
+    ext = os.path.splitext(zip_info.filename.lower())[1]
+    if (ext in MP4_FAMILY and zip_info.compress_type == zipfile.ZIP_STORED
+            and not zip_info.flag_bits & 0x1 and isinstance(in_zip.filename, str)):
+        try:
+            return _stored_mp4_head(zip_info, in_zip.filename, limit)
+        except (OSError, ValueError, struct.error):
+            pass
+    try:
+        with in_zip.open(zip_info) as src:
+            head = src.read(limit)
+    except Exception:
+        return None, False
+    return head, len(head) >= zip_info.file_size
+
+
+def _stored_mp4_head(zip_info, archive, limit):
+    """_media_head() of a stored MP4/MOV part, every top-level box but mdat"""
+    with open(archive, 'rb') as f:
+        # Local file header: 30 bytes, then the name and extra field
+        f.seek(zip_info.header_offset)
+        local = f.read(30)
+        if len(local) < 30 or local[:4] != b'PK\x03\x04':
+            raise ValueError(f"No local header for {zip_info.filename}")
+        name_len, extra_len = struct.unpack('<HH', local[26:30])
+        data_start = zip_info.header_offset + 30 + name_len + extra_len
+        
+        boxes = []
+        kept = 0
+        position = 0
+        while position < zip_info.file_size:
+            f.seek(data_start + position)
+            header = f.read(8)
+            if len(header) < 8:
+                break
+            size, box = struct.unpack('>I4s', header)
+            extended = b""
+            if size == 1:
+                extended = f.read(8)
+                size = struct.unpack('>Q', extended)[0]
+            elif size == 0:
+                size = zip_info.file_size - position
+            if size < 8 + len(extended) or position + size > zip_info.file_size:
+                break
+            if box != b'mdat':
+                # Media data is not needed for format and stream details
+                if kept + size > limit:
+                    return b"".join(boxes), False
+                boxes.append(header + extended + f.read(size - 8 - len(extended)))
+                kept += size
+            position += size
+        return b"".join(boxes), True
+
+
+def _probe_seconds(info):
+    duration = probe_number((info.get("format") or {}).get("duration"))
+    if duration:
+        return duration
+    for stream in info.get("streams") or []:
+        duration = probe_number(stream.get("duration"))
+        if duration:
+            return duration
+    return None
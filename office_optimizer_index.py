@@ -0,0 +1,228 @@
+"""
+================================================================================
+Office Optimizer Pro v5.4 - Incremental Index
+Remembers processed documents so re-runs skip files that have not changed
+================================================================================
+CREATED BY: SHILEZI (https://github.com/shilezi)
+VERSION: 5.4.0 | RELEASE: 2025
+================================================================================
+PROPRIETARY SOFTWARE - ALL RIGHTS RESERVED
+Copyright © 2025 Shilezi. Unauthorized distribution is prohibited.
+================================================================================
+
+Usage:
+    office-optimizer-index list [--index PATH]
+    office-optimizer-index prune [--index PATH] [--older-than DAYS] [--all]
+    python -m office_optimizer_index ...
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+
+from office_optimizer_core import CONFIG
+from office_optimizer_cache import user_data_dir
+
+
+def default_index_path():
+    """Index location: CONFIG["index_path"] or the per-user directory"""
+    if CONFIG.get("index_path"):
+        return CONFIG["index_path"]
+    return os.path.join(user_data_dir(), "index.sqlite3")
+
+
+def file_digest(path, chunk_size=1024 * 1024):
+    """SHA-256 of a file's contents"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def settings_key(settings):
+    """Stable digest of OfficeCompressor.output_settings()"""
+    return hashlib.sha256(json.dumps(settings, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+
+def _normalize(path):
+    return os.path.normcase(os.path.abspath(path))
+
+
+class OptimizationIndex:
+    """SQLite record of documents already optimized with given settings
+    
+    One row per document path holds its size, mtime and SHA-256 as they were
+    after processing, plus the settings digest and tool version used. A file
+    is unchanged when its stat matches (one primary-key lookup and one stat
+    call); when only the mtime moved, the content hash decides. Optimized
+    output is recorded as well, so feeding it back in is skipped too.
+    """
+    
+    def __init__(self, path=None):
+        self.path = path or default_index_path()
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS documents ("
+            "path TEXT PRIMARY KEY, size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL, "
+            "sha256 TEXT NOT NULL, profile TEXT, settings TEXT NOT NULL, "
+            "original_size INTEGER, result_size INTEGER, output TEXT, "
+            "tool_version TEXT NOT NULL, processed_at REAL NOT NULL)"
+        )
+    
+    def is_current(self, filepath, settings, output_path=None):
+        """True when filepath was already processed with these settings and is unchanged
+        
+        output_path is where this run would write; pass filepath itself when
+        replacing originals.
+        """
+        key = _normalize(filepath)
+        with self._lock:
+            row = self._db.execute(
+                "SELECT size, mtime_ns, sha256, settings, tool_version, output FROM documents WHERE path = ?",
+                (key,)
+            ).fetchone()
+        if row is None:
+            return False
+        
+        size, mtime_ns, sha256, settings_digest, tool_version, output = row
+        if settings_digest != settings_key(settings) or tool_version != CONFIG["version"]:
+            return False
+        
+        # Replacing in place needs nothing but the file itself. Any other output
+        # must exist: the recorded copy, or (for a file that is its own
+        # optimized output) whatever this run would otherwise write
+        requested = _normalize(output_path or filepath)
+        if requested != key:
+            if output not in (key, requested) or not os.path.exists(requested):
+                return False
+        
+        try:
+            st = os.stat(filepath)
+        except OSError:
+            return False
+        
+        if st.st_size != size:
+            return False
+        if st.st_mtime_ns == mtime_ns:
+            return True
+        
+        # Touched (copied, synced) but maybe not modified: let the content decide
+        try:
+            if file_digest(filepath) != sha256:
+                return False
+        except OSError:
+            return False
+        with self._lock:
+            self._db.execute("UPDATE documents SET mtime_ns = ? WHERE path = ?", (st.st_mtime_ns, key))
+        return True
+    
+    def record(self, filepath, settings, profile=None, original_size=None, output_path=None):
+        """Remember filepath (as it is on disk now) as processed with settings
+        
+        Call this after any replace, so the stored stat is that of the final file.
+        When output_path is a separate file, it is recorded as already optimized too.
+        """
+        rows = [(filepath, output_path)]
+        if output_path and _normalize(output_path) != _normalize(filepath):
+            rows.append((output_path, output_path))
+        
+        result_size = os.path.getsize(output_path) if output_path else None
+        now = time.time()
+        values = []
+        for path, output in rows:
+            st = os.stat(path)
+            values.append((
+                _normalize(path), st.st_size, st.st_mtime_ns, file_digest(path), profile,
+                settings_key(settings), original_size, result_size,
+                _normalize(output) if output else None, CONFIG["version"], now
+            ))
+        
+        with self._lock:
+            self._db.executemany("INSERT OR REPLACE INTO documents VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", values)
+    
+    def forget(self, filepath):
+        with self._lock:
+            self._db.execute("DELETE FROM documents WHERE path = ?", (_normalize(filepath),))
+    
+    def entries(self):
+        """All rows as dicts, most recently processed first"""
+        with self._lock:
+            cursor = self._db.execute(
+                "SELECT path, size, profile, original_size, result_size, output, tool_version, processed_at "
+                "FROM documents ORDER BY processed_at DESC"
+            )
+            columns = [c[0] for c in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+    
+    def prune(self, older_than=None, everything=False):
+        """Drop rows for files that no longer exist (or older than N seconds); returns the count"""
+        with self._lock:
+            if everything:
+                return self._db.execute("DELETE FROM documents").rowcount
+            rows = self._db.execute("SELECT path, processed_at FROM documents").fetchall()
+        
+        cutoff = time.time() - older_than if older_than is not None else None
+        stale = [(path,) for path, processed_at in rows
+                 if not os.path.exists(path) or (cutoff is not None and processed_at < cutoff)]
+        with self._lock:
+            self._db.executemany("DELETE FROM documents WHERE path = ?", stale)
+        return len(stale)
+    
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+def main(argv=None):
+    """Inspect or prune the incremental index"""
+    parser = argparse.ArgumentParser(prog="office-optimizer-index",
+                                     description="Inspect or prune the Office Optimizer incremental index.")
+    parser.add_argument("--index", metavar="PATH", help=f"index database (default: {default_index_path()})")
+    commands = parser.add_subparsers(dest="command")
+    
+    list_cmd = commands.add_parser("list", help="print the recorded documents")
+    list_cmd.add_argument("--json", action="store_true", help="print JSON lines instead of a table")
+    
+    prune_cmd = commands.add_parser("prune", help="remove entries for deleted files")
+    prune_cmd.add_argument("--older-than", type=float, metavar="DAYS",
+                           help="also remove entries processed more than DAYS ago")
+    prune_cmd.add_argument("--all", action="store_true", help="empty the index")
+    
+    args = parser.parse_args(argv)
+    if args.command is None:
+        parser.print_help()
+        return 1
+    
+    index = OptimizationIndex(args.index)
+    try:
+        if args.command == "list":
+            for entry in index.entries():
+                if args.json:
+                    print(json.dumps(entry, ensure_ascii=False))
+                else:
+                    when = time.strftime("%Y-%m-%d %H:%M", time.localtime(entry["processed_at"]))
+                    print(f"{when}  {entry['size']:>12}  {entry['profile'] or '-'}  {entry['path']}")
+        else:
+            older_than = args.older_than * 86400 if args.older_than is not None else None
+            removed = index.prune(older_than=older_than, everything=args.all)
+            print(f"Removed {removed} entr{'y' if removed == 1 else 'ies'}")
+    finally:
+        index.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,216 @@
+"""
+================================================================================
+Office Optimizer Pro v5.4 - Picture Layout Analysis
+Largest rendered size of every image part, read from the document's own XML
+================================================================================
+CREATED BY: SHILEZI (https://github.com/shilezi)
+VERSION: 5.4.0 | RELEASE: 2025
+================================================================================
+PROPRIETARY SOFTWARE - ALL RIGHTS RESERVED
+Copyright © 2025 Shilezi. Unauthorized distribution is prohibited.
+================================================================================
+
+Pictures are placed in EMU (914400 per inch):
+- PowerPoint: p:pic / p:sp spPr a:xfrm a:ext, scaled by enclosing groups;
+  slide backgrounds fill p:sldSz from presentation.xml
+- Word: wp:inline / wp:anchor wp:extent
+- Excel: xdr:pic spPr a:xfrm a:ext, or the xdr:ext of one-cell and absolute anchors
+
+a:srcRect cropping is undone, so the size returned is that of the whole
+image at its displayed scale. Anything that cannot be measured (placeholder
+pictures inheriting their frame, tiled fills, VML, charts, relationships
+not found in the XML) makes the image unbounded, so it is never shrunk
+below what some view of the document may need. The XML is only read here;
+edits go through office_optimizer_opc.
+"""
+
+import xml.etree.ElementTree as ET
+
+import office_optimizer_opc as opc
+
+EMU_PER_INCH = 914400
+
+
+def _local(tag):
+    return tag.rsplit('}', 1)[-1] if isinstance(tag, str) else ""
+
+
+def _child(element, name):
+    for child in element:
+        if _local(child.tag) == name:
+            return child
+    return None
+
+
+def _rel_attribute(element, name):
+    """Value of an r:<name> attribute, whatever the relationships namespace prefix"""
+    for key, value in element.attrib.items():
+        if key.startswith('{') and key.endswith('}' + name) and 'relationships' in key:
+            return value
+    return None
+
+
+def _size(element, x="cx", y="cy"):
+    try:
+        return int(element.get(x)), int(element.get(y))
+    except (TypeError, ValueError):
+        return None
+
+
+def _xfrm_ext(properties):
+    """a:xfrm/a:ext of an spPr or grpSpPr element"""
+    xfrm = _child(properties, "xfrm") if properties is not None else None
+    ext = _child(xfrm, "ext") if xfrm is not None else None
+    return _size(ext) if ext is not None else None
+
+
+def _group_scale(group):
+    """Child-to-parent scale of a group shape (ext / chExt)"""
+    properties = _child(group, "grpSpPr")
+    xfrm = _child(properties, "xfrm") if properties is not None else None
+    if xfrm is None:
+        return 1.0, 1.0
+    ext, child_ext = _child(xfrm, "ext"), _child(xfrm, "chExt")
+    ext = _size(ext) if ext is not None else None
+    child_ext = _size(child_ext) if child_ext is not None else None
+    if not ext or not child_ext or not child_ext[0] or not child_ext[1]:
+        return 1.0, 1.0
+    return ext[0] / child_ext[0], ext[1] / child_ext[1]
+
+
+def _visible_fraction(blip_fill):
+    """Share of the image width and height left visible by a:srcRect cropping"""
+    src_rect = _child(blip_fill, "srcRect")
+    if src_rect is None:
+        return 1.0, 1.0
+    
+    def edge(name):
+        try:
+            return int(src_rect.get(name, 0)) / 100000
+        except ValueError:
+            return 0.0
+    
+    # Negative values pad instead of crop; never treat more than the image as visible
+    width = min(1.0, 1.0 - edge("l") - edge("r"))
+    height = min(1.0, 1.0 - edge("t") - edge("b"))
+    return max(width, 0.01), max(height, 0.01)
+
+
+def _blip_extent(blip, parents, page_size):
+    """Rendered size in EMU of the whole image behind an a:blip, or None if unknown"""
+    blip_fill = parents.get(blip)
+    if blip_fill is None or _child(blip_fill, "tile") is not None:
+        return None
+    
+    extent = None
+    scale_x = scale_y = 1.0
+    node = parents.get(blip_fill)
+    while node is not None:
+        name = _local(node.tag)
+        if extent is None:
+            if name == "bg":
+                extent = page_size
+                break
+            if name in ("inline", "anchor"):
+                extent = _size(_child(node, "extent")) if _child(node, "extent") is not None else None
+                break
+            if name in ("oneCellAnchor", "absoluteAnchor"):
+                extent = _size(_child(node, "ext")) if _child(node, "ext") is not None else None
+                break
+            extent = _xfrm_ext(_child(node, "spPr"))
+        elif name in ("grpSp", "wgp"):
+            group_x, group_y = _group_scale(node)
+            scale_x *= group_x
+            scale_y *= group_y
+        node = parents.get(node)
+    
+    if not extent:
+        return None
+    visible_x, visible_y = _visible_fraction(blip_fill)
+    return extent[0] * scale_x / visible_x, extent[1] * scale_y / visible_y
+
+
+def picture_extents(data, page_size=None):
+    """Map relationship ids of embedded pictures in an XML part to EMU sizes
+    
+    A relationship id maps to None when at least one use of it could not be
+    measured. page_size is the (cx, cy) slide size used for backgrounds.
+    """
+    root = ET.fromstring(data)
+    parents = {child: parent for parent in root.iter() for child in parent}
+    
+    extents = {}
+    for element in root.iter():
+        if _local(element.tag) != "blip":
+            continue
+        rel_id = _rel_attribute(element, "embed")
+        if rel_id is None:
+            continue
+        
+        size = _blip_extent(element, parents, page_size)
+        if rel_id in extents and (extents[rel_id] is None or size is None):
+            extents[rel_id] = None
+        elif rel_id in extents:
+            extents[rel_id] = (max(extents[rel_id][0], size[0]), max(extents[rel_id][1], size[1]))
+        else:
+            extents[rel_id] = size
+    return extents
+
+
+def slide_size(data):
+    """(cx, cy) of p:sldSz in presentation.xml, or None"""
+    root = ET.fromstring(data)
+    size = _child(root, "sldSz")
+    return _size(size) if size is not None else None
+
+
+def image_display_sizes(in_zip, file_list, is_image):
+    """Largest rendered EMU size of each image part, keyed by zip name
+    
+    Only images whose every reference could be measured are returned; all
+    others (and images nothing points to) are left out, i.e. unbounded.
+    """
+    names = {opc.part_key(item.filename): item.filename for item in file_list if not item.is_dir()}
+    images = {key for key, name in names.items() if is_image(name.lower())}
+    if not images:
+        return {}
+    
+    page_size = None
+    if "ppt/presentation.xml" in names:
+        try:
+            page_size = slide_size(in_zip.read(names["ppt/presentation.xml"]))
+        except ET.ParseError:
+            pass
+    
+    sizes = {}
+    for rels_key, rels_name in names.items():
+        if not opc.is_rels(rels_key):
+            continue
+        source = opc.source_part_for_rels(rels_key)
+        targets = {}
+        for rel in opc.parse_rels(in_zip.read(rels_name)):
+            if rel.get("TargetMode") == "External" or "Target" not in rel or "Id" not in rel:
+                continue
+            target = opc.resolve_target(source, rel["Target"])
+            if target in images:
+                targets[rel["Id"]] = target
+        if not targets:
+            continue
+        
+        extents = {}
+        if source.lower().endswith(".xml") and source in names:
+            try:
+                extents = picture_extents(in_zip.read(names[source]), page_size)
+            except ET.ParseError:
+                extents = {}
+        
+        for rel_id, target in targets.items():
+            size = extents.get(rel_id)
+            if size is None or sizes.get(target, 0) is None:
+                sizes[target] = None
+            elif target in sizes:
+                sizes[target] = (max(sizes[target][0], size[0]), max(sizes[target][1], size[1]))
+            else:
+                sizes[target] = size
+    
+    return {names[key]: size for key, size in sizes.items() if size is not None}
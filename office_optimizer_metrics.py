@@ -0,0 +1,284 @@
+"""
+================================================================================
+Office Optimizer Pro v5.4 - Metrics Collector
+Per-file and per-part-type counters for capacity planning of batch runs
+================================================================================
+CREATED BY: SHILEZI (https://github.com/shilezi)
+VERSION: 5.4.0 | RELEASE: 2025
+================================================================================
+PROPRIETARY SOFTWARE - ALL RIGHTS RESERVED
+Copyright © 2025 Shilezi. Unauthorized distribution is prohibited.
+================================================================================
+
+Pass a MetricsCollector to OfficeCompressor(metrics=...). The engine reports
+every part it writes or drops and every finished document; the collector
+keeps running totals (snapshot()), appends one JSON line per document and
+can write the totals as a Prometheus text-format file for node-exporter's
+textfile collector.
+"""
+
+import bisect
+import collections
+import json
+import os
+import tempfile
+import threading
+import time
+
+# Upper bounds (seconds) of the per-part latency histogram; the last bucket is +Inf
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+# The Prometheus file is rewritten at most this often while documents finish
+PROMETHEUS_INTERVAL = 15.0
+
+PROMETHEUS_PREFIX = "office_optimizer"
+
+# Permissions of the Prometheus file: node-exporter usually runs as another
+# user, and mkstemp() would leave the file readable by its owner only
+PROMETHEUS_FILE_MODE = 0o644
+
+
+def _part_counters():
+    return {"count": 0, "bytes_in": 0, "bytes_out": 0, "wall_seconds": 0.0, "cpu_seconds": 0.0,
+            "cache_hits": 0, "reused": 0, "skipped": 0, "dropped": 0}
+
+
+class _Histogram:
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.sum = 0.0
+    
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        self.sum += seconds
+    
+    def to_dict(self):
+        cumulative = []
+        total = 0
+        for bound, count in zip(LATENCY_BUCKETS + ("+Inf",), self.counts):
+            total += count
+            cumulative.append([bound, total])
+        return {"buckets": cumulative, "count": total, "sum": round(self.sum, 6)}
+
+
+class FileMetrics:
+    """Counters for one document, filled by the engine while it is written"""
+    
+    def __init__(self, path, collector=None):
+        self.path = path
+        self.collector = collector
+        self.parts = collections.defaultdict(_part_counters)
+        self.worker_cpu = 0.0
+        self.started = time.perf_counter()
+        self.started_cpu = time.thread_time()
+        self._lock = threading.Lock()
+    
+    def record_part(self, part_type, bytes_in, bytes_out, wall, cpu, cache_hit=False, reused=False):
+        """One written part; wall/cpu cover the worker or FFmpeg run plus the write"""
+        with self._lock:
+            counters = self.parts[part_type]
+            counters["count"] += 1
+            counters["bytes_in"] += bytes_in
+            counters["bytes_out"] += bytes_out
+            counters["wall_seconds"] += wall
+            counters["cpu_seconds"] += cpu
+            counters["cache_hits"] += int(cache_hit)
+            counters["reused"] += int(reused)
+            # Media stored as it was: no gain, or served as-is
+            counters["skipped"] += int(part_type in ("image", "video", "audio") and bytes_out == bytes_in)
+        if self.collector is not None:
+            self.collector.observe_latency(part_type, wall)
+    
+    def record_dropped(self, part_type, bytes_in):
+        """A part left out of the output (orphan or merged duplicate)"""
+        with self._lock:
+            counters = self.parts[part_type]
+            counters["dropped"] += 1
+            counters["bytes_in"] += bytes_in
+    
+    def add_worker_cpu(self, seconds):
+        """CPU time an image worker process spent on one of this document's parts"""
+        with self._lock:
+            self.worker_cpu += seconds
+
+
+class MetricsCollector:
+    """Thread-safe running totals across all documents an engine processes
+    
+    jsonl_path receives one JSON object per finished document; when
+    prometheus_path is set the totals are written there (atomically, by
+    rename) every PROMETHEUS_INTERVAL seconds and on close().
+    """
+    
+    def __init__(self, jsonl_path=None, prometheus_path=None):
+        self.jsonl_path = jsonl_path
+        self.prometheus_path = prometheus_path
+        self._lock = threading.Lock()
+        self._files = {"ok": 0, "error": 0}
+        self._bytes_in = 0
+        self._bytes_out = 0
+        self._wall = 0.0
+        self._cpu = 0.0
+        self._parts = collections.defaultdict(_part_counters)
+        self._latency = collections.defaultdict(_Histogram)
+        self._stages = collections.defaultdict(float)
+        self._prometheus_written = 0.0
+        self._jsonl = open(jsonl_path, 'a', encoding='utf-8') if jsonl_path else None
+    
+    def start_file(self, path):
+        """Begin a document; the returned FileMetrics is handed to finish_file()"""
+        return FileMetrics(path, self)
+    
+    def add_stage(self, name, seconds):
+        """Engine stage time (the same figures as stats["stage_times"])"""
+        with self._lock:
+            self._stages[name] += seconds
+    
+    def observe_latency(self, part_type, seconds):
+        with self._lock:
+            self._latency[part_type].observe(seconds)
+    
+    def finish_file(self, record, ok, output_path=None):
+        """Fold a document into the totals and emit its JSON line"""
+        wall = time.perf_counter() - record.started
+        cpu = time.thread_time() - record.started_cpu + record.worker_cpu
+        bytes_in = _size(record.path)
+        bytes_out = _size(output_path) if ok and output_path else None
+        with record._lock:
+            parts = {name: dict(counters) for name, counters in record.parts.items()}
+        
+        entry = {
+            "file": record.path,
+            "status": "ok" if ok else "error",
+            "bytes_in": bytes_in,
+            "bytes_out": bytes_out,
+            "wall_seconds": round(wall, 6),
+            "cpu_seconds": round(cpu, 6),
+            "parts": {name: _rounded(counters) for name, counters in sorted(parts.items())},
+            "finished_at": time.time()
+        }
+        
+        with self._lock:
+            self._files[entry["status"]] += 1
+            self._bytes_in += bytes_in or 0
+            self._bytes_out += bytes_out or 0
+            self._wall += wall
+            self._cpu += cpu
+            for name, counters in parts.items():
+                totals = self._parts[name]
+                for key, value in counters.items():
+                    totals[key] += value
+            if self._jsonl is not None:
+                self._jsonl.write(json.dumps(entry, ensure_ascii=False) + "\n")
+                self._jsonl.flush()
+            due = self.prometheus_path and time.time() - self._prometheus_written >= PROMETHEUS_INTERVAL
+        
+        if due:
+            self.write_prometheus()
+        return entry
+    
+    def snapshot(self):
+        """Totals so far as a plain dict"""
+        with self._lock:
+            return {
+                "files": dict(self._files),
+                "bytes_in": self._bytes_in,
+                "bytes_out": self._bytes_out,
+                "wall_seconds": round(self._wall, 6),
+                "cpu_seconds": round(self._cpu, 6),
+                "parts": {name: _rounded(counters) for name, counters in sorted(self._parts.items())},
+                "latency_seconds": {name: hist.to_dict() for name, hist in sorted(self._latency.items())},
+                "stage_seconds": {name: round(seconds, 6) for name, seconds in sorted(self._stages.items())}
+            }
+    
+    def prometheus_text(self):
+        """The totals in Prometheus text exposition format"""
+        snap = self.snapshot()
+        lines = []
+        
+        def metric(name, kind, help_text, samples):
+            full = f"{PROMETHEUS_PREFIX}_{name}"
+            lines.append(f"# HELP {full} {help_text}")
+            lines.append(f"# TYPE {full} {kind}")
+            for labels, value in samples:
+                label_text = ",".join(f'{key}="{val}"' for key, val in labels)
+                lines.append(f"{full}{{{label_text}}} {value}" if label_text else f"{full} {value}")
+        
+        metric("files_total", "counter", "Documents processed by status.",
+               [((("status", status),), count) for status, count in snap["files"].items()])
+        metric("input_bytes_total", "counter", "Size of the processed documents.", [((), snap["bytes_in"])])
+        metric("output_bytes_total", "counter", "Size of the optimized documents.", [((), snap["bytes_out"])])
+        metric("file_wall_seconds_total", "counter", "Wall time spent per document, summed.",
+               [((), snap["wall_seconds"])])
+        metric("file_cpu_seconds_total", "counter", "CPU time of the writer and image workers, summed.",
+               [((), snap["cpu_seconds"])])
+        
+        part_metrics = (
+            ("count", "parts_total", "Parts written by type."),
+            ("bytes_in", "part_input_bytes_total", "Uncompressed size of the input parts, written or dropped, by type."),
+            ("bytes_out", "part_output_bytes_total", "Uncompressed size of the parts written, by type."),
+            ("wall_seconds", "part_wall_seconds_total", "Processing wall time of the parts, by type."),
+            ("cpu_seconds", "part_cpu_seconds_total", "Processing CPU time of the parts, by type."),
+            ("cache_hits", "part_cache_hits_total", "Parts served from the media cache, by type."),
+            ("reused", "part_reused_total", "Parts sharing the encode of an identical part, by type."),
+            ("skipped", "parts_skipped_total", "Media parts stored unchanged, by type."),
+            ("dropped", "parts_dropped_total", "Parts removed from the output, by type."),
+        )
+        for key, name, help_text in part_metrics:
+            metric(name, "counter", help_text,
+                   [((("type", part),), counters[key]) for part, counters in snap["parts"].items()])
+        
+        full = f"{PROMETHEUS_PREFIX}_part_latency_seconds"
+        lines.append(f"# HELP {full} Processing latency per part, by type.")
+        lines.append(f"# TYPE {full} histogram")
+        for part, hist in snap["latency_seconds"].items():
+            for bound, count in hist["buckets"]:
+                lines.append(f'{full}_bucket{{type="{part}",le="{bound}"}} {count}')
+            lines.append(f'{full}_sum{{type="{part}"}} {hist["sum"]}')
+            lines.append(f'{full}_count{{type="{part}"}} {hist["count"]}')
+        
+        metric("stage_seconds_total", "counter", "Wall time per pipeline stage, summed over documents.",
+               [((("stage", stage),), seconds) for stage, seconds in snap["stage_seconds"].items()])
+        return "\n".join(lines) + "\n"
+    
+    def write_prometheus(self, path=None):
+        """Write prometheus_text() by atomic rename, so scrapers never see a partial file"""
+        path = path or self.prometheus_path
+        if not path:
+            return
+        text = self.prometheus_text()
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(text)
+            os.chmod(tmp_path, PROMETHEUS_FILE_MODE)
+            os.replace(tmp_path, path)
+        except OSError:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            return
+        with self._lock:
+            self._prometheus_written = time.time()
+    
+    def close(self):
+        """Write the final Prometheus file and close the JSON-lines output"""
+        if self.prometheus_path:
+            self.write_prometheus()
+        with self._lock:
+            if self._jsonl is not None:
+                self._jsonl.close()
+                self._jsonl = None
+
+
+def _size(path):
+    try:
+        return os.path.getsize(path)
+    except (OSError, TypeError):
+        return None
+
+
+def _rounded(counters):
+    return {key: round(value, 6) if isinstance(value, float) else value for key, value in counters.items()}
@@ -0,0 +1,403 @@
+"""
+================================================================================
+Office Optimizer Pro v5.4 - OPC Package Helpers
+Relationship parsing and rewriting for .pptx/.docx/.xlsx packages
+================================================================================
+CREATED BY: SHILEZI (https://github.com/shilezi)
+VERSION: 5.4.0 | RELEASE: 2025
+================================================================================
+PROPRIETARY SOFTWARE - ALL RIGHTS RESERVED
+Copyright © 2025 Shilezi. Unauthorized distribution is prohibited.
+================================================================================
+
+Office documents are Open Packaging Convention (OPC) ZIP files: every part
+is reached from the package root through `_rels/*.rels` relationship files
+and typed by `[Content_Types].xml`. XML is edited textually on purpose -
+ElementTree renames namespace prefixes, which breaks `mc:Ignorable`.
+"""
+
+import collections
+import html
+import posixpath
+import re
+from urllib.parse import unquote
+
+CONTENT_TYPES = "[Content_Types].xml"
+ROOT_RELS = "_rels/.rels"
+
+_RELATIONSHIP_RE = re.compile(r'<(?:\w+:)?Relationship\b[^>]*?/?>', re.S)
+_ATTR_RE = re.compile(r'(\w+)\s*=\s*("([^"]*)"|\'([^\']*)\')', re.S)
+_OVERRIDE_RE = re.compile(r'<(?:\w+:)?Override\b[^>]*?/?>', re.S)
+_PREFIXED_ID_RE = re.compile(r'\b\w+:id\s*=\s*("([^"]*)"|\'([^\']*)\')')
+# PowerPoint 2010 media extension: <p14:media r:embed=".."><p14:trim/><p14:bmkLst>..
+_MEDIA_RE = re.compile(r'<(\w+:)?media\b([^>]*?)(/>|>(.*?)</\1media\s*>)', re.S)
+_TRIM_RE = re.compile(r'<(?:\w+:)?trim\b[^>]*?/?>', re.S)
+_BOOKMARK_RE = re.compile(r'<(?:\w+:)?bmk\b[^>]*?/?>', re.S)
+
+
+def _attributes(tag):
+    return {m.group(1): html.unescape(m.group(3) if m.group(3) is not None else m.group(4))
+            for m in _ATTR_RE.finditer(tag)}
+
+
+def part_key(name):
+    """Normalized lookup key for a part name (no leading slash, percent-decoded)"""
+    return unquote(name.lstrip("/"))
+
+
+def is_rels(name):
+    return name.endswith(".rels") and (name.startswith("_rels/") or "/_rels/" in name)
+
+
+def rels_path_for(part_name):
+    """Relationship part belonging to part_name ('' is the package root)"""
+    directory, base = posixpath.split(part_name.lstrip("/"))
+    return posixpath.join(directory, "_rels", base + ".rels")
+
+
+def source_part_for_rels(rels_name):
+    """Part that owns a relationship part ('' for the package root)"""
+    directory, base = posixpath.split(rels_name)
+    owner_dir = posixpath.dirname(directory)
+    return posixpath.join(owner_dir, base[:-len(".rels")]) if base != ".rels" else owner_dir
+
+
+def resolve_target(source_part, target):
+    """Resolve a relationship target against its source part to a part key"""
+    if target.startswith("/"):
+        path = target
+    else:
+        path = posixpath.join(posixpath.dirname(source_part), target)
+    return part_key(posixpath.normpath(path))
+
+
+def parse_rels(data):
+    """List of relationships (dicts with Id, Type, Target, TargetMode) in a .rels part"""
+    if isinstance(data, bytes):
+        data = data.decode("utf-8", errors="replace")
+    return [_attributes(tag) for tag in _RELATIONSHIP_RE.findall(data)]
+
+
+def rewrite_rels_targets(data, source_part, renames):
+    """Point internal relationships at renamed parts
+    
+    renames maps part keys to the zip names that replace them. Returns the new
+    bytes, or None when nothing in this relationship part changed.
+    """
+    text = data.decode("utf-8")
+    changed = False
+    
+    def replace(match):
+        nonlocal changed
+        tag = match.group(0)
+        attrs = _attributes(tag)
+        if attrs.get("TargetMode") == "External" or "Target" not in attrs:
+            return tag
+        new_name = renames.get(resolve_target(source_part, attrs["Target"]))
+        if new_name is None:
+            return tag
+        changed = True
+        new_target = posixpath.relpath(new_name, posixpath.dirname(source_part) or ".")
+        return re.sub(r'(\bTarget\s*=\s*)("[^"]*"|\'[^\']*\')',
+                      lambda m: m.group(1) + '"' + html.escape(new_target, quote=True) + '"', tag, count=1)
+    
+    text = _RELATIONSHIP_RE.sub(replace, text)
+    return text.encode("utf-8") if changed else None
+
+
+def relationship_type(rel):
+    """Last segment of a relationship type URI ('slideLayout', 'image', ...)"""
+    return rel.get("Type", "").rstrip("/").rsplit("/", 1)[-1]
+
+
+def remove_relationships(data, rel_ids):
+    """Drop the relationships with the given Ids from a .rels part (None if unchanged)"""
+    text = data.decode("utf-8")
+    changed = False
+    
+    def replace(match):
+        nonlocal changed
+        if _attributes(match.group(0)).get("Id") in rel_ids:
+            changed = True
+            return ""
+        return match.group(0)
+    
+    text = _RELATIONSHIP_RE.sub(replace, text)
+    return text.encode("utf-8") if changed else None
+
+
+def remove_id_list_entries(data, element, rel_ids):
+    """Drop <element r:id="..."> entries (e.g. p:sldLayoutId) pointing at rel_ids (None if unchanged)"""
+    text = data.decode("utf-8")
+    changed = False
+    pattern = re.compile(r'<(?:\w+:)?%s\b[^>]*?(?:/>|>.*?</(?:\w+:)?%s\s*>)' % (element, element), re.S)
+    
+    def replace(match):
+        nonlocal changed
+        start_tag = match.group(0).split(">", 1)[0]
+        rel_id = _PREFIXED_ID_RE.search(start_tag)
+        if rel_id and html.unescape(rel_id.group(2) if rel_id.group(2) is not None else rel_id.group(3)) in rel_ids:
+            changed = True
+            return ""
+        return match.group(0)
+    
+    text = pattern.sub(replace, text)
+    return text.encode("utf-8") if changed else None
+
+
+def remove_content_type_overrides(data, removed):
+    """Drop [Content_Types].xml overrides for removed part keys (None if unchanged)"""
+    text = data.decode("utf-8")
+    changed = False
+    # Part names are case-insensitive in OPC
+    removed = {key.lower() for key in removed}
+    
+    def replace(match):
+        nonlocal changed
+        if part_key(_attributes(match.group(0)).get("PartName", "")).lower() in removed:
+            changed = True
+            return ""
+        return match.group(0)
+    
+    text = _OVERRIDE_RE.sub(replace, text)
+    return text.encode("utf-8") if changed else None
+
+
+def unreachable_parts(names, read):
+    """Zip names of parts that no relationship chain from the package root reaches
+    
+    names are all entry names in the archive and read(name) returns an
+    entry's bytes. Walks _rels/.rels and then the .rels part of every part
+    it reaches (breadth first). Relationship parts whose owner is
+    unreachable are unreachable too. Returns [] for archives without root
+    relationships, which are not OPC packages.
+    """
+    # Part names are case-insensitive in OPC
+    by_key = {part_key(name).lower(): name for name in names if not name.endswith("/")}
+    if ROOT_RELS.lower() not in by_key:
+        return []
+    
+    reachable = {CONTENT_TYPES.lower()}
+    queue = collections.deque([""])
+    while queue:
+        source = queue.popleft()
+        rels_key = rels_path_for(source).lower()
+        if rels_key not in by_key:
+            continue
+        reachable.add(rels_key)
+        
+        for rel in parse_rels(read(by_key[rels_key])):
+            target = rel.get("Target", "").split("#", 1)[0]
+            if rel.get("TargetMode") == "External" or not target:
+                continue
+            key = resolve_target(source, target).lower()
+            if key in by_key and key not in reachable:
+                reachable.add(key)
+                queue.append(part_key(by_key[key]))
+    
+    return [name for key, name in by_key.items() if key not in reachable]
+
+
+def unused_layout_edits(names, read):
+    """New bytes for the parts that unlink slide layouts and masters no slide uses
+    
+    A layout is used when any part other than a slide master points at it
+    (slides, but also e.g. a notes or handout master); a master is dropped
+    only when none of its layouts is used, so no master is left without
+    layouts. The edits remove the
+    p:sldLayoutId / p:sldMasterId entries and their relationships, so the
+    unlinked parts (and media only they used) become unreachable and are
+    removed by unreachable_parts. Returns {} for anything that is not a
+    presentation with slides, or that looks inconsistent.
+    """
+    by_key = {part_key(name).lower(): name for name in names if not name.endswith("/")}
+    
+    def rels_of(part):
+        rels_name = by_key.get(rels_path_for(part).lower())
+        return (rels_name, parse_rels(read(rels_name))) if rels_name else (None, [])
+    
+    def targets(part, rels, rel_type):
+        return [(rel.get("Id"), resolve_target(part, rel["Target"]))
+                for rel in rels
+                if relationship_type(rel) == rel_type and rel.get("TargetMode") != "External" and "Target" in rel]
+    
+    _, root_rels = rels_of("")
+    documents = [target for _, target in targets("", root_rels, "officeDocument")]
+    if len(documents) != 1 or documents[0].lower() not in by_key:
+        return {}
+    presentation = documents[0]
+    presentation_rels_name, presentation_rels = rels_of(presentation)
+    
+    slides = [target for _, target in targets(presentation, presentation_rels, "slide")]
+    masters = targets(presentation, presentation_rels, "slideMaster")
+    if not slides or not masters:
+        return {}
+    
+    for slide in slides:
+        if not targets(slide, rels_of(slide)[1], "slideLayout"):
+            # A slide without a layout relationship: do not guess what it uses
+            return {}
+    
+    used_layouts = set()
+    master_keys = {master.lower() for _, master in masters}
+    for rels_key, rels_name in by_key.items():
+        source = source_part_for_rels(rels_key)
+        if not is_rels(rels_key) or source in master_keys:
+            continue
+        used_layouts.update(layout.lower() for _, layout in targets(source, parse_rels(read(rels_name)), "slideLayout"))
+    
+    edits = {}
+    removed_masters = []
+    for master_rel_id, master in masters:
+        if master.lower() not in by_key:
+            return {}
+        master_rels_name, master_rels = rels_of(master)
+        layouts = targets(master, master_rels, "slideLayout")
+        unused = {rel_id for rel_id, layout in layouts if layout.lower() not in used_layouts}
+        if not unused:
+            continue
+        if len(unused) == len(layouts):
+            removed_masters.append(master_rel_id)
+            continue
+        edits[by_key[master.lower()]] = remove_id_list_entries(read(by_key[master.lower()]), "sldLayoutId", unused)
+        edits[master_rels_name] = remove_relationships(read(master_rels_name), unused)
+    
+    if removed_masters:
+        if len(removed_masters) == len(masters):
+            return {}
+        presentation_name = by_key[presentation.lower()]
+        edits[presentation_name] = remove_id_list_entries(read(presentation_name), "sldMasterId", set(removed_masters))
+        edits[presentation_rels_name] = remove_relationships(read(presentation_rels_name), set(removed_masters))
+    
+    if any(data is None for data in edits.values()):
+        # An id list entry or relationship was not where it should be
+        return {}
+    return edits
+
+
+def _milliseconds(value):
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return 0.0
+    return value if value > 0 else 0.0
+
+
+def _format_milliseconds(value):
+    return f"{max(value, 0.0):.4f}".rstrip("0").rstrip(".")
+
+
+def media_trims(data):
+    """Trim and bookmarks of each p14:media element in a slide, keyed by r:embed id
+    
+    Values are dicts with "start" (ms cut from the beginning), "end" (ms cut
+    from the end) and "bookmarks" (times in ms from the start of the file).
+    """
+    if isinstance(data, bytes):
+        # Strict: a part that cannot be decoded here could not be retimed either
+        data = data.decode("utf-8")
+    trims = {}
+    for match in _MEDIA_RE.finditer(data):
+        rel_id = _attributes(match.group(2)).get("embed")
+        if rel_id is None:
+            continue
+        body = match.group(4) or ""
+        trim = _TRIM_RE.search(body)
+        trim = _attributes(trim.group(0)) if trim else {}
+        trims[rel_id] = {
+            "start": _milliseconds(trim.get("st")),
+            "end": _milliseconds(trim.get("end")),
+            "bookmarks": [_milliseconds(_attributes(tag).get("time")) for tag in _BOOKMARK_RE.findall(body)]
+        }
+    return trims
+
+
+def media_trim_ranges(names, read, is_media):
+    """Range of every media part that all of its uses trim
+    
+    Returns (trims, sources): trims maps zip names to dicts like those of
+    media_trims(), merged over all uses (the earliest start, the smallest
+    cut from the end, every bookmark); sources are the zip names of the
+    parts whose p14:media elements refer to them. A part that is used
+    anywhere without a p14:media element (or untrimmed) is left out.
+    """
+    by_key = {part_key(name): name for name in names if not name.endswith("/")}
+    trims = {}
+    unbounded = set()
+    sources = collections.defaultdict(set)
+    
+    for rels_key, rels_name in by_key.items():
+        if not is_rels(rels_key):
+            continue
+        source = source_part_for_rels(rels_key)
+        uses = collections.defaultdict(list)
+        for rel in parse_rels(read(rels_name)):
+            if rel.get("TargetMode") == "External" or "Target" not in rel or "Id" not in rel:
+                continue
+            target = by_key.get(resolve_target(source, rel["Target"]))
+            if target is not None and is_media(target.lower()):
+                uses[target].append(rel["Id"])
+        if not uses:
+            continue
+        
+        entries = media_trims(read(by_key[source])) if source.lower().endswith(".xml") and source in by_key else {}
+        for target, rel_ids in uses.items():
+            found = [entries[rel_id] for rel_id in rel_ids if rel_id in entries]
+            if not found:
+                # e.g. an audio link without the 2010 extension: plays the whole file
+                unbounded.add(target)
+                continue
+            sources[target].add(by_key[source])
+            for entry in found:
+                merged = trims.setdefault(target, {"start": entry["start"], "end": entry["end"], "bookmarks": []})
+                merged["start"] = min(merged["start"], entry["start"])
+                merged["end"] = min(merged["end"], entry["end"])
+                merged["bookmarks"].extend(entry["bookmarks"])
+    
+    trims = {name: trim for name, trim in trims.items()
+             if name not in unbounded and (trim["start"] or trim["end"])}
+    return trims, {name: sources[name] for name in trims}
+
+
+def retime_media(data, cuts):
+    """Shift p14:trim and p14:bmk times after media was cut (None if unchanged)
+    
+    cuts maps r:embed ids to (start_ms, tail_ms): the milliseconds removed
+    from the beginning and from the end of that media part.
+    """
+    text = data.decode("utf-8")
+    changed = False
+    
+    def set_attribute(tag, name, value):
+        return re.sub(r'(\b%s\s*=\s*)("[^"]*"|\'[^\']*\')' % name,
+                      lambda m: m.group(1) + '"' + _format_milliseconds(value) + '"', tag, count=1)
+    
+    def replace(match):
+        nonlocal changed
+        rel_id = _attributes(match.group(2)).get("embed")
+        if rel_id not in cuts or not match.group(4):
+            return match.group(0)
+        start_cut, tail_cut = cuts[rel_id]
+        changed = True
+        
+        def trim(tag_match):
+            tag = tag_match.group(0)
+            attrs = _attributes(tag)
+            if "st" in attrs:
+                tag = set_attribute(tag, "st", _milliseconds(attrs["st"]) - start_cut)
+            if "end" in attrs:
+                tag = set_attribute(tag, "end", _milliseconds(attrs["end"]) - tail_cut)
+            return tag
+        
+        def bookmark(tag_match):
+            tag = tag_match.group(0)
+            attrs = _attributes(tag)
+            if "time" not in attrs:
+                return tag
+            return set_attribute(tag, "time", _milliseconds(attrs["time"]) - start_cut)
+        
+        body = _BOOKMARK_RE.sub(bookmark, _TRIM_RE.sub(trim, match.group(4)))
+        return match.group(0)[:match.start(4) - match.start(0)] + body + match.group(0)[match.end(4) - match.start(0):]
+    
+    text = _MEDIA_RE.sub(replace, text)
+    return text.encode("utf-8") if changed else None
@@ -11,32 +11,17 @@ Copyright © 2025 Shilezi. Unauthorized distribution is prohibited.
 ================================================================================
 """
 
-import zipfile
 import os
-import io
-import shutil
-import subprocess
-import tempfile
 import sys
 import threading
-import time
-from datetime import datetime
-from functools import lru_cache
-import random
+import multiprocessing
 
 # GUI imports
 import customtkinter as ctk
 from tkinter import filedialog, messagebox, ttk
 
-# Image processing
-from PIL import Image, ImageTk
-
-# Try to import win32com for PowerPoint automation
-try:
-    import win32com.client
-    HAS_COM = True
-except ImportError:
-    HAS_COM = False
+# Compression engine (re-exported for existing imports of this module)
+from office_optimizer_core import CONFIG, OfficeCompressor, BatchScheduler
 
 # ============================================================================
 # BRANDING PROTECTION
@@ -55,586 +40,11 @@ def verify_authenticity():
         # Check year
         if "2025" not in content:
             return False, "Invalid build year"
-            
+        
         return True, "Authentic Shilezi v5.4 Build (2025)"
     except:
         return False, "Integrity check failed"
 
-# ============================================================================
-# CONFIGURATION CONSTANTS
-# ============================================================================
-
-CONFIG = {
-    "version": "5.4.0",
-    "year": "2025",
-    "author": "Shilezi",
-    "repository": "https://github.com/shilezi/office-optimizer-pro",
-    "max_file_size": 2 * 1024 * 1024 * 1024,  # 2GB
-    "chunk_size": 10 * 1024 * 1024,
-    "temp_backup_dir": os.path.join(tempfile.gettempdir(), "office_optimizer_backups"),
-    "presets": {
-        "Balanced (Recommended)": {"quality": 70, "max_width": 1920},
-        "Strong (Smallest)": {"quality": 50, "max_width": 1280},
-        "High Quality (Print)": {"quality": 90, "max_width": 3840},
-        "Email (Light)": {"quality": 60, "max_width": 1024},
-        "Archive (Lossless)": {"quality": 95, "max_width": 1920}
-    }
-}
-
-# Display authenticity check on import
-is_authentic, auth_message = verify_authenticity()
-if not is_authentic:
-    print(f"⚠️ WARNING: {auth_message}")
-    print("Download the official version from: https://github.com/shilezi/office-optimizer-pro")
-
-# ============================================================================
-# CORE COMPRESSION ENGINE
-# ============================================================================
-
-class OfficeCompressor:
-    """Main compression engine with enhanced features - Shilezi v5.4 (2025)"""
-    
-    def __init__(self, quality=70, max_width=1920, compress_video=False, 
-                 png_smart_convert=False, enable_backup=True):
-        self.quality = quality
-        self.max_width = max_width
-        self.compress_video_flag = compress_video
-        self.png_smart_convert = png_smart_convert
-        self.enable_backup = enable_backup
-        self.chunk_size = CONFIG["chunk_size"]
-        self.stats = {
-            "files_processed": 0,
-            "total_savings_bytes": 0,
-            "total_original_size": 0,
-            "processing_time": 0
-        }
-        
-        # Locate FFmpeg
-        self.ffmpeg_path = self._find_ffmpeg()
-        
-        # Create backup directory
-        if enable_backup and not os.path.exists(CONFIG["temp_backup_dir"]):
-            os.makedirs(CONFIG["temp_backup_dir"], exist_ok=True)
-    
-    def _find_ffmpeg(self):
-        """Find FFmpeg executable in various locations"""
-        # Check in current directory
-        if getattr(sys, 'frozen', False):
-            base_path = os.path.dirname(sys.executable)
-        else:
-            base_path = os.path.dirname(os.path.abspath(__file__))
-        
-        # Check local directory first
-        local_ffmpeg = os.path.join(base_path, "ffmpeg.exe")
-        if os.path.exists(local_ffmpeg):
-            return local_ffmpeg
-        
-        # Check in ffmpeg/ subdirectory
-        ffmpeg_dir = os.path.join(base_path, "ffmpeg")
-        if os.path.exists(ffmpeg_dir):
-            local_ffmpeg = os.path.join(ffmpeg_dir, "ffmpeg.exe")
-            if os.path.exists(local_ffmpeg):
-                return local_ffmpeg
-        
-        # Check system PATH
-        return shutil.which("ffmpeg")
-    
-    def check_ffmpeg(self):
-        """Check if FFmpeg is available and working"""
-        if not self.ffmpeg_path:
-            return False, "FFmpeg not found. Video/Audio compression disabled."
-        
-        try:
-            startupinfo = None
-            if os.name == 'nt':
-                startupinfo = subprocess.STARTUPINFO()
-                startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-            
-            result = subprocess.run(
-                [self.ffmpeg_path, "-version"],
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                startupinfo=startupinfo,
-                timeout=5
-            )
-            
-            if result.returncode == 0:
-                return True, f"Ready: {os.path.basename(self.ffmpeg_path)}"
-            else:
-                return False, "FFmpeg returned error code"
-                
-        except subprocess.TimeoutExpired:
-            return False, "FFmpeg check timeout"
-        except Exception as e:
-            return False, f"FFmpeg Error: {str(e)}"
-    
-    def validate_file(self, filepath):
-        """Validate if file is a valid Office file and within size limits"""
-        # Check file exists
-        if not os.path.exists(filepath):
-            return False, "File does not exist"
-        
-        # Check file size
-        size = os.path.getsize(filepath)
-        if size > CONFIG["max_file_size"]:
-            return False, f"File too large ({self._format_bytes(size)} > {self._format_bytes(CONFIG['max_file_size'])})"
-        
-        # Check if it's a valid Office file (zip with specific structure)
-        if not filepath.lower().endswith(('.pptx', '.docx', '.xlsx')):
-            return False, "Not a supported Office file (.pptx, .docx, .xlsx)"
-        
-        try:
-            with zipfile.ZipFile(filepath, 'r') as zf:
-                # Quick validation by checking for required Office file structure
-                required = ['[Content_Types].xml']
-                has_required = any(f in zf.namelist() for f in required)
-                if not has_required:
-                    return False, "Not a valid Office file (missing required structure)"
-            return True, "Valid"
-        except zipfile.BadZipFile:
-            return False, "Not a valid ZIP/Office file"
-        except Exception as e:
-            return False, f"Validation error: {str(e)}"
-    
-    def create_backup(self, filepath):
-        """Create timestamped backup of original file"""
-        if not self.enable_backup:
-            return None
-        
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        backup_name = f"{os.path.basename(filepath)}.backup_{timestamp}"
-        backup_path = os.path.join(CONFIG["temp_backup_dir"], backup_name)
-        
-        try:
-            shutil.copy2(filepath, backup_path)
-            return backup_path
-        except Exception:
-            return None
-    
-    def restore_backup(self, backup_path, original_path):
-        """Restore file from backup"""
-        if backup_path and os.path.exists(backup_path):
-            try:
-                shutil.copy2(backup_path, original_path)
-                return True
-            except Exception:
-                return False
-        return False
-    
-    def _has_actual_transparency(self, img):
-        """Check if PNG actually uses transparency (not just has alpha channel)"""
-        if img.mode in ('RGBA', 'LA', 'PA'):
-            # For performance, sample random pixels instead of checking entire image
-            sample_size = min(500, img.width * img.height)
-            
-            # Create a list of random positions to check
-            positions = []
-            for _ in range(sample_size):
-                x = random.randint(0, img.width - 1)
-                y = random.randint(0, img.height - 1)
-                positions.append((x, y))
-            
-            # Check alpha channel
-            if img.mode == 'RGBA':
-                alpha = img.getchannel('A')
-                for x, y in positions:
-                    if alpha.getpixel((x, y)) < 250:  # Not fully opaque
-                        return True
-            elif img.mode in ('LA', 'PA'):
-                # LA = Luminance + Alpha, PA = Palette + Alpha
-                for x, y in positions:
-                    pixel = img.getpixel((x, y))
-                    if len(pixel) > 1 and pixel[1] < 250:
-                        return True
-        elif img.mode == 'P' and 'transparency' in img.info:
-            # Paletted image with transparency
-            return True
-        
-        return False
-    
-    def compress(self, input_path, output_path, progress_callback=None, log_callback=None):
-        """Main compression method with enhanced error handling"""
-        start_time = time.time()
-        original_size = os.path.getsize(input_path)
-        working_input = input_path
-        temp_cleaned = None
-        backup_path = None
-        
-        try:
-            # Validate input file
-            is_valid, msg = self.validate_file(input_path)
-            if not is_valid:
-                if log_callback:
-                    log_callback(f"Validation failed: {msg}")
-                return False
-            
-            # Create backup if enabled
-            if self.enable_backup:
-                backup_path = self.create_backup(input_path)
-                if backup_path and log_callback:
-                    log_callback(f"Backup created: {os.path.basename(backup_path)}")
-            
-            # Step 0: Structure Clean (PowerPoint only)
-            if HAS_COM and input_path.lower().endswith('.pptx'):
-                working_input = self._clean_presentation_structure(input_path, log_callback)
-                if working_input != input_path:
-                    temp_cleaned = working_input
-            
-            # Open input and output ZIP files
-            with zipfile.ZipFile(working_input, 'r') as in_zip:
-                with zipfile.ZipFile(output_path, 'w', compression=zipfile.ZIP_DEFLATED) as out_zip:
-                    
-                    file_list = in_zip.infolist()
-                    total_files = len(file_list)
-                    
-                    for i, item in enumerate(file_list):
-                        # Update progress
-                        if progress_callback and i % 10 == 0:
-                            progress_pct = (i / total_files) * 100
-                            progress_callback(progress_pct)
-                        
-                        f_lower = item.filename.lower()
-                        
-                        # Process based on file type
-                        if self._is_image(f_lower):
-                            self._process_image(item, in_zip, out_zip, log_callback)
-                        elif self.compress_video_flag and self._is_video(f_lower):
-                            if self.ffmpeg_path:
-                                if log_callback:
-                                    log_callback(f"Video: {self._truncate_name(item.filename)}...")
-                                self._process_video(item, in_zip, out_zip)
-                            else:
-                                self._copy_file(item, in_zip, out_zip)
-                        elif self.compress_video_flag and self._is_audio(f_lower):
-                            if self.ffmpeg_path:
-                                if log_callback:
-                                    log_callback(f"Audio: {self._truncate_name(item.filename)}...")
-                                self._process_audio(item, in_zip, out_zip)
-                            else:
-                                self._copy_file(item, in_zip, out_zip)
-                        else:
-                            self._copy_file(item, in_zip, out_zip)
-            
-            # Calculate statistics
-            compressed_size = os.path.getsize(output_path)
-            self.stats["files_processed"] += 1
-            self.stats["total_original_size"] += original_size
-            self.stats["total_savings_bytes"] += (original_size - compressed_size)
-            self.stats["processing_time"] += (time.time() - start_time)
-            
-            if log_callback:
-                savings_pct = ((original_size - compressed_size) / original_size * 100) if original_size > 0 else 0
-                log_callback(f"Complete: Saved {self._format_bytes(original_size - compressed_size)} ({savings_pct:.1f}%)")
-            
-            # Clean up temporary files
-            if temp_cleaned and os.path.exists(temp_cleaned):
-                try:
-                    shutil.rmtree(os.path.dirname(temp_cleaned), ignore_errors=True)
-                except:
-                    pass
-            
-            return True
-            
-        except Exception as e:
-            if log_callback:
-                log_callback(f"Error: {str(e)}")
-            
-            # Try to restore from backup on error
-            if backup_path and os.path.exists(backup_path):
-                self.restore_backup(backup_path, input_path)
-                if log_callback:
-                    log_callback("Restored from backup due to error")
-            
-            return False
-    
-    def _clean_presentation_structure(self, input_path, log_callback=None):
-        """Clean PowerPoint presentation structure (remove unused layouts)"""
-        if not HAS_COM:
-            return input_path
-        
-        try:
-            temp_dir = tempfile.mkdtemp()
-            temp_pptx = os.path.join(temp_dir, "clean_" + os.path.basename(input_path))
-            shutil.copy2(input_path, temp_pptx)
-            
-            if log_callback:
-                log_callback("Optimizing PowerPoint structure...")
-            
-            ppt_app = None
-            presentation = None
-            
-            try:
-                # Initialize PowerPoint
-                ppt_app = win32com.client.Dispatch("PowerPoint.Application")
-                ppt_app.Visible = False
-                ppt_app.DisplayAlerts = False
-                
-                # Open presentation
-                abs_path = os.path.abspath(temp_pptx)
-                presentation = ppt_app.Presentations.Open(abs_path, WithWindow=False)
-                
-                # Save cleaned copy
-                cleaned_path = os.path.join(temp_dir, "cleaned_structure.pptx")
-                presentation.SaveCopyAs(os.path.abspath(cleaned_path))
-                
-                return cleaned_path
-                
-            except Exception as e:
-                if log_callback:
-                    log_callback(f"PowerPoint optimization skipped: {str(e)}")
-                return input_path
-                    
-            finally:
-                # Clean up COM objects properly
-                if presentation:
-                    presentation.Close()
-                if ppt_app:
-                    ppt_app.Quit()
-                
-                # Force garbage collection
-                import gc
-                gc.collect()
-                
-        except Exception:
-            return input_path
-    
-    def _process_image(self, zip_info, in_zip, out_zip, log_callback=None):
-        """Process and compress image files"""
-        try:
-            img_data = in_zip.read(zip_info.filename)
-            
-            # Use BytesIO for in-memory processing
-            with Image.open(io.BytesIO(img_data)) as img:
-                original_mode = img.mode
-                original_size = len(img_data)
-                
-                # Resize if needed
-                if img.width > self.max_width or img.height > self.max_width:
-                    img.thumbnail((self.max_width, self.max_width), Image.Resampling.LANCZOS)
-                
-                out_buffer = io.BytesIO()
-                is_png = zip_info.filename.lower().endswith('.png')
-                save_format = 'JPEG'
-                
-                # PNG handling with smart conversion
-                if is_png:
-                    save_format = 'PNG'  # Default
-                    
-                    if self.png_smart_convert:
-                        # Check if PNG actually uses transparency
-                        has_transparency = self._has_actual_transparency(img)
-                        
-                        if not has_transparency:
-                            # Opaque PNG - convert to JPEG for better compression
-                            save_format = 'JPEG'
-                            img = img.convert('RGB')
-                            if log_callback:
-                                log_callback(f"  Converted PNG to JPEG: {os.path.basename(zip_info.filename)}")
-                
-                # Handle other formats
-                if not is_png and img.mode != 'RGB':
-                    img = img.convert('RGB')
-                
-                # Save with appropriate settings
-                if save_format == 'JPEG':
-                    img.save(out_buffer, format='JPEG', quality=self.quality, optimize=True)
-                else:
-                    # Optimize PNG (quantize if RGBA)
-                    if img.mode == 'RGBA':
-                        img = img.quantize(colors=256, method=2)
-                    img.save(out_buffer, format='PNG', optimize=True)
-                
-                compressed_size = out_buffer.tell()
-                
-                # Only replace if we actually saved space
-                if compressed_size < original_size:
-                    out_zip.writestr(zip_info.filename, out_buffer.getvalue())
-                    if log_callback:
-                        savings = original_size - compressed_size
-                        log_callback(f"  Compressed: {os.path.basename(zip_info.filename)} (-{self._format_bytes(savings)})")
-                else:
-                    # Keep original if compression didn't help
-                    self._copy_file(zip_info, in_zip, out_zip)
-                    
-        except Exception as e:
-            if log_callback:
-                log_callback(f"  Image processing error: {str(e)}")
-            self._copy_file(zip_info, in_zip, out_zip)
-    
-    def _process_video(self, zip_info, in_zip, out_zip):
-        """Compress video files using FFmpeg"""
-        temp_dir = tempfile.mkdtemp()
-        original = os.path.join(temp_dir, "orig" + os.path.splitext(zip_info.filename)[1])
-        compressed = os.path.join(temp_dir, "comp.mp4")
-        
-        try:
-            # Extract original video
-            with in_zip.open(zip_info) as src, open(original, 'wb') as dst:
-                shutil.copyfileobj(src, dst)
-            
-            original_size = os.path.getsize(original)
-            
-            # Determine compression settings based on quality
-            if self.quality <= 50:  # Strong compression
-                crf_val = '12'
-                audio_bitrate = '192k'
-                scale_width = 1280
-                fps_filter = ",fps=30"
-                preset = 'fast'
-            elif self.quality <= 70:  # Balanced
-                crf_val = '4'
-                audio_bitrate = '256k'
-                scale_width = 1920
-                fps_filter = ""
-                preset = 'medium'
-            else:  # High quality
-                crf_val = '1'
-                audio_bitrate = '320k'
-                scale_width = 3840
-                fps_filter = ""
-                preset = 'slow'
-            
-            # Limit scale width
-            if self.max_width < scale_width:
-                scale_width = self.max_width
-            
-            # Build FFmpeg command
-            cmd = [
-                self.ffmpeg_path, '-y', '-i', original,
-                '-vcodec', 'libx264', '-crf', crf_val,
-                '-preset', preset,
-                '-vf', f"scale='min({scale_width},iw)':-2{fps_filter}",
-                '-ac', '2', '-b:a', audio_bitrate,
-                '-movflags', '+faststart',
-                compressed
-            ]
-            
-            # Run FFmpeg
-            startupinfo = None
-            if os.name == 'nt':
-                startupinfo = subprocess.STARTUPINFO()
-                startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-            
-            subprocess.run(
-                cmd,
-                stdout=subprocess.DEVNULL,
-                stderr=subprocess.DEVNULL,
-                check=True,
-                startupinfo=startupinfo,
-                timeout=300  # 5 minute timeout
-            )
-            
-            # Check if compression was beneficial
-            if os.path.exists(compressed):
-                compressed_size = os.path.getsize(compressed)
-                if compressed_size < original_size * 0.95:  # At least 5% savings
-                    with open(compressed, 'rb') as f:
-                        out_zip.writestr(zip_info.filename, f.read())
-                else:
-                    self._copy_file(zip_info, in_zip, out_zip)
-            else:
-                self._copy_file(zip_info, in_zip, out_zip)
-                
-        except subprocess.TimeoutExpired:
-            self._copy_file(zip_info, in_zip, out_zip)
-        except Exception:
-            self._copy_file(zip_info, in_zip, out_zip)
-        finally:
-            shutil.rmtree(temp_dir, ignore_errors=True)
-    
-    def _process_audio(self, zip_info, in_zip, out_zip):
-        """Compress audio files using FFmpeg"""
-        temp_dir = tempfile.mkdtemp()
-        original = os.path.join(temp_dir, "orig" + os.path.splitext(zip_info.filename)[1])
-        compressed = os.path.join(temp_dir, "comp.mp3")
-        
-        try:
-            # Extract original audio
-            with in_zip.open(zip_info) as src, open(original, 'wb') as dst:
-                shutil.copyfileobj(src, dst)
-            
-            # Build FFmpeg command based on file type
-            cmd = []
-            ext = zip_info.filename.lower()
-            
-            if ext.endswith('.wav'):
-                # Convert WAV to MP3
-                bitrate = '128k' if self.quality <= 50 else '192k'
-                cmd = [self.ffmpeg_path, '-y', '-i', original, '-codec:a', 'libmp3lame',
-                      '-b:a', bitrate, '-ac', '2', '-ar', '44100', compressed]
-            else:
-                # Re-encode other formats
-                bitrate = '128k' if self.quality <= 50 else ('192k' if self.quality <= 70 else '256k')
-                cmd = [self.ffmpeg_path, '-y', '-i', original, '-b:a', bitrate, compressed]
-            
-            # Run FFmpeg
-            startupinfo = None
-            if os.name == 'nt':
-                startupinfo = subprocess.STARTUPINFO()
-                startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-            
-            subprocess.run(
-                cmd,
-                stdout=subprocess.DEVNULL,
-                stderr=subprocess.DEVNULL,
-                check=True,
-                startupinfo=startupinfo,
-                timeout=60
-            )
-            
-            # Replace if compressed version is smaller
-            if os.path.exists(compressed) and os.path.getsize(compressed) < os.path.getsize(original):
-                with open(compressed, 'rb') as f:
-                    out_zip.writestr(zip_info.filename, f.read())
-            else:
-                self._copy_file(zip_info, in_zip, out_zip)
-                
-        except Exception:
-            self._copy_file(zip_info, in_zip, out_zip)
-        finally:
-            shutil.rmtree(temp_dir, ignore_errors=True)
-    
-    def _copy_file(self, zip_info, in_zip, out_zip):
-        """Copy file without modification"""
-        with in_zip.open(zip_info) as src, out_zip.open(zip_info, 'w') as dst:
-            shutil.copyfileobj(src, dst, self.chunk_size)
-    
-    def get_statistics(self):
-        """Get compression statistics"""
-        if self.stats["total_original_size"] == 0:
-            return {}
-        
-        savings_pct = (self.stats["total_savings_bytes"] / self.stats["total_original_size"] * 100)
-        
-        return {
-            "files_processed": self.stats["files_processed"],
-            "original_size": self._format_bytes(self.stats["total_original_size"]),
-            "savings_bytes": self._format_bytes(self.stats["total_savings_bytes"]),
-            "savings_percent": f"{savings_pct:.1f}%",
-            "processing_time": f"{self.stats['processing_time']:.1f}s",
-            "average_speed": self._format_bytes(self.stats["total_original_size"] / max(self.stats["processing_time"], 1)) + "/s"
-        }
-    
-    def _is_image(self, filename):
-        return 'media/' in filename and filename.endswith(('.png', '.jpg', '.jpeg', '.tiff', '.tif', '.bmp'))
-    
-    def _is_video(self, filename):
-        return 'media/' in filename and filename.endswith(('.mp4', '.m4v', '.mov', '.avi', '.wmv', '.mkv', '.flv', '.webm'))
-    
-    def _is_audio(self, filename):
-        return 'media/' in filename and filename.endswith(('.wav', '.mp3', '.m4a', '.wma', '.ogg', '.flac'))
-    
-    def _truncate_name(self, text, limit=40):
-        return text[:limit-3] + "..." if len(text) > limit else text
-    
-    def _format_bytes(self, size):
-        for unit in ['B', 'KB', 'MB', 'GB']:
-            if size < 1024.0:
-                return f"{size:.1f} {unit}"
-            size /= 1024.0
-        return f"{size:.1f} TB"
-
-
 # ============================================================================
 # MODERN GUI APPLICATION
 # ============================================================================
@@ -891,13 +301,22 @@ class OfficeOptimizerApp(ctk.CTk):
             onvalue=True,
             offvalue=False
         )
-        self.chk_backup.pack(side="left")
+        self.chk_backup.pack(side="left", padx=(0, 20))
         self.chk_backup.select()  # Enabled by default
         
+        # Skip files already optimized with the same settings
+        self.chk_skip = ctk.CTkSwitch(
+            options_frame,
+            text="Skip Unchanged",
+            onvalue=True,
+            offvalue=False
+        )
+        self.chk_skip.pack(side="left")  # Off by default: skipped files are not re-optimized
+        
         # Profile description
         self.lbl_profile_desc = ctk.CTkLabel(
             self.settings_frame,
-            text="Target: 70% Quality | 1920px (Full HD)",
+            text="Target: 70% Quality | 1920px (Full HD) | 220 DPI",
             text_color="#94a3b8",
             font=("Consolas", 11)
         )
@@ -1100,6 +519,7 @@ class OfficeOptimizerApp(ctk.CTk):
             preset = CONFIG["presets"][choice]
             self.lbl_profile_desc.configure(
                 text=f"Target: {preset['quality']}% Quality | {preset['max_width']}px"
+                     + (f" | {preset['target_dpi']} DPI" if preset.get("target_dpi") else "")
             )
     
     def _start_optimization(self):
@@ -1121,6 +541,7 @@ class OfficeOptimizerApp(ctk.CTk):
         compress_video = self.chk_video.get()
         png_smart = self.chk_png.get()
         enable_backup = self.chk_backup.get()
+        skip_unchanged = self.chk_skip.get()
         
         # Reset UI
         self.is_processing = True
@@ -1133,27 +554,55 @@ class OfficeOptimizerApp(ctk.CTk):
         thread = threading.Thread(
             target=self._run_optimization,
             args=(preset["quality"], preset["max_width"], replace_original, 
-                  compress_video, png_smart, enable_backup),
+                  compress_video, png_smart, enable_backup, profile, skip_unchanged,
+                  preset.get("target_dpi")),
             daemon=True
         )
         thread.start()
     
     def _run_optimization(self, quality, max_width, replace_original, 
-                         compress_video, png_smart, enable_backup):
+                         compress_video, png_smart, enable_backup,
+                         profile=None, skip_unchanged=False, target_dpi=None):
         """Run optimization engine in background thread"""
         engine = OfficeCompressor(
             quality=quality,
             max_width=max_width,
             compress_video=compress_video,
             png_smart_convert=png_smart,
-            enable_backup=enable_backup
+            enable_backup=enable_backup,
+            target_dpi=target_dpi
         )
+        scheduler = BatchScheduler()
         
-        total_files = len(self.files)
+        # Incremental index of already optimized files
+        index = None
+        if skip_unchanged:
+            try:
+                from office_optimizer_index import OptimizationIndex
+                index = OptimizationIndex()
+            except Exception as e:
+                self._thread_safe_update(lambda: self.lbl_status.configure(text=f"Index unavailable: {e}"))
+        output_settings = engine.output_settings()
         
-        for idx, filepath in enumerate(self.files):
+        total_files = len(self.files)
+        skipped = []
+        file_progress = {}
+        progress_lock = threading.Lock()
+        
+        # Several files run at once, so overall progress is the mean of all files
+        def report_progress(filepath, p):
+            with progress_lock:
+                file_progress[filepath] = p
+                overall_progress = sum(file_progress.values()) / 100 / total_files
+            self._thread_safe_update(lambda: self.progress_bar.set(overall_progress))
+        
+        # Create log callback
+        def log_callback(msg):
+            self._thread_safe_update(lambda: self.lbl_status.configure(text=msg))
+        
+        def process_file(filepath):
             if not self.is_processing:
-                break
+                return False
             
             # Update current file status using safe method
             self._thread_safe_update(
@@ -1167,20 +616,23 @@ class OfficeOptimizerApp(ctk.CTk):
                 base, ext = os.path.splitext(filepath)
                 out_path = f"{base}_Optimized{ext}"
             
-            # Create progress callback
-            def progress_callback(p):
-                overall_progress = (idx / total_files) + (p / 100 / total_files)
-                self._thread_safe_update(lambda: self.progress_bar.set(overall_progress))
-            
-            # Create log callback
-            def log_callback(msg):
-                self._thread_safe_update(lambda: self.lbl_status.configure(text=msg))
+            # Skip files that have not changed since they were last optimized
+            if index is not None and index.is_current(filepath, output_settings,
+                                                      filepath if replace_original else out_path):
+                with progress_lock:
+                    skipped.append(filepath)
+                self._thread_safe_update(
+                    lambda f=filepath: self._update_file_status(f, "Skipped (unchanged)", "#94a3b8")
+                )
+                log_callback(f"Skipped {os.path.basename(filepath)}: already optimized with these settings")
+                report_progress(filepath, 100)
+                return True
             
             # Process the file
             success = engine.compress(
                 filepath, 
                 out_path, 
-                progress_callback, 
+                lambda p, f=filepath: report_progress(f, p), 
                 log_callback
             )
             
@@ -1193,11 +645,17 @@ class OfficeOptimizerApp(ctk.CTk):
                     except Exception as e:
                         status_text = "Error"
                         success = False
-                        if log_callback:
-                            log_callback(f"Replace failed: {str(e)}")
+                        log_callback(f"Replace failed: {str(e)}")
                 else:
                     status_text = "Saved"
                 
+                if success and index is not None:
+                    try:
+                        index.record(filepath, output_settings, profile,
+                                     output_path=filepath if replace_original else out_path)
+                    except Exception as e:
+                        log_callback(f"Index update failed: {str(e)}")
+                
                 if success:
                     self._thread_safe_update(
                         lambda f=filepath, t=status_text: self._update_file_status(f, t, "#4ade80")
@@ -1210,16 +668,26 @@ class OfficeOptimizerApp(ctk.CTk):
                 self._thread_safe_update(
                     lambda f=filepath: self._update_file_status(f, "Error", "#f87171")
                 )
+            
+            report_progress(filepath, 100)
+            return success
+        
+        try:
+            scheduler.run(list(self.files), process_file, should_continue=lambda: self.is_processing)
+        finally:
+            engine.close()
+            if index is not None:
+                index.close()
         
         # Update final status
         if self.is_processing:
             self.compression_stats = engine.get_statistics()
             
             self._thread_safe_update(lambda: self.progress_bar.set(1.0))
-            self._thread_safe_update(lambda: self.lbl_status.configure(
-                text=f"Complete! Processed {total_files} file{'s' if total_files != 1 else ''}",
-                text_color="#4ade80"
-            ))
+            summary = f"Complete! Processed {total_files} file{'s' if total_files != 1 else ''}"
+            if skipped:
+                summary += f" ({len(skipped)} skipped as unchanged - turn off Skip Unchanged to redo them)"
+            self._thread_safe_update(lambda: self.lbl_status.configure(text=summary, text_color="#4ade80"))
             
             # Show statistics
             if self.compression_stats:
@@ -1247,7 +715,7 @@ class OfficeOptimizerApp(ctk.CTk):
         # Create dialog
         dialog = ctk.CTkToplevel(self)
         dialog.title("Compression Statistics")
-        dialog.geometry("400x300")
+        dialog.geometry("400x330")
         dialog.resizable(False, False)
         dialog.transient(self)
         dialog.grab_set()
@@ -1275,7 +743,8 @@ class OfficeOptimizerApp(ctk.CTk):
             ("Original Size:", stats.get("original_size", "0 B")),
             ("Total Savings:", f"{stats.get('savings_bytes', '0 B')} ({stats.get('savings_percent', '0%')})"),
             ("Processing Time:", stats.get("processing_time", "0s")),
-            ("Average Speed:", stats.get("average_speed", "0 B/s"))
+            ("Average Speed:", stats.get("average_speed", "0 B/s")),
+            ("Peak Memory:", stats.get("peak_memory", "n/a"))
         ]:
             row = ctk.CTkFrame(stats_frame, fg_color="transparent")
             row.pack(fill="x", pady=5)
@@ -1366,6 +835,9 @@ class OfficeOptimizerApp(ctk.CTk):
 
 def main():
     """Main entry point"""
+    # Required for the image worker processes in frozen (PyInstaller) builds
+    multiprocessing.freeze_support()
+    
     # Display Shilezi branding
     print("\n" + "="*70)
     print("⚡ OFFICE OPTIMIZER PRO v5.4")
@@ -0,0 +1,200 @@
+"""
+================================================================================
+Office Optimizer Pro v5.4 - Per-File Profiling
+Opt-in cProfile and tracemalloc capture for slow or memory-hungry documents
+================================================================================
+CREATED BY: SHILEZI (https://github.com/shilezi)
+VERSION: 5.4.0 | RELEASE: 2025
+================================================================================
+PROPRIETARY SOFTWARE - ALL RIGHTS RESERVED
+Copyright © 2025 Shilezi. Unauthorized distribution is prohibited.
+================================================================================
+
+Pass a Profiler to OfficeCompressor(profiler=...). For every document the
+engine compresses, the thread running compress() is profiled with cProfile
+and Python allocations are traced with tracemalloc. Per document, the
+profiler writes:
+
+    <name>-<time>.pstats   cProfile dump (pstats.Stats, snakeviz, ...)
+    <name>-<time>.txt      summary: wall time, top functions, memory peak
+                           and the allocations alive closest to the peak
+
+In "always" mode every document is written; in "auto" mode only those that
+ran longer than the threshold, the others are discarded. Image workers and
+FFmpeg run in other processes and are not part of the profile; the time the
+writer spends waiting on them is.
+"""
+
+import cProfile
+import io
+import os
+import pstats
+import re
+import threading
+import time
+import tracemalloc
+from datetime import datetime
+
+from office_optimizer_core import CONFIG
+
+MODES = ("always", "auto")
+
+# Stack depth recorded per allocation (more frames, more overhead)
+TRACEMALLOC_FRAMES = 5
+
+# The memory sampler looks at the traced total this often...
+SAMPLE_INTERVAL = 0.1
+# ...and snapshots the allocations when it passes the last snapshot by this factor
+SNAPSHOT_GROWTH = 1.1
+
+
+class _Capture:
+    """State of one document being profiled"""
+    
+    def __init__(self, path):
+        self.path = path
+        self.started = time.perf_counter()
+        self.profile = cProfile.Profile()
+        self.profile_error = None
+        self.peak = 0
+        self.snapshot = None
+        self.snapshot_size = 0
+        self.overlapping = 0
+
+
+class Profiler:
+    """Capture cProfile and tracemalloc data per document
+    
+    directory: where reports go (created on first write).
+    mode: "always" or "auto" (keep only documents slower than threshold).
+    threshold: seconds of wall time for "auto" (default CONFIG["profiling_threshold"]).
+    top: functions and allocation sites listed in the summary.
+    """
+    
+    def __init__(self, directory, mode="always", threshold=None, top=None):
+        if mode not in MODES:
+            raise ValueError(f"Unknown profiling mode '{mode}'. Choose one of: {', '.join(MODES)}")
+        self.directory = directory
+        self.mode = mode
+        self.threshold = threshold if threshold is not None else CONFIG["profiling_threshold"]
+        self.top = top or CONFIG["profiling_top"]
+        
+        self._lock = threading.Lock()
+        self._active = []
+        self._started_tracing = False
+        self._stop = None
+    
+    def start(self, path):
+        """Begin profiling a document on the calling thread"""
+        capture = _Capture(path)
+        with self._lock:
+            if not self._active:
+                self._start_tracing()
+            capture.overlapping = len(self._active)
+            for other in self._active:
+                other.overlapping += 1
+            self._active.append(capture)
+        try:
+            capture.profile.enable()
+        except ValueError as e:
+            # Python 3.12+ allows one cProfile at a time per process
+            capture.profile = None
+            capture.profile_error = str(e)
+        return capture
+    
+    def finish(self, capture, ok=True):
+        """Stop profiling a document; returns the summary path when a report was written"""
+        if capture.profile is not None:
+            capture.profile.disable()
+        wall = time.perf_counter() - capture.started
+        
+        with self._lock:
+            self._sample(capture)
+            self._active.remove(capture)
+            if not self._active:
+                self._stop_tracing()
+        
+        if self.mode == "auto" and wall < self.threshold:
+            return None
+        try:
+            return self._write_report(capture, wall, ok)
+        except OSError:
+            return None
+    
+    def _start_tracing(self):
+        # Lock held. tracemalloc is process-wide: started with the first
+        # document and stopped after the last, unless something else runs it
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+            self._started_tracing = True
+        elif hasattr(tracemalloc, "reset_peak"):
+            tracemalloc.reset_peak()
+        self._stop = threading.Event()
+        threading.Thread(target=self._sample_loop, args=(self._stop,), name="profiling-sampler",
+                         daemon=True).start()
+    
+    def _stop_tracing(self):
+        # Lock held; the sampler exits without taking it again
+        self._stop.set()
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+    
+    def _sample_loop(self, stop):
+        while not stop.wait(SAMPLE_INTERVAL):
+            with self._lock:
+                if stop.is_set():
+                    return
+                for capture in self._active:
+                    self._sample(capture)
+    
+    def _sample(self, capture):
+        """Track the traced peak; snapshot allocations whenever it grew by SNAPSHOT_GROWTH"""
+        if not tracemalloc.is_tracing():
+            return
+        current, peak = tracemalloc.get_traced_memory()
+        capture.peak = max(capture.peak, peak)
+        if current > capture.snapshot_size * SNAPSHOT_GROWTH:
+            capture.snapshot = tracemalloc.take_snapshot().filter_traces(
+                (tracemalloc.Filter(False, tracemalloc.__file__),))
+            capture.snapshot_size = current
+    
+    def _write_report(self, capture, wall, ok):
+        os.makedirs(self.directory, exist_ok=True)
+        stem = re.sub(r"[^\w.-]+", "_", os.path.basename(capture.path))
+        # Microseconds keep names unique when same-named files run concurrently
+        base = os.path.join(self.directory, f"{stem}-{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}")
+        
+        lines = [
+            f"File: {capture.path}",
+            f"Status: {'ok' if ok else 'error'}",
+            f"Wall time: {wall:.2f}s (mode: {self.mode}, threshold: {self.threshold:g}s)",
+            f"Python heap peak (tracemalloc): {capture.peak / (1024 * 1024):.1f} MB",
+        ]
+        if capture.overlapping:
+            lines.append(f"Note: {capture.overlapping} other document(s) ran at the same time; "
+                         "memory figures are process-wide")
+        lines.append("")
+        
+        if capture.profile is not None:
+            capture.profile.dump_stats(base + ".pstats")
+            out = io.StringIO()
+            stats = pstats.Stats(capture.profile, stream=out)
+            stats.sort_stats("cumulative").print_stats(self.top)
+            lines.append(f"Top {self.top} functions by cumulative time (full profile: {base}.pstats)")
+            lines.append(out.getvalue().strip())
+        else:
+            lines.append(f"cProfile unavailable: {capture.profile_error}")
+        lines.append("")
+        
+        if capture.snapshot is not None:
+            lines.append(f"Top {self.top} allocation sites alive at "
+                         f"{capture.snapshot_size / (1024 * 1024):.1f} MB traced")
+            for stat in capture.snapshot.statistics("traceback")[:self.top]:
+                lines.append(f"{stat.size / 1024:10.1f} KiB in {stat.count} block(s)")
+                for frame in stat.traceback.format(limit=TRACEMALLOC_FRAMES):
+                    lines.append(f"  {frame}")
+        
+        with open(base + ".txt", 'w', encoding='utf-8') as f:
+            f.write("\n".join(lines) + "\n")
+        return base + ".txt"
@@ -0,0 +1,142 @@
+"""
+================================================================================
+Office Optimizer Pro v5.4 - Perceptual Quality Search
+Lowest JPEG quality that still meets an SSIM target, in a bounded number of passes
+================================================================================
+CREATED BY: SHILEZI (https://github.com/shilezi)
+VERSION: 5.4.0 | RELEASE: 2025
+================================================================================
+PROPRIETARY SOFTWARE - ALL RIGHTS RESERVED
+Copyright © 2025 Shilezi. Unauthorized distribution is prohibited.
+================================================================================
+
+A fixed quality over-compresses detailed photos and wastes bytes on flat
+screenshots. search_jpeg_quality() binary-searches the quality range
+instead, scoring each candidate by SSIM against the decoded, resized image
+the engine already holds (its luma is computed once and reused by every
+pass). Luma planes are float32; the window statistics are taken in float64
+over bands of at most SSIM_BAND_PIXELS, so a pass needs a fixed amount of
+memory beyond the planes (see working_set()). Needs numpy; without it the
+engine keeps the fixed quality.
+"""
+
+import io
+
+# Standard SSIM stabilizers for 8-bit data: (0.01 * 255)^2 and (0.03 * 255)^2
+SSIM_C1 = 6.5025
+SSIM_C2 = 58.5225
+
+# Side of the square window SSIM statistics are taken over
+SSIM_WINDOW = 8
+
+# Pixels per band of rows the statistics are computed over
+SSIM_BAND_PIXELS = 1 << 17
+
+# Bytes per band pixel: two float64 band copies, three products, five
+# summed-area tables and the intermediate statistics
+SSIM_BAND_BYTES_PER_PIXEL = 16 * 8
+
+# Bytes per image pixel held during a pass: the float32 reference and
+# candidate luma, the decoded candidate (Pillow: 4 bytes) and its "L" copy
+SSIM_BYTES_PER_PIXEL = 4 + 4 + 4 + 1
+
+
+def available():
+    """True when numpy can be imported (checked without importing it)"""
+    import importlib.util
+    return importlib.util.find_spec("numpy") is not None
+
+
+def working_set(pixels):
+    """Bytes search_jpeg_quality() holds for an image of this many pixels"""
+    return pixels * SSIM_BYTES_PER_PIXEL + min(pixels, SSIM_BAND_PIXELS) * SSIM_BAND_BYTES_PER_PIXEL
+
+
+def luma(img):
+    """Float32 luma plane of a PIL image (ITU-R 601, as Pillow converts to "L")"""
+    import numpy as np
+    return np.asarray(img.convert("L"), dtype=np.float32)
+
+
+def _window_means(plane, size):
+    """Mean over every size x size window, from a summed-area table"""
+    import numpy as np
+    table = np.zeros((plane.shape[0] + 1, plane.shape[1] + 1))
+    np.cumsum(np.cumsum(plane, axis=0), axis=1, out=table[1:, 1:])
+    sums = table[size:, size:] - table[:-size, size:] - table[size:, :-size] + table[:-size, :-size]
+    return sums / (size * size)
+
+
+def ssim(reference, candidate, window=SSIM_WINDOW):
+    """Mean SSIM of two same-sized luma planes (1.0 = identical)"""
+    import numpy as np
+    height, width = reference.shape
+    size = min(window, height, width)
+    # Bands overlap by size - 1 rows, so every window falls in exactly one
+    rows = max(size, SSIM_BAND_PIXELS // width)
+    total = 0.0
+    count = 0
+    for top in range(0, height - size + 1, rows - size + 1):
+        band = slice(top, min(height, top + rows))
+        score = _ssim_map(reference[band].astype(np.float64), candidate[band].astype(np.float64), size)
+        total += float(score.sum())
+        count += score.size
+    return total / count
+
+
+def _ssim_map(reference, candidate, size):
+    """SSIM of every size x size window of two same-sized planes"""
+    mu_x = _window_means(reference, size)
+    mu_y = _window_means(candidate, size)
+    var_x = _window_means(reference * reference, size) - mu_x * mu_x
+    var_y = _window_means(candidate * candidate, size) - mu_y * mu_y
+    cov = _window_means(reference * candidate, size) - mu_x * mu_y
+    
+    score = ((2 * mu_x * mu_y + SSIM_C1) * (2 * cov + SSIM_C2)) / \
+            ((mu_x * mu_x + mu_y * mu_y + SSIM_C1) * (var_x + var_y + SSIM_C2))
+    return score
+
+
+def search_jpeg_quality(img, target, low, high, max_passes, encoder=None, **save_args):
+    """Smallest-quality JPEG of img whose SSIM reaches target
+    
+    Binary search over [low, high], at most max_passes encodes. Returns
+    (data, quality, score, passes); when no candidate reaches the target
+    the image is encoded once more at high and that is returned.
+    encoder(img, quality) -> bytes replaces Pillow's encoder (save_args
+    only apply to Pillow).
+    """
+    reference = luma(img)
+    
+    def encode(quality):
+        if encoder is not None:
+            return encoder(img, quality)
+        buffer = io.BytesIO()
+        img.save(buffer, format='JPEG', quality=quality, **save_args)
+        return buffer.getvalue()
+    
+    def score(data):
+        from PIL import Image
+        with Image.open(io.BytesIO(data)) as decoded:
+            return ssim(reference, luma(decoded))
+    
+    top = high
+    best = None
+    passes = 0
+    while low <= high and passes < max_passes:
+        quality = (low + high) // 2
+        data = encode(quality)
+        passes += 1
+        value = score(data)
+        if value >= target:
+            best = (data, quality, value)
+            high = quality - 1
+        else:
+            low = quality + 1
+    
+    if best is None:
+        # Nothing tried reached the target: settle for the top of the range
+        data = encode(top)
+        passes += 1
+        best = (data, top, score(data))
+    return best + (passes,)
@@ -0,0 +1,92 @@
+"""
+================================================================================
+Office Optimizer Pro v5.4 - Pipeline Trace Export
+Timeline of every compression stage in Chrome Trace Event format
+================================================================================
+CREATED BY: SHILEZI (https://github.com/shilezi)
+VERSION: 5.4.0 | RELEASE: 2025
+================================================================================
+PROPRIETARY SOFTWARE - ALL RIGHTS RESERVED
+Copyright © 2025 Shilezi. Unauthorized distribution is prohibited.
+================================================================================
+
+Pass a TraceRecorder to OfficeCompressor(tracer=...) and save() it after the
+run; open the JSON file in https://ui.perfetto.dev or chrome://tracing.
+Each batch thread, FFmpeg thread and image worker process gets its own
+track, so overlap, stalls and idle workers are visible at a glance.
+
+Timestamps come from time.perf_counter_ns(), which is a system-wide
+monotonic clock on Windows, Linux and macOS, so spans measured inside the
+image worker processes line up with those of the main process.
+"""
+
+import contextlib
+import json
+import os
+import threading
+import time
+
+
+class TraceRecorder:
+    """Thread-safe collector of complete ("X") trace events"""
+    
+    def __init__(self):
+        self.origin_ns = time.perf_counter_ns()
+        self.pid = os.getpid()
+        self._lock = threading.Lock()
+        self._events = []
+        self._processes = set()
+        self._threads = set()
+    
+    @contextlib.contextmanager
+    def span(self, name, category="stage", **args):
+        """Record the enclosed block as one span on the calling thread"""
+        started = time.perf_counter_ns()
+        try:
+            yield
+        finally:
+            self.add_span(name, category, started, time.perf_counter_ns() - started, **args)
+    
+    def add_span(self, name, category, start_ns, duration_ns, pid=None, tid=None, **args):
+        """Record a finished span; pid/tid default to this process and the calling thread"""
+        if pid is None:
+            pid = self.pid
+        if tid is None:
+            thread = threading.current_thread()
+            tid, track = thread.ident, thread.name
+        else:
+            track = None
+        event = {
+            "name": name,
+            "cat": category,
+            "ph": "X",
+            "ts": (start_ns - self.origin_ns) / 1000,
+            "dur": duration_ns / 1000,
+            "pid": pid,
+            "tid": tid
+        }
+        if args:
+            event["args"] = args
+        
+        with self._lock:
+            # Name each process and thread track the first time it appears
+            if pid not in self._processes:
+                self._processes.add(pid)
+                process = "office optimizer" if pid == self.pid else f"image worker {pid}"
+                self._events.append({"name": "process_name", "ph": "M", "pid": pid, "tid": tid,
+                                     "args": {"name": process}})
+            if (pid, tid) not in self._threads:
+                self._threads.add((pid, tid))
+                self._events.append({"name": "thread_name", "ph": "M", "pid": pid, "tid": tid,
+                                     "args": {"name": track or f"worker {pid}"}})
+            self._events.append(event)
+    
+    def to_dict(self):
+        with self._lock:
+            events = list(self._events)
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+    
+    def save(self, path):
+        """Write the trace as Chrome Trace Event JSON"""
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f)
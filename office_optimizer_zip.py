@@ -0,0 +1,301 @@
+"""
+================================================================================
+Office Optimizer Pro v5.4 - ZIP Writer
+Output archives with raw passthrough of unchanged entries
+================================================================================
+CREATED BY: SHILEZI (https://github.com/shilezi)
+VERSION: 5.4.0 | RELEASE: 2025
+================================================================================
+PROPRIETARY SOFTWARE - ALL RIGHTS RESERVED
+Copyright © 2025 Shilezi. Unauthorized distribution is prohibited.
+================================================================================
+
+zipfile has no public way to add an entry's compressed bytes as they are,
+so the engine writes its output through ZipWriter: the open()/writestr()
+calls of zipfile.ZipFile in 'w' mode, plus copy_raw(), which moves an entry
+of another archive across without inflating and deflating it. ZipWriter
+writes the local headers and the central directory (ZIP64 included) itself
+and never touches zipfile internals; its archives are read with plain
+zipfile.
+"""
+
+import io
+import os
+import struct
+import threading
+import time
+import zipfile
+import zlib
+
+# Largest values of the classic header fields; beyond them ZIP64 records are used
+ZIP64_LIMIT = (1 << 31) - 1
+ZIP_FILECOUNT_LIMIT = (1 << 16) - 1
+
+_LOCAL_HEADER = struct.Struct('<4s2B4HL2L2H')
+_CENTRAL_HEADER = struct.Struct('<4s4B4HL2L5H2L')
+_END_RECORD = struct.Struct('<4s4H2LH')
+_END_RECORD64 = struct.Struct('<4sQ2H2L4Q')
+_END_LOCATOR64 = struct.Struct('<4sLQL')
+_LOCAL_SIGNATURE = b'PK\x03\x04'
+_ZIP64_EXTRA = 0x0001
+_UTF8_FLAG = 0x800
+_ENCRYPTED_FLAG = 0x1
+_DEFAULT_VERSION = 20
+_ZIP64_VERSION = 45
+_MAX_32 = 0xFFFFFFFF
+_MAX_16 = 0xFFFF
+
+# A streamed entry gets ZIP64 header fields when its announced size is this
+# close to the limit (stored data can come out larger than announced)
+_ZIP64_MARGIN = 1.05
+
+
+def _dos_time(date_time):
+    year, month, day, hour, minute, second = date_time[:6]
+    return hour << 11 | minute << 5 | second // 2, (year - 1980) << 9 | month << 5 | day
+
+
+class _Entry:
+    """An entry as it is laid out in the archive, for its headers"""
+    
+    def __init__(self, info, header_offset, zip64):
+        try:
+            self.name, self.flags = info.filename.encode('ascii'), 0
+        except UnicodeEncodeError:
+            self.name, self.flags = info.filename.encode('utf-8'), _UTF8_FLAG
+        self.info = info
+        self.header_offset = header_offset
+        self.zip64 = zip64
+    
+    def local_header(self):
+        info = self.info
+        compress_size, file_size, extra = info.compress_size, info.file_size, b''
+        if self.zip64:
+            # The header is written before the sizes are known and patched
+            # afterwards, so both 64-bit fields are always present
+            extra = struct.pack('<HHQQ', _ZIP64_EXTRA, 16, file_size, compress_size)
+            compress_size = file_size = _MAX_32
+        version = _ZIP64_VERSION if self.zip64 else _DEFAULT_VERSION
+        dos_time, dos_date = _dos_time(info.date_time)
+        return _LOCAL_HEADER.pack(_LOCAL_SIGNATURE, version, 0, self.flags, info.compress_type,
+                                  dos_time, dos_date, info.CRC, compress_size, file_size,
+                                  len(self.name), len(extra)) + self.name + extra
+    
+    def central_header(self):
+        info = self.info
+        file_size, compress_size, header_offset = info.file_size, info.compress_size, self.header_offset
+        large = []
+        if file_size > ZIP64_LIMIT:
+            large.append(file_size)
+            file_size = _MAX_32
+        if compress_size > ZIP64_LIMIT:
+            large.append(compress_size)
+            compress_size = _MAX_32
+        if header_offset > ZIP64_LIMIT:
+            large.append(header_offset)
+            header_offset = _MAX_32
+        extra = struct.pack(f'<HH{len(large)}Q', _ZIP64_EXTRA, 8 * len(large), *large) if large else b''
+        version = _ZIP64_VERSION if large or self.zip64 else _DEFAULT_VERSION
+        dos_time, dos_date = _dos_time(info.date_time)
+        return _CENTRAL_HEADER.pack(b'PK\x01\x02', version, info.create_system, version, 0, self.flags,
+                                    info.compress_type, dos_time, dos_date, info.CRC, compress_size,
+                                    file_size, len(self.name), len(extra), 0, 0, info.internal_attr,
+                                    info.external_attr, header_offset) + self.name + extra
+
+
+class _EntryWriter(io.BufferedIOBase):
+    """File object returned by ZipWriter.open(); compresses and checksums as it goes"""
+    
+    def __init__(self, archive, entry):
+        super().__init__()
+        self._archive = archive
+        self._entry = entry
+        self._crc = 0
+        self._file_size = 0
+        self._compress_size = 0
+        self._compressor = None
+        if entry.info.compress_type == zipfile.ZIP_DEFLATED:
+            self._compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -15)
+    
+    def writable(self):
+        return True
+    
+    def write(self, data):
+        if self.closed:
+            raise ValueError("I/O operation on closed file.")
+        data = bytes(data)
+        self._crc = zlib.crc32(data, self._crc)
+        self._file_size += len(data)
+        compressed = self._compressor.compress(data) if self._compressor is not None else data
+        self._compress_size += len(compressed)
+        self._archive._fp.write(compressed)
+        return len(data)
+    
+    def close(self):
+        if self.closed:
+            return
+        try:
+            if self._compressor is not None:
+                tail = self._compressor.flush()
+                self._compress_size += len(tail)
+                self._archive._fp.write(tail)
+            info = self._entry.info
+            info.CRC = self._crc
+            info.file_size = self._file_size
+            info.compress_size = self._compress_size
+            self._archive._finish_entry(self._entry)
+        finally:
+            super().close()
+
+
+class ZipWriter:
+    """Write-only ZIP archive with the zipfile.ZipFile('w') calls the engine uses
+    
+    filelist holds the ZipInfo of every entry written so far. open() and
+    writestr() support ZIP_STORED and ZIP_DEFLATED; copy_raw() takes any
+    method, since the data is not touched.
+    """
+    
+    def __init__(self, file, compression=zipfile.ZIP_DEFLATED):
+        self.filename = os.fspath(file)
+        self.compression = compression
+        self.filelist = []
+        self._entries = []
+        self._lock = threading.RLock()
+        self._writing = False
+        self._fp = open(self.filename, 'wb')
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+    
+    def open(self, name, mode='w'):
+        """Writable file object for a new entry (name or ZipInfo), like ZipFile.open(.., 'w')"""
+        if mode != 'w':
+            raise ValueError("ZipWriter only opens entries for writing")
+        info = self._new_info(name)
+        if info.compress_type not in (zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED):
+            raise NotImplementedError("That compression method is not supported")
+        with self._lock:
+            entry = self._start_entry(info, info.file_size * _ZIP64_MARGIN > ZIP64_LIMIT)
+            return _EntryWriter(self, entry)
+    
+    def writestr(self, name, data, compress_type=None):
+        """Write bytes (or str, as UTF-8) as a new entry"""
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        info = self._new_info(name)
+        if compress_type is not None:
+            info.compress_type = compress_type
+        info.file_size = len(data)
+        with self.open(info) as dst:
+            dst.write(data)
+    
+    def copy_raw(self, zip_info, source, chunk_size=1024 * 1024):
+        """Copy an entry of the archive at path source without recompressing it
+        
+        The compressed data and CRC are taken as they are; name, date,
+        method and attributes come from zip_info. Returns False, with
+        nothing written, when the entry is encrypted or its local header
+        cannot be found in source.
+        """
+        if zip_info.flag_bits & _ENCRYPTED_FLAG:
+            return False
+        try:
+            src = open(source, 'rb')
+        except (OSError, TypeError, ValueError):
+            return False
+        
+        with src:
+            src.seek(zip_info.header_offset)
+            header = src.read(_LOCAL_HEADER.size)
+            if len(header) != _LOCAL_HEADER.size or header[:4] != _LOCAL_SIGNATURE:
+                return False
+            name_len, extra_len = struct.unpack('<HH', header[26:30])
+            src.seek(name_len + extra_len, os.SEEK_CUR)
+            
+            info = self._new_info(zip_info)
+            info.CRC = zip_info.CRC
+            info.compress_size = zip_info.compress_size
+            info.file_size = zip_info.file_size
+            with self._lock:
+                entry = self._start_entry(info, max(info.file_size, info.compress_size) > ZIP64_LIMIT)
+                remaining = info.compress_size
+                while remaining > 0:
+                    chunk = src.read(min(chunk_size, remaining))
+                    if not chunk:
+                        raise zipfile.BadZipFile(f"Truncated entry: {zip_info.filename}")
+                    self._fp.write(chunk)
+                    remaining -= len(chunk)
+                self._finish_entry(entry)
+        return True
+    
+    def close(self):
+        """Write the central directory and close the file"""
+        with self._lock:
+            if self._fp is None:
+                return
+            if self._writing:
+                raise ValueError("Can't close the ZIP file while there is an open writing handle on it")
+            try:
+                self._write_central_directory()
+            finally:
+                self._fp.close()
+                self._fp = None
+    
+    def _new_info(self, name):
+        """Fresh ZipInfo for an entry; a given ZipInfo is copied, never modified"""
+        if isinstance(name, zipfile.ZipInfo):
+            info = zipfile.ZipInfo(name.filename, name.date_time)
+            info.compress_type = name.compress_type
+            info.create_system = name.create_system
+            info.external_attr = name.external_attr
+            info.internal_attr = name.internal_attr
+            info.file_size = name.file_size
+        else:
+            info = zipfile.ZipInfo(name, time.localtime(time.time())[:6])
+            info.compress_type = self.compression
+            info.external_attr = 0o600 << 16
+        info.CRC = 0
+        return info
+    
+    def _start_entry(self, info, zip64):
+        if self._fp is None:
+            raise ValueError("Attempt to write to ZIP archive that was already closed")
+        if self._writing:
+            raise ValueError("Can't write to the ZIP file while there is another write handle open on it")
+        entry = _Entry(info, self._fp.tell(), zip64)
+        self._fp.write(entry.local_header())
+        self._writing = True
+        return entry
+    
+    def _finish_entry(self, entry):
+        """Rewrite the local header with the final CRC and sizes"""
+        with self._lock:
+            self._writing = False
+            info = entry.info
+            if not entry.zip64 and max(info.file_size, info.compress_size) > ZIP64_LIMIT:
+                raise zipfile.LargeZipFile("File size unexpectedly exceeded ZIP64 limit")
+            end = self._fp.tell()
+            self._fp.seek(entry.header_offset)
+            self._fp.write(entry.local_header())
+            self._fp.seek(end)
+            info.header_offset = entry.header_offset
+            self._entries.append(entry)
+            self.filelist.append(info)
+    
+    def _write_central_directory(self):
+        start = self._fp.tell()
+        for entry in self._entries:
+            self._fp.write(entry.central_header())
+        end = self._fp.tell()
+        count, size = len(self._entries), end - start
+        
+        if count > ZIP_FILECOUNT_LIMIT or size > ZIP64_LIMIT or start > ZIP64_LIMIT:
+            self._fp.write(_END_RECORD64.pack(b'PK\x06\x06', _END_RECORD64.size - 12, _ZIP64_VERSION,
+                                              _ZIP64_VERSION, 0, 0, count, count, size, start))
+            self._fp.write(_END_LOCATOR64.pack(b'PK\x06\x07', 0, end, 1))
+            count, size, start = min(count, _MAX_16), min(size, _MAX_32), min(start, _MAX_32)
+        self._fp.write(_END_RECORD.pack(b'PK\x05\x06', 0, 0, count, count, size, start, 0))
@@ -0,0 +1,108 @@
+import io
+import random
+import zipfile
+
+import pytest
+
+CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Default Extension="jpeg" ContentType="image/jpeg"/>'
+    '<Override PartName="/word/document.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>'
+    '</Types>'
+)
+ROOT_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/'
+    'relationships/officeDocument" Target="word/document.xml"/>'
+    '</Relationships>'
+)
+DOCUMENT_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/'
+    'relationships/image" Target="media/image1.jpeg"/>'
+    '</Relationships>'
+)
+DOCUMENT = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">'
+    '<w:body>' + '<w:p><w:r><w:t>Quarterly figures</w:t></w:r></w:p>' * 200 + '</w:body></w:document>'
+)
+
+
+def _photo(width=1200, height=900):
+    from PIL import Image
+    rng = random.Random(7)
+    pixels = width * height
+    noise = Image.frombytes('L', (width, height), rng.getrandbits(pixels * 8).to_bytes(pixels, 'little'))
+    gradient = Image.linear_gradient('L').resize((width, height))
+    img = Image.merge('RGB', (gradient, noise, gradient.transpose(Image.FLIP_TOP_BOTTOM)))
+    buffer = io.BytesIO()
+    img.save(buffer, format='JPEG', quality=98)
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def make_docx(tmp_path):
+    """Write a small .docx with one oversized photo and return its path"""
+    def make(name="report.docx"):
+        path = tmp_path / name
+        with zipfile.ZipFile(path, 'w', compression=zipfile.ZIP_DEFLATED) as zf:
+            zf.writestr("[Content_Types].xml", CONTENT_TYPES)
+            zf.writestr("_rels/.rels", ROOT_RELS)
+            zf.writestr("word/document.xml", DOCUMENT)
+            zf.writestr("word/_rels/document.xml.rels", DOCUMENT_RELS)
+            zf.writestr("word/media/image1.jpeg", _photo())
+        return path
+    return make
+
+
+REL_TYPES = "http://schemas.openxmlformats.org/officeDocument/2006/relationships/"
+
+
+class PackageWriter:
+    """Writes OPC packages from {zip name: str or bytes}, with .rels and content type helpers"""
+    
+    def __init__(self, directory):
+        self.directory = directory
+    
+    def __call__(self, name, parts):
+        path = self.directory / name
+        with zipfile.ZipFile(path, 'w', compression=zipfile.ZIP_DEFLATED) as zf:
+            for part, data in parts.items():
+                zf.writestr(part, data)
+        return path
+    
+    @staticmethod
+    def rels(*relationships):
+        """(Id, type, target) or (Id, type, target, "External") tuples as a .rels part"""
+        items = []
+        for rel_id, rel_type, target, *mode in relationships:
+            external = f' TargetMode="{mode[0]}"' if mode else ''
+            items.append(f'<Relationship Id="{rel_id}" Type="{REL_TYPES}{rel_type}" Target="{target}"{external}/>')
+        return ('<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+                + "".join(items) + '</Relationships>')
+    
+    @staticmethod
+    def content_types(*overrides):
+        """[Content_Types].xml with the usual defaults and an Override per part name"""
+        defaults = "".join(f'<Default Extension="{ext}" ContentType="{ctype}"/>' for ext, ctype in (
+            ("rels", "application/vnd.openxmlformats-package.relationships+xml"), ("xml", "application/xml"),
+            ("png", "image/png"), ("jpeg", "image/jpeg"), ("mp4", "video/mp4")))
+        items = "".join(f'<Override PartName="/{name}" ContentType="application/vnd.test+xml"/>'
+                        for name in overrides)
+        return ('<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+                + defaults + items + '</Types>')
+
+
+@pytest.fixture
+def write_package(tmp_path):
+    """PackageWriter for tmp_path"""
+    return PackageWriter(tmp_path)
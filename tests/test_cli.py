@@ -0,0 +1,54 @@
+import json
+import zipfile
+
+import pytest
+
+from office_optimizer_cli import main
+from office_optimizer_core import OfficeCompressor
+
+
+def _run(capsys, *argv):
+    code = main(["--no-cache", "--no-index", "--no-backup", "--workers", "1", *map(str, argv)])
+    return code, [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+
+
+def test_output_is_renamed_into_place(tmp_path, make_docx, capsys):
+    source = make_docx()
+    out_dir = tmp_path / "out"
+    
+    code, records = _run(capsys, "-o", out_dir, source)
+    assert code == 0 and records[0]["status"] == "ok"
+    assert records[0]["output_size"] == (out_dir / source.name).stat().st_size
+    assert zipfile.ZipFile(out_dir / source.name).testzip() is None
+    assert sorted(path.name for path in out_dir.iterdir()) == [source.name]
+
+
+def test_failed_run_keeps_earlier_output(tmp_path, make_docx, capsys, monkeypatch):
+    source = make_docx()
+    out_dir = tmp_path / "out"
+    _run(capsys, "-o", out_dir, source)
+    earlier = (out_dir / source.name).read_bytes()
+    
+    def fail(*args, **kwargs):
+        raise OSError("disk full")
+    
+    # Fails after the engine has started writing its output
+    monkeypatch.setattr(OfficeCompressor, "_write_entry", fail)
+    code, records = _run(capsys, "-o", out_dir, source)
+    assert code == 1 and records[0]["status"] == "error"
+    assert (out_dir / source.name).read_bytes() == earlier
+    assert sorted(path.name for path in out_dir.iterdir()) == [source.name]
+
+
+@pytest.mark.parametrize("replace", [False, True], ids=["output", "replace"])
+def test_invalid_input_leaves_files_alone(tmp_path, capsys, replace):
+    source = tmp_path / "broken.docx"
+    source.write_bytes(b"not a zip archive")
+    existing = tmp_path / "broken_Optimized.docx"
+    existing.write_bytes(b"output of an earlier run")
+    
+    code, records = _run(capsys, *(["--replace"] if replace else []), source)
+    assert code == 1 and records[0]["status"] == "error"
+    assert source.read_bytes() == b"not a zip archive"
+    assert existing.read_bytes() == b"output of an earlier run"
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["broken.docx", "broken_Optimized.docx"]
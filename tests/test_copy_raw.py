@@ -0,0 +1,119 @@
+import zipfile
+
+import pytest
+
+import office_optimizer_zip
+from office_optimizer_core import OfficeCompressor
+from office_optimizer_zip import ZipWriter
+
+DATE = (2024, 5, 17, 9, 30, 12)
+
+
+def _source(path):
+    """Archive with stored, deflated and non-ASCII entries, as Office would write"""
+    with zipfile.ZipFile(path, 'w') as zf:
+        for name, data, method in (("[Content_Types].xml", b"<Types/>" * 400, zipfile.ZIP_DEFLATED),
+                                   ("ppt/media/image1.png", bytes(range(256)) * 8, zipfile.ZIP_STORED),
+                                   ("docProps/ünïcode.xml", "<a>ü</a>".encode() * 50, zipfile.ZIP_DEFLATED)):
+            info = zipfile.ZipInfo(name, DATE)
+            info.compress_type = method
+            info.external_attr = 0o644 << 16
+            zf.writestr(info, data)
+    return path
+
+
+def test_engine_copies_untouched_entries_raw(make_docx, tmp_path, monkeypatch):
+    copied = []
+    copy_raw = OfficeCompressor._copy_raw
+    
+    def spy(self, zip_info, in_zip, out_zip):
+        done = copy_raw(self, zip_info, in_zip, out_zip)
+        copied.append(done)
+        return done
+    monkeypatch.setattr(OfficeCompressor, "_copy_raw", spy)
+    
+    source = make_docx()
+    output = tmp_path / "out.docx"
+    with OfficeCompressor(enable_backup=False, workers=1) as engine:
+        assert engine.compress(str(source), str(output))
+    
+    assert copied and all(copied)
+    with zipfile.ZipFile(output) as out_zip, zipfile.ZipFile(source) as in_zip:
+        assert out_zip.testzip() is None
+        for name in ("word/document.xml", "_rels/.rels"):
+            assert out_zip.read(name) == in_zip.read(name)
+            assert out_zip.getinfo(name).compress_size == in_zip.getinfo(name).compress_size
+
+
+def test_writer_round_trips_raw_and_streamed_entries(tmp_path):
+    source = _source(tmp_path / "source.zip")
+    output = tmp_path / "out.zip"
+    with zipfile.ZipFile(source) as in_zip, ZipWriter(output) as out_zip:
+        for info in in_zip.infolist():
+            assert out_zip.copy_raw(info, in_zip.filename)
+        out_zip.writestr("text.xml", "<ü/>")
+        with out_zip.open("streamed.bin", 'w') as dst:
+            for _ in range(10):
+                dst.write(b"0123456789" * 1000)
+        assert [info.file_size for info in out_zip.filelist][-2:] == [len("<ü/>".encode()), 100000]
+    
+    with zipfile.ZipFile(source) as in_zip, zipfile.ZipFile(output) as out_zip:
+        assert out_zip.testzip() is None
+        assert out_zip.namelist() == in_zip.namelist() + ["text.xml", "streamed.bin"]
+        for original in in_zip.infolist():
+            copy = out_zip.getinfo(original.filename)
+            assert out_zip.read(copy) == in_zip.read(original)
+            assert (copy.CRC, copy.compress_size, copy.compress_type, copy.date_time, copy.external_attr) == \
+                (original.CRC, original.compress_size, original.compress_type, original.date_time,
+                 original.external_attr)
+        assert out_zip.read("text.xml").decode() == "<ü/>"
+        assert out_zip.getinfo("streamed.bin").compress_type == zipfile.ZIP_DEFLATED
+        assert out_zip.read("streamed.bin") == b"0123456789" * 10000
+
+
+def test_copy_raw_refuses_entries_it_cannot_locate(tmp_path):
+    source = _source(tmp_path / "source.zip")
+    other = tmp_path / "other.bin"
+    other.write_bytes(b"\0" * 4096)
+    output = tmp_path / "out.zip"
+    with zipfile.ZipFile(source) as in_zip, ZipWriter(output) as out_zip:
+        info = in_zip.infolist()[0]
+        assert not out_zip.copy_raw(info, str(other))
+        assert not out_zip.copy_raw(info, None)
+        encrypted = zipfile.ZipInfo(info.filename, DATE)
+        encrypted.flag_bits, encrypted.header_offset = 0x1, info.header_offset
+        assert not out_zip.copy_raw(encrypted, in_zip.filename)
+        assert out_zip.filelist == []
+    with zipfile.ZipFile(output) as out_zip:
+        assert out_zip.namelist() == []
+
+
+def test_zip64_records_are_written_past_the_limits(tmp_path, monkeypatch):
+    # Lowered limits exercise the same records a 4 GiB or 65536-entry package needs
+    monkeypatch.setattr(office_optimizer_zip, "ZIP64_LIMIT", 1000)
+    monkeypatch.setattr(office_optimizer_zip, "ZIP_FILECOUNT_LIMIT", 3)
+    source = _source(tmp_path / "source.zip")
+    output = tmp_path / "out.zip"
+    with zipfile.ZipFile(source) as in_zip, ZipWriter(output) as out_zip:
+        for info in in_zip.infolist():
+            assert out_zip.copy_raw(info, in_zip.filename)
+        out_zip.writestr("big.bin", bytes(range(256)) * 20, compress_type=zipfile.ZIP_STORED)
+    
+    data = output.read_bytes()
+    assert b"PK\x06\x06" in data and b"PK\x06\x07" in data
+    with zipfile.ZipFile(source) as in_zip, zipfile.ZipFile(output) as out_zip:
+        assert out_zip.testzip() is None
+        assert out_zip.read("big.bin") == bytes(range(256)) * 20
+        for name in in_zip.namelist():
+            assert out_zip.read(name) == in_zip.read(name)
+
+
+def test_unannounced_zip64_entry_is_refused(tmp_path, monkeypatch):
+    monkeypatch.setattr(office_optimizer_zip, "ZIP64_LIMIT", 1000)
+    with ZipWriter(tmp_path / "out.zip") as out_zip:
+        dst = out_zip.open(zipfile.ZipInfo("grown.bin", DATE), 'w')
+        dst.write(b"x" * 2000)
+        with pytest.raises(zipfile.LargeZipFile):
+            dst.close()
+        with pytest.raises(ValueError):
+            out_zip.open("read.bin", 'r')
@@ -0,0 +1,76 @@
+import io
+import os
+
+import pytest
+
+import office_optimizer_encoders as encoders
+
+
+@pytest.fixture(autouse=True)
+def fresh_selection(monkeypatch):
+    monkeypatch.setattr(encoders, "_selected", {})
+
+
+@pytest.fixture
+def failing_tools(tmp_path, monkeypatch):
+    """cjpeg, oxipng and pngquant on PATH that always fail"""
+    if os.name == "nt":
+        pytest.skip("shell scripts stand in for the encoders")
+    for name in ("cjpeg", "oxipng", "pngquant"):
+        script = tmp_path / name
+        script.write_text("#!/bin/sh\ncat > /dev/null\nexit 1\n")
+        script.chmod(0o755)
+    monkeypatch.setenv("PATH", str(tmp_path))
+
+
+def _image(mode="RGB"):
+    from PIL import Image
+    return Image.linear_gradient('L').resize((64, 48)).convert(mode)
+
+
+def test_backends_must_implement_encode():
+    with pytest.raises(TypeError):
+        encoders.EncoderBackend()
+
+
+def test_select_keeps_the_fastest_backend_within_the_size_tolerance(monkeypatch):
+    results = {"pillow": (1.0, 1000), "simplejpeg": (0.2, 1200), "cjpeg": (0.5, 1040)}
+    monkeypatch.setattr(encoders, "benchmark", lambda save_format, quality: results)
+    # simplejpeg is fastest but 20% larger than Pillow; cjpeg is within 5%
+    assert encoders.select("JPEG", 80) == "cjpeg"
+    
+    # Measured once per format and quality
+    monkeypatch.setattr(encoders, "benchmark", lambda save_format, quality: pytest.fail("measured twice"))
+    assert encoders.select("JPEG", 80) == "cjpeg"
+
+
+def test_select_falls_back_to_pillow_without_results(monkeypatch):
+    monkeypatch.setattr(encoders, "benchmark", lambda save_format, quality: {})
+    assert encoders.select("PNG", 80) == "pillow"
+
+
+def test_resolve_replaces_missing_backends_with_pillow(monkeypatch):
+    monkeypatch.setattr(encoders.shutil, "which", lambda name: None)
+    assert encoders.resolve({"JPEG": "cjpeg", "PNG": "oxipng"}, 80) == {"JPEG": "pillow", "PNG": "pillow"}
+    assert encoders.resolve({"JPEG": "pngquant", "PNG": "nonexistent"}, 80) == {"JPEG": "pillow", "PNG": "pillow"}
+    # "auto" only weighs what is installed
+    assert encoders.resolve({"PNG": "auto"}, 80) == {"PNG": "pillow"}
+
+
+@pytest.mark.parametrize("name, save_format, mode", [
+    ("cjpeg", "JPEG", "RGB"), ("oxipng", "PNG", "RGB"), ("pngquant", "PNG", "RGBA")])
+def test_failing_external_encoder_falls_back_to_pillow(failing_tools, name, save_format, mode):
+    from PIL import Image
+    backend = encoders.get_backend(name)
+    assert backend.available()
+    img = _image(mode)
+    data = backend.encode(img, save_format, 80)
+    assert data == encoders.PILLOW.encode(img, save_format, 80)
+    with Image.open(io.BytesIO(data)) as decoded:
+        assert decoded.format == save_format
+
+
+def test_benchmark_leaves_out_failing_backends(failing_tools):
+    results = encoders.benchmark("JPEG", 80, candidates=["pillow", "cjpeg"], repeat=1)
+    assert list(results) == ["pillow"]
+    assert encoders.resolve({"JPEG": "auto"}, 80)["JPEG"] != "cjpeg"
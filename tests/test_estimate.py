@@ -0,0 +1,99 @@
+import os
+import struct
+import zipfile
+
+import pytest
+
+import office_optimizer_estimate as estimate
+
+MDAT_BYTES = 24 * 1024 * 1024
+
+
+def _box(kind, body):
+    return struct.pack('>I4s', 8 + len(body), kind) + body
+
+
+def _mp4(moov_last=True):
+    """An MP4 whose index sits after (or before) a large media data box"""
+    ftyp = _box(b'ftyp', b'isom' * 4)
+    moov = _box(b'moov', b'\x01' * 2000)
+    mdat = _box(b'mdat', bytes(MDAT_BYTES))
+    return ftyp + mdat + moov if moov_last else ftyp + moov + mdat
+
+
+@pytest.fixture
+def count_reads(monkeypatch):
+    """Bytes handed out by ZipExtFile (seek() reads through it as well)"""
+    counted = {"bytes": 0}
+    read = zipfile.ZipExtFile.read
+    
+    def counting(self, n=-1):
+        data = read(self, n)
+        counted["bytes"] += len(data)
+        return data
+    monkeypatch.setattr(zipfile.ZipExtFile, "read", counting)
+    return counted
+
+
+@pytest.mark.parametrize("compression", [zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED], ids=["stored", "deflated"])
+def test_media_head_reads_a_bounded_prefix(tmp_path, count_reads, compression):
+    path = tmp_path / "deck.pptx"
+    with zipfile.ZipFile(path, 'w', compression=compression) as zf:
+        zf.writestr("ppt/media/media1.mp4", _mp4())
+    
+    with zipfile.ZipFile(path) as in_zip:
+        head, complete = estimate._media_head(in_zip.getinfo("ppt/media/media1.mp4"), in_zip)
+    
+    assert count_reads["bytes"] <= estimate.MEDIA_PROBE_BYTES
+    assert len(head) <= estimate.MEDIA_PROBE_BYTES
+    if compression == zipfile.ZIP_STORED:
+        # Read from the file with a seek over mdat: the trailing index is found
+        assert complete and b'moov' in head and b'mdat' not in head
+    else:
+        assert not complete and head.startswith(b'\x00\x00\x00\x18ftyp')
+
+
+def test_media_head_of_a_faststart_deflated_part_holds_the_index(tmp_path, count_reads):
+    path = tmp_path / "deck.pptx"
+    with zipfile.ZipFile(path, 'w', compression=zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("ppt/media/media1.mp4", _mp4(moov_last=False))
+    
+    with zipfile.ZipFile(path) as in_zip:
+        head, complete = estimate._media_head(in_zip.getinfo("ppt/media/media1.mp4"), in_zip)
+    
+    assert count_reads["bytes"] <= estimate.MEDIA_PROBE_BYTES
+    assert not complete and b'moov' in head
+
+
+@pytest.fixture(scope="module")
+def corpus(tmp_path_factory):
+    from benchmarks.corpus import build_corpus
+    return build_corpus(str(tmp_path_factory.mktemp("corpus")))
+
+
+def test_estimates_follow_a_real_run_on_the_benchmark_corpus(corpus, tmp_path):
+    from office_optimizer_core import OfficeCompressor
+    
+    with OfficeCompressor(enable_backup=False, workers=1) as engine:
+        estimator = estimate.SavingsEstimator(engine)
+        records = {}
+        for name, path in corpus.items():
+            before = os.stat(path)
+            records[name] = estimator.estimate(path)
+            # A dry run leaves the input alone and writes nothing next to it
+            assert os.stat(path).st_mtime_ns == before.st_mtime_ns
+        assert sorted(os.listdir(os.path.dirname(path))) == sorted(os.path.basename(p) for p in corpus.values())
+        
+        actual = {}
+        for name, path in corpus.items():
+            output = tmp_path / os.path.basename(path)
+            assert engine.compress(path, str(output))
+            actual[name] = os.path.getsize(output)
+    
+    for name, record in records.items():
+        assert record["status"] == "ok", record["message"]
+        # Unmodelled gains (e.g. palette PNGs) make estimates err on the high side
+        assert 0.8 * actual[name] <= record["predicted_size"] <= 1.5 * actual[name], name
+    predicted = sum(record["predicted_size"] for record in records.values())
+    assert abs(predicted - sum(actual.values())) <= 0.15 * sum(actual.values())
+    assert estimator.totals()["sampled_parts"] <= len(corpus) * estimator.samples_per_file
@@ -0,0 +1,103 @@
+import json
+import os
+
+import pytest
+
+from office_optimizer_cli import main
+from office_optimizer_core import OfficeCompressor
+from office_optimizer_index import OptimizationIndex
+
+
+def _run(capsys, *argv):
+    code = main(["--no-cache", "--no-backup", "--workers", "1", *map(str, argv)])
+    return code, [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+
+
+def test_replaced_file_is_written_to_a_new_output_dir(tmp_path, make_docx, capsys):
+    source = make_docx()
+    index = tmp_path / "index.db"
+    
+    code, records = _run(capsys, "--index", index, "--replace", source)
+    assert code == 0 and records[0]["status"] == "ok"
+    
+    # Same settings, unchanged file: replacing again is skipped
+    code, records = _run(capsys, "--index", index, "--replace", source)
+    assert records[0]["status"] == "skipped"
+    
+    # ...but a copy that was never written is not current
+    out_dir = tmp_path / "out"
+    code, records = _run(capsys, "--index", index, "-o", out_dir, source)
+    assert code == 0 and records[0]["status"] == "ok"
+    assert (out_dir / source.name).exists()
+
+
+def test_dry_run_does_not_skip_missing_output(tmp_path, make_docx, capsys):
+    source = make_docx()
+    index = tmp_path / "index.db"
+    _run(capsys, "--index", index, "--replace", source)
+    
+    code = main(["--index", str(index), "-o", str(tmp_path / "out"), "--dry-run", str(source)])
+    report = json.loads(capsys.readouterr().out)
+    assert code == 0
+    assert report["files"][0]["status"] == "ok"
+
+
+# One changed engine option per case, against the defaults used for the baseline
+SETTING_CHANGES = {
+    "quality": {"quality": 50},
+    "max_width": {"max_width": 1280},
+    "png_smart_convert": {"png_smart_convert": True},
+    "target_dpi": {"target_dpi": 150},
+    "compress_video": {"compress_video": True, "trim_media": False},
+    "trim_media": {"compress_video": True},
+    "collapse_duplicates": {"collapse_duplicates": True},
+    "prune_orphans": {"prune_orphans": False},
+    "prune_layouts": {"prune_layouts": False},
+    "encoders": {"encoders": {"JPEG": "cjpeg"}},
+}
+
+
+def _settings(**options):
+    engine = OfficeCompressor(enable_backup=False, workers=1, **options)
+    try:
+        return engine.output_settings()
+    finally:
+        engine.close()
+
+
+@pytest.fixture
+def recorded(tmp_path, make_docx, monkeypatch):
+    # An installed cjpeg, so the encoders option is not resolved back to Pillow
+    tools = tmp_path / "bin"
+    tools.mkdir()
+    (tools / "cjpeg").write_text("#!/bin/sh\nexit 1\n")
+    (tools / "cjpeg").chmod(0o755)
+    monkeypatch.setenv("PATH", f"{tools}{os.pathsep}{os.environ.get('PATH', '')}")
+    
+    source = make_docx()
+    index = OptimizationIndex(str(tmp_path / "index.db"))
+    index.record(str(source), _settings(), "balanced", output_path=str(source))
+    yield index, str(source)
+    index.close()
+
+
+@pytest.mark.parametrize("option", sorted(SETTING_CHANGES))
+def test_changing_an_engine_option_invalidates_the_index(recorded, option):
+    index, source = recorded
+    assert index.is_current(source, _settings(), source)
+    assert not index.is_current(source, _settings(**SETTING_CHANGES[option]), source)
+
+
+def test_every_output_setting_invalidates_the_index(recorded):
+    index, source = recorded
+    baseline = _settings()
+    changed_by_options = {key for options in SETTING_CHANGES.values()
+                          for key, value in _settings(**options).items() if baseline.get(key) != value}
+    # Versions are bumped in code rather than chosen by the user
+    assert changed_by_options | {"version", "pipeline"} >= set(baseline)
+    
+    for key, value in baseline.items():
+        changed = dict(baseline)
+        changed[key] = "changed" if value is None or isinstance(value, bool) else value * 2
+        assert not index.is_current(source, changed, source), key
+    assert index.is_current(source, dict(baseline), source)
@@ -0,0 +1,176 @@
+import io
+import re
+import zipfile
+
+import office_optimizer_opc as opc
+from office_optimizer_core import OfficeCompressor
+
+P = "http://schemas.openxmlformats.org/presentationml/2006/main"
+R = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+XML = '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+
+
+def _png(seed):
+    from PIL import Image
+    buffer = io.BytesIO()
+    Image.new('RGB', (8, 8), (seed * 40 % 256, 80, 160)).save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+def _deck(write_package, masters, slides, notes_layouts=(), handout_layouts=(), extra=None):
+    """A presentation: masters maps master numbers to their layout numbers,
+    slides lists the layout of each slide. Every layout has a background
+    picture only it uses; extra parts are added or replace generated ones."""
+    rels = write_package.rels
+    overrides = ["ppt/presentation.xml"]
+    parts = {"_rels/.rels": rels(("rId1", "officeDocument", "ppt/presentation.xml"))}
+    presentation_rels = []
+    master_ids = []
+    
+    for number, layouts in masters.items():
+        master = f"ppt/slideMasters/slideMaster{number}.xml"
+        rel_id = f"rIdM{number}"
+        presentation_rels.append((rel_id, "slideMaster", f"slideMasters/slideMaster{number}.xml"))
+        master_ids.append(f'<p:sldMasterId id="{2147483648 + number * 100}" r:id="{rel_id}"/>')
+        layout_ids = "".join(f'<p:sldLayoutId id="{2147483648 + number * 100 + layout}" r:id="rIdL{layout}"/>'
+                             for layout in layouts)
+        parts[master] = (XML + f'<p:sldMaster xmlns:p="{P}" xmlns:r="{R}"><p:cSld/>'
+                         f'<p:sldLayoutIdLst>{layout_ids}</p:sldLayoutIdLst></p:sldMaster>')
+        parts[f"ppt/slideMasters/_rels/slideMaster{number}.xml.rels"] = rels(
+            *[(f"rIdL{layout}", "slideLayout", f"../slideLayouts/slideLayout{layout}.xml") for layout in layouts])
+        overrides.append(master)
+        for layout in layouts:
+            name = f"ppt/slideLayouts/slideLayout{layout}.xml"
+            parts[name] = XML + f'<p:sldLayout xmlns:p="{P}"/>'
+            parts[f"ppt/slideLayouts/_rels/slideLayout{layout}.xml.rels"] = rels(
+                ("rId1", "slideMaster", f"../slideMasters/slideMaster{number}.xml"),
+                ("rId2", "image", f"../media/layout{layout}.png"))
+            parts[f"ppt/media/layout{layout}.png"] = _png(layout)
+            overrides.append(name)
+    
+    slide_ids = []
+    for number, layout in enumerate(slides, 1):
+        name = f"ppt/slides/slide{number}.xml"
+        presentation_rels.append((f"rIdS{number}", "slide", f"slides/slide{number}.xml"))
+        slide_ids.append(f'<p:sldId id="{255 + number}" r:id="rIdS{number}"/>')
+        parts[name] = XML + f'<p:sld xmlns:p="{P}"/>'
+        parts[f"ppt/slides/_rels/slide{number}.xml.rels"] = rels(
+            ("rId1", "slideLayout", f"../slideLayouts/slideLayout{layout}.xml"))
+        overrides.append(name)
+    
+    for kind, layouts in (("notesMaster", notes_layouts), ("handoutMaster", handout_layouts)):
+        if not layouts:
+            continue
+        name = f"ppt/{kind}s/{kind}1.xml"
+        presentation_rels.append((f"rId{kind}", kind, f"{kind}s/{kind}1.xml"))
+        parts[name] = XML + f'<p:{kind} xmlns:p="{P}"/>'
+        parts[f"ppt/{kind}s/_rels/{kind}1.xml.rels"] = rels(
+            *[(f"rId{layout}", "slideLayout", f"../slideLayouts/slideLayout{layout}.xml") for layout in layouts])
+        overrides.append(name)
+    
+    parts["ppt/presentation.xml"] = (XML + f'<p:presentation xmlns:p="{P}" xmlns:r="{R}">'
+                                     f'<p:sldMasterIdLst>{"".join(master_ids)}</p:sldMasterIdLst>'
+                                     f'<p:sldIdLst>{"".join(slide_ids)}</p:sldIdLst></p:presentation>')
+    parts["ppt/_rels/presentation.xml.rels"] = rels(*presentation_rels)
+    parts["[Content_Types].xml"] = write_package.content_types(*overrides)
+    parts.update(extra or {})
+    return write_package("deck.pptx", parts)
+
+
+def _compress(source, tmp_path, **options):
+    output = tmp_path / "out.pptx"
+    with OfficeCompressor(enable_backup=False, workers=1, **options) as engine:
+        assert engine.compress(str(source), str(output))
+    return zipfile.ZipFile(output)
+
+
+def _removed(source, out_zip):
+    with zipfile.ZipFile(source) as in_zip:
+        return set(in_zip.namelist()) - set(out_zip.namelist())
+
+
+def _layout_parts(*layouts):
+    names = set()
+    for layout in layouts:
+        names |= {f"ppt/slideLayouts/slideLayout{layout}.xml", f"ppt/slideLayouts/_rels/slideLayout{layout}.xml.rels",
+                  f"ppt/media/layout{layout}.png"}
+    return names
+
+
+def _id_list(text, element):
+    return set(re.findall(r'<p:%s [^>]*r:id="([^"]+)"' % element, text))
+
+
+def _assert_id_lists_match_rels(out_zip):
+    """sldMasterId / sldLayoutId lists and the relationships agree, and no master is left empty"""
+    names = out_zip.namelist()
+    
+    def rel_ids(part, rel_type):
+        rels = opc.parse_rels(out_zip.read(opc.rels_path_for(part)))
+        return {rel["Id"] for rel in rels if opc.relationship_type(rel) == rel_type}
+    
+    presentation = out_zip.read("ppt/presentation.xml").decode("utf-8")
+    assert _id_list(presentation, "sldMasterId") == rel_ids("ppt/presentation.xml", "slideMaster")
+    for name in names:
+        if name.startswith("ppt/slideMasters/slideMaster"):
+            layouts = _id_list(out_zip.read(name).decode("utf-8"), "sldLayoutId")
+            assert layouts and layouts == rel_ids(name, "slideLayout"), name
+    assert opc.unreachable_parts(names, out_zip.read) == []
+
+
+def test_unused_layout_is_removed_with_its_media(write_package, tmp_path):
+    source = _deck(write_package, {1: [1, 2, 3]}, slides=[1, 3])
+    with _compress(source, tmp_path) as out_zip:
+        assert _removed(source, out_zip) == _layout_parts(2)
+        master = out_zip.read("ppt/slideMasters/slideMaster1.xml").decode("utf-8")
+        assert 'r:id="rIdL2"' not in master and 'r:id="rIdL1"' in master and 'r:id="rIdL3"' in master
+        master_rels = {rel["Id"] for rel in opc.parse_rels(out_zip.read("ppt/slideMasters/_rels/slideMaster1.xml.rels"))}
+        assert master_rels == {"rIdL1", "rIdL3"}
+        content_types = out_zip.read(opc.CONTENT_TYPES).decode("utf-8")
+        assert "/ppt/slideLayouts/slideLayout2.xml" not in content_types
+        assert "/ppt/slideLayouts/slideLayout1.xml" in content_types
+        _assert_id_lists_match_rels(out_zip)
+
+
+def test_master_without_used_layouts_is_removed_whole(write_package, tmp_path):
+    source = _deck(write_package, {1: [1, 2], 2: [3, 4]}, slides=[1])
+    with _compress(source, tmp_path) as out_zip:
+        assert _removed(source, out_zip) == _layout_parts(2, 3, 4) | {
+            "ppt/slideMasters/slideMaster2.xml", "ppt/slideMasters/_rels/slideMaster2.xml.rels"}
+        presentation = out_zip.read("ppt/presentation.xml").decode("utf-8")
+        assert 'r:id="rIdM2"' not in presentation and 'r:id="rIdM1"' in presentation
+        assert "/ppt/slideMasters/slideMaster2.xml" not in out_zip.read(opc.CONTENT_TYPES).decode("utf-8")
+        _assert_id_lists_match_rels(out_zip)
+
+
+def test_layouts_used_by_notes_or_handout_masters_are_kept(write_package, tmp_path):
+    source = _deck(write_package, {1: [1, 2], 2: [3]}, slides=[1], notes_layouts=[2], handout_layouts=[3])
+    with _compress(source, tmp_path) as out_zip:
+        assert _removed(source, out_zip) == set()
+        with zipfile.ZipFile(source) as in_zip:
+            for name in ("ppt/presentation.xml", "ppt/slideMasters/slideMaster1.xml",
+                         "ppt/slideMasters/slideMaster2.xml"):
+                assert out_zip.read(name) == in_zip.read(name)
+        _assert_id_lists_match_rels(out_zip)
+
+
+def test_last_layouts_of_the_only_master_are_kept(write_package, tmp_path):
+    # The slide uses a layout missing from the master's list, so none of the
+    # listed ones looks used; unlinking them would leave no master at all
+    rels = write_package.rels
+    source = _deck(write_package, {1: [1]}, slides=[1], extra={
+        "ppt/slides/_rels/slide1.xml.rels": rels(("rId1", "slideLayout", "../slideLayouts/slideLayout9.xml")),
+        "ppt/slideLayouts/slideLayout9.xml": XML + f'<p:sldLayout xmlns:p="{P}"/>',
+    })
+    with zipfile.ZipFile(source) as in_zip:
+        assert opc.unused_layout_edits(in_zip.namelist(), in_zip.read) == {}
+    with _compress(source, tmp_path) as out_zip:
+        assert _removed(source, out_zip) == set()
+        _assert_id_lists_match_rels(out_zip)
+
+
+def test_layouts_are_kept_when_pruning_is_off(write_package, tmp_path):
+    source = _deck(write_package, {1: [1, 2], 2: [3]}, slides=[1])
+    with _compress(source, tmp_path, prune_layouts=False) as out_zip:
+        assert _removed(source, out_zip) == set()
+
@@ -0,0 +1,48 @@
+import hashlib
+import io
+import zipfile
+
+from office_optimizer_core import MEDIA_PIPELINE_VERSION, OfficeCompressor
+
+
+class _MemoryCache:
+    def __init__(self):
+        self.entries = {}
+    
+    def get(self, key):
+        return self.entries.get(key)
+    
+    def put(self, key, data):
+        self.entries[key] = data
+
+
+def _package(parts):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as zf:
+        for name, data in parts.items():
+            zf.writestr(name, data)
+    return zipfile.ZipFile(buffer)
+
+
+def test_probe_cache_is_keyed_by_content_and_version():
+    engine = OfficeCompressor(enable_backup=False, workers=1)
+    engine.cache = _MemoryCache()
+    engine.ffprobe_path = "ffprobe"
+    probed = []
+    
+    def fake_probe(zip_info, in_zip, make_command, temp_dir, timeout):
+        probed.append(zip_info.filename)
+        return (io.BytesIO(('{"format": {"filename": "%s"}}' % zip_info.filename).encode()),)
+    engine._run_media_command = fake_probe
+    
+    clips = {"ppt/media/a.mp4": b"a" * 4096, "ppt/media/b.mp4": b"b" * 4096}
+    in_zip = _package(clips)
+    first, second = in_zip.infolist()
+    
+    assert engine._probe_media(first, in_zip, None)["format"]["filename"] == "ppt/media/a.mp4"
+    assert engine._probe_media(second, in_zip, None)["format"]["filename"] == "ppt/media/b.mp4"
+    assert engine._probe_media(first, in_zip, None)["format"]["filename"] == "ppt/media/a.mp4"
+    assert probed == ["ppt/media/a.mp4", "ppt/media/b.mp4"]
+    # Persistent entries carry the content hash (not CRC-32 and size) and the pipeline version
+    assert sorted(engine.cache.entries) == sorted(
+        f"probe-v{MEDIA_PIPELINE_VERSION}-{hashlib.sha256(data).hexdigest()}" for data in clips.values())
@@ -0,0 +1,164 @@
+import io
+import json
+import re
+import zipfile
+
+import pytest
+
+import office_optimizer_opc as opc
+from office_optimizer_core import CONFIG, OfficeCompressor
+
+P = "http://schemas.openxmlformats.org/presentationml/2006/main"
+R = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+P14 = "http://schemas.microsoft.com/office/powerpoint/2010/main"
+XML = '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+
+
+def _media(rel_id, trim=None, bookmarks=()):
+    """p14:media element as PowerPoint writes it in a slide's p:extLst"""
+    body = f'<p14:trim {trim}/>' if trim else ''
+    if bookmarks:
+        body += '<p14:bmkLst>' + ''.join(f'<p14:bmk name="b{i}" time="{time}"/>'
+                                         for i, time in enumerate(bookmarks)) + '</p14:bmkLst>'
+    if not body:
+        return f'<p14:media xmlns:p14="{P14}" r:embed="{rel_id}"/>'
+    return f'<p14:media xmlns:p14="{P14}" r:embed="{rel_id}">{body}</p14:media>'
+
+
+def _slide(*media):
+    return (XML + f'<p:sld xmlns:p="{P}" xmlns:r="{R}"><p:cSld><p:spTree><p:pic><p:nvPicPr><p:nvPr>'
+            f'<p:extLst><p:ext uri="{{DAA4B4D4-6D4C-4C8E-B12C-F6B3B12C3C11}}">{"".join(media)}</p:ext></p:extLst>'
+            '</p:nvPr></p:nvPicPr></p:pic></p:spTree></p:cSld></p:sld>')
+
+
+def _deck(write_package, slides, media):
+    """slides: list of (media element XML, {rel id: media name}); media: {name: bytes}"""
+    rels = write_package.rels
+    parts = {
+        "[Content_Types].xml": write_package.content_types(
+            "ppt/presentation.xml", *[f"ppt/slides/slide{n}.xml" for n in range(1, len(slides) + 1)]),
+        "_rels/.rels": rels(("rId1", "officeDocument", "ppt/presentation.xml")),
+        "ppt/presentation.xml": XML + f'<p:presentation xmlns:p="{P}"/>',
+        "ppt/_rels/presentation.xml.rels": rels(
+            *[(f"rId{n}", "slide", f"slides/slide{n}.xml") for n in range(1, len(slides) + 1)]),
+    }
+    for number, (xml, targets) in enumerate(slides, 1):
+        parts[f"ppt/slides/slide{number}.xml"] = xml
+        parts[f"ppt/slides/_rels/slide{number}.xml.rels"] = rels(
+            *[(rel_id, "media", f"../media/{name}") for rel_id, name in targets.items()])
+    parts.update({f"ppt/media/{name}": data for name, data in media.items()})
+    return write_package("deck.pptx", parts)
+
+
+def test_media_trims_are_parsed_per_embed():
+    trims = opc.media_trims(_slide(
+        _media("rId2", 'st="1500" end="2000.5"', bookmarks=(3000, 4250.5)),
+        _media("rId3", 'end="500"'),
+        _media("rId4"),
+        _media("rId5", 'st="-10" end="abc"')))
+    assert trims == {
+        "rId2": {"start": 1500.0, "end": 2000.5, "bookmarks": [3000.0, 4250.5]},
+        "rId3": {"start": 0.0, "end": 500.0, "bookmarks": []},
+        "rId4": {"start": 0.0, "end": 0.0, "bookmarks": []},
+        "rId5": {"start": 0.0, "end": 0.0, "bookmarks": []},
+    }
+
+
+def test_trim_ranges_merge_uses_and_skip_unbounded_media(write_package):
+    path = _deck(write_package, [
+        (_slide(_media("rId2", 'st="10000" end="20000"', bookmarks=(12000,))), {"rId2": "shared.mp4"}),
+        (_slide(_media("rId2", 'st="4000" end="25000"')), {"rId2": "shared.mp4"}),
+        # A slide links its media twice (videoFile/audioFile and p14:media)
+        (_slide(_media("rId2", 'st="4000"')), {"rId2": "partly.mp3", "rId3": "partly.mp3"}),
+        # Used elsewhere without p14:media: the whole clip plays there
+        (_slide(), {"rId2": "partly.mp3"}),
+        (_slide(_media("rId2")), {"rId2": "untrimmed.mp4"}),
+    ], {"shared.mp4": b"a", "partly.mp3": b"b", "untrimmed.mp4": b"c"})
+    with zipfile.ZipFile(path) as in_zip:
+        trims, sources = opc.media_trim_ranges(in_zip.namelist(), in_zip.read,
+                                               lambda name: name.endswith((".mp4", ".mp3")))
+    assert trims == {"ppt/media/shared.mp4": {"start": 4000.0, "end": 20000.0, "bookmarks": [12000.0]}}
+    assert sources == {"ppt/media/shared.mp4": {"ppt/slides/slide1.xml", "ppt/slides/slide2.xml"}}
+
+
+@pytest.mark.parametrize("collapse", [True, False], ids=["collapsed", "separate"])
+def test_trims_of_collapsed_duplicates_cover_every_use(write_package, collapse):
+    path = _deck(write_package, [
+        (_slide(_media("rId2", 'st="10000" end="20000"', bookmarks=(15000,))), {"rId2": "media1.mp4"}),
+        (_slide(_media("rId2", 'st="5000" end="30000"', bookmarks=(6000,))), {"rId2": "media2.mp4"}),
+    ], {"media1.mp4": b"same clip", "media2.mp4": b"same clip"})
+    engine = OfficeCompressor(enable_backup=False, workers=1, collapse_duplicates=collapse)
+    with zipfile.ZipFile(path) as in_zip:
+        file_list = in_zip.infolist()
+        duplicates = engine._find_duplicate_media(in_zip, file_list)
+        trims, sources = engine._find_media_trims(in_zip, file_list, duplicates)
+    engine.close()
+    
+    assert duplicates == {"ppt/media/media2.mp4": "ppt/media/media1.mp4"}
+    if collapse:
+        # The kept copy plays for both slides: earliest start, smallest tail cut
+        assert trims == {"ppt/media/media1.mp4": {"start": 5000.0, "end": 20000.0, "bookmarks": [15000.0, 6000.0]}}
+        assert sources == {"ppt/slides/slide1.xml", "ppt/slides/slide2.xml"}
+    else:
+        assert set(trims) == {"ppt/media/media1.mp4", "ppt/media/media2.mp4"}
+        assert trims["ppt/media/media2.mp4"]["start"] == 5000.0
+
+
+def test_untrimmed_duplicate_keeps_the_merged_part_whole(write_package):
+    path = _deck(write_package, [
+        (_slide(_media("rId2", 'st="10000" end="20000"')), {"rId2": "media1.mp4"}),
+        (_slide(_media("rId2")), {"rId2": "media2.mp4"}),
+    ], {"media1.mp4": b"same clip", "media2.mp4": b"same clip"})
+    engine = OfficeCompressor(enable_backup=False, workers=1, collapse_duplicates=True)
+    with zipfile.ZipFile(path) as in_zip:
+        file_list = in_zip.infolist()
+        trims, sources = engine._find_media_trims(in_zip, file_list, engine._find_duplicate_media(in_zip, file_list))
+    engine.close()
+    assert trims == {} and not sources
+
+
+def test_retime_media_shifts_trims_and_bookmarks():
+    data = _slide(_media("rId2", 'st="10000" end="20000"', bookmarks=(12000, 15500.5)),
+                  _media("rId3", 'st="1000"')).encode("utf-8")
+    retimed = opc.retime_media(data, {"rId2": (9000.0, 19000.0)}).decode("utf-8")
+    
+    assert '<p14:trim st="1000" end="1000"/>' in retimed
+    assert 'time="3000"' in retimed and 'time="6500.5"' in retimed
+    # Other media and the rest of the slide are untouched
+    assert '<p14:trim st="1000"/>' in retimed
+    assert re.sub(r'<p14:media .*?</p14:media>', '', retimed, flags=re.S) == \
+        re.sub(r'<p14:media .*?</p14:media>', '', data.decode("utf-8"), flags=re.S)
+    assert opc.retime_media(data, {"rId9": (1.0, 1.0)}) is None
+
+
+def test_trimmed_media_is_cut_and_the_slide_retimed(write_package, tmp_path):
+    clip = b"\x00" * 200000
+    path = _deck(write_package, [
+        (_slide(_media("rId2", 'st="10000" end="20000"', bookmarks=(15000,))), {"rId2": "media1.mp3"}),
+    ], {"media1.mp3": clip})
+    output = tmp_path / "out.pptx"
+    commands = []
+    
+    def fake_media_command(zip_info, in_zip, make_command, temp_dir, timeout, output_path=None):
+        command = make_command("pipe:0")
+        commands.append(command)
+        if command[0] == "ffprobe":
+            return io.BytesIO(json.dumps({"format": {"duration": "60.0"}}).encode()), 0
+        return io.BytesIO(b"cut audio"), len(b"cut audio")
+    
+    engine = OfficeCompressor(enable_backup=False, workers=1, compress_video=True)
+    engine.ffmpeg_path, engine.ffprobe_path = "ffmpeg", "ffprobe"
+    engine._run_media_command = fake_media_command
+    with engine:
+        assert engine.compress(str(path), str(output))
+    
+    margin = CONFIG["media_trim_margin"] * 1000
+    start, tail = 10000 - margin, 20000 - margin
+    ffmpeg = next(command for command in commands if command[0] == "ffmpeg")
+    assert ffmpeg[ffmpeg.index("-ss") + 1] == f"{start / 1000:.3f}"
+    assert ffmpeg[ffmpeg.index("-t") + 1] == f"{(60000 - start - tail) / 1000:.3f}"
+    
+    with zipfile.ZipFile(output) as out_zip:
+        assert out_zip.read("ppt/media/media1.mp3") == b"cut audio"
+        slide = out_zip.read("ppt/slides/slide1.xml").decode("utf-8")
+    assert opc.media_trims(slide) == {"rId2": {"start": margin, "end": margin, "bookmarks": [15000 - start]}}
@@ -0,0 +1,63 @@
+import os
+import re
+import stat
+
+import pytest
+
+from office_optimizer_metrics import LATENCY_BUCKETS, PROMETHEUS_PREFIX, MetricsCollector
+
+SAMPLE = re.compile(r'^[a-z_]+(\{[a-z_]+="[^"]*"(,[a-z_]+="[^"]*")*\})? (\S+)$')
+
+
+def _collector(tmp_path):
+    collector = MetricsCollector(prometheus_path=str(tmp_path / "optimizer.prom"))
+    source = tmp_path / "deck.pptx"
+    source.write_bytes(b"x" * 1000)
+    record = collector.start_file(str(source))
+    record.record_part("image", 800, 300, 0.02, 0.01)
+    record.record_part("xml", 200, 200, 0.001, 0.001)
+    record.record_dropped("image", 50)
+    collector.add_stage("plan", 0.5)
+    collector.finish_file(record, True, str(source))
+    return collector
+
+
+def test_prometheus_text_format(tmp_path):
+    text = _collector(tmp_path).prometheus_text()
+    lines = text.splitlines()
+    assert text.endswith("\n")
+    
+    declared = set()
+    for line in lines:
+        if line.startswith("# HELP ") or line.startswith("# TYPE "):
+            name = line.split()[2]
+            assert name.startswith(PROMETHEUS_PREFIX + "_")
+            if line.startswith("# TYPE "):
+                assert line.split()[3] in ("counter", "histogram")
+                declared.add(name)
+            continue
+        match = SAMPLE.match(line)
+        assert match, line
+        float(match.group(3))
+        name = line.split("{")[0].split()[0]
+        assert name in declared or re.sub(r"_(bucket|sum|count)$", "", name) in declared, line
+    
+    assert f'{PROMETHEUS_PREFIX}_files_total{{status="ok"}} 1' in lines
+    assert f'{PROMETHEUS_PREFIX}_parts_total{{type="image"}} 1' in lines
+    assert f'{PROMETHEUS_PREFIX}_parts_dropped_total{{type="image"}} 1' in lines
+    assert f'{PROMETHEUS_PREFIX}_part_input_bytes_total{{type="image"}} 850' in lines
+    # Cumulative histogram, ending in +Inf with the total count
+    buckets = [line for line in lines if line.startswith(f'{PROMETHEUS_PREFIX}_part_latency_seconds_bucket{{type="image"')]
+    counts = [int(line.rsplit(" ", 1)[1]) for line in buckets]
+    assert len(buckets) == len(LATENCY_BUCKETS) + 1 and 'le="+Inf"' in buckets[-1]
+    assert counts == sorted(counts) and counts[-1] == 1
+
+
+@pytest.mark.skipif(os.name == "nt", reason="POSIX permissions")
+def test_prometheus_file_is_world_readable(tmp_path):
+    collector = _collector(tmp_path)
+    collector.close()
+    path = tmp_path / "optimizer.prom"
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o644
+    assert path.read_text(encoding="utf-8") == collector.prometheus_text()
+    assert [name for name in os.listdir(tmp_path) if name.endswith(".tmp")] == []
@@ -0,0 +1,175 @@
+import io
+import zipfile
+
+import pytest
+
+import office_optimizer_opc as opc
+from office_optimizer_core import OfficeCompressor
+
+P = "http://schemas.openxmlformats.org/presentationml/2006/main"
+R = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+XML = '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+
+
+def _png(colour):
+    from PIL import Image
+    buffer = io.BytesIO()
+    Image.new('RGB', (4, 4), colour).save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+def _compress(path, tmp_path, **options):
+    output = tmp_path / ("out-" + path.name)
+    with OfficeCompressor(enable_backup=False, workers=1, **options) as engine:
+        assert engine.compress(str(path), str(output))
+    return zipfile.ZipFile(output)
+
+
+def _assert_consistent(out_zip):
+    """Every kept part is reachable, and relationships and overrides point at kept parts"""
+    names = out_zip.namelist()
+    keys = {opc.part_key(name).lower() for name in names}
+    assert out_zip.testzip() is None
+    assert opc.unreachable_parts(names, out_zip.read) == []
+    for name in names:
+        if not opc.is_rels(name):
+            continue
+        source = opc.source_part_for_rels(name)
+        for rel in opc.parse_rels(out_zip.read(name)):
+            if rel.get("TargetMode") != "External":
+                assert opc.resolve_target(source, rel["Target"].split("#")[0]).lower() in keys, (name, rel)
+    overrides = opc._OVERRIDE_RE.findall(out_zip.read(opc.CONTENT_TYPES).decode("utf-8"))
+    for tag in overrides:
+        assert opc.part_key(opc._attributes(tag)["PartName"]).lower() in keys, tag
+
+
+def _pptx(write_package):
+    rels = write_package.rels
+    parts = {
+        "[Content_Types].xml": write_package.content_types(
+            "ppt/presentation.xml", "ppt/slides/slide1.xml", "ppt/slides/slide2.xml",
+            "ppt/slideLayouts/slideLayout1.xml", "ppt/slideMasters/slideMaster1.xml", "docProps/core.xml"),
+        "_rels/.rels": rels(("rId1", "officeDocument", "ppt/presentation.xml"),
+                            ("rId2", "metadata/core-properties", "/docProps/core.xml")),
+        "docProps/core.xml": XML + "<coreProperties/>",
+        "ppt/presentation.xml": (XML + f'<p:presentation xmlns:p="{P}" xmlns:r="{R}">'
+                                 '<p:sldMasterIdLst><p:sldMasterId id="2147483648" r:id="rId1"/></p:sldMasterIdLst>'
+                                 '<p:sldIdLst><p:sldId id="256" r:id="rId2"/></p:sldIdLst></p:presentation>'),
+        "ppt/_rels/presentation.xml.rels": rels(("rId1", "slideMaster", "slideMasters/slideMaster1.xml"),
+                                                ("rId2", "slide", "slides/slide1.xml")),
+        "ppt/slides/slide1.xml": XML + f'<p:sld xmlns:p="{P}"/>',
+        "ppt/slides/_rels/slide1.xml.rels": rels(
+            ("rId1", "slideLayout", "../slideLayouts/slideLayout1.xml"),
+            # Percent-encoded and differently cased targets still name zip entries
+            ("rId2", "image", "../media/image%201.png"),
+            ("rId3", "image", "../media/IMAGE2.png"),
+            ("rId4", "hyperlink", "https://example.com/image4.png", "External"),
+            # A linked (external) file does not keep a same-named part alive
+            ("rId5", "image", "../media/linked.png", "External"),
+            ("rId6", "slide", "slide1.xml#bookmark")),
+        "ppt/slideLayouts/slideLayout1.xml": XML + f'<p:sldLayout xmlns:p="{P}"/>',
+        "ppt/slideLayouts/_rels/slideLayout1.xml.rels": rels(
+            ("rId1", "slideMaster", "../slideMasters/slideMaster1.xml")),
+        "ppt/slideMasters/slideMaster1.xml": (XML + f'<p:sldMaster xmlns:p="{P}" xmlns:r="{R}"><p:sldLayoutIdLst>'
+                                              '<p:sldLayoutId id="2147483649" r:id="rId1"/></p:sldLayoutIdLst>'
+                                              '</p:sldMaster>'),
+        "ppt/slideMasters/_rels/slideMaster1.xml.rels": rels(
+            ("rId1", "slideLayout", "../slideLayouts/slideLayout1.xml")),
+        "ppt/media/image 1.png": _png("red"),
+        "ppt/media/image2.png": _png("green"),
+        "ppt/media/linked.png": _png("blue"),
+        # A slide no longer in the presentation, and media only it uses
+        "ppt/slides/slide2.xml": XML + f'<p:sld xmlns:p="{P}"/>',
+        "ppt/slides/_rels/slide2.xml.rels": rels(("rId1", "image", "../media/image3.png")),
+        "ppt/media/image3.png": _png("yellow"),
+        "ppt/media/unused.png": _png("white"),
+    }
+    return write_package("deck.pptx", parts)
+
+
+def test_orphans_are_removed_from_a_presentation(write_package, tmp_path):
+    source = _pptx(write_package)
+    with _compress(source, tmp_path) as out_zip, zipfile.ZipFile(source) as in_zip:
+        removed = set(in_zip.namelist()) - set(out_zip.namelist())
+        assert removed == {"ppt/slides/slide2.xml", "ppt/slides/_rels/slide2.xml.rels", "ppt/media/image3.png",
+                           "ppt/media/unused.png", "ppt/media/linked.png"}
+        assert "/ppt/slides/slide2.xml" not in out_zip.read(opc.CONTENT_TYPES).decode("utf-8")
+        assert out_zip.read("ppt/slides/_rels/slide1.xml.rels") == in_zip.read("ppt/slides/_rels/slide1.xml.rels")
+        _assert_consistent(out_zip)
+
+
+def test_orphans_are_removed_from_a_word_document(write_package, tmp_path):
+    rels = write_package.rels
+    source = write_package("report.docx", {
+        "[Content_Types].xml": write_package.content_types(
+            "word/document.xml", "word/styles.xml", "word/header1.xml", "word/header2.xml", "customXml/item1.xml"),
+        "_rels/.rels": rels(("rId1", "officeDocument", "word/document.xml"),
+                            ("rId2", "extended-properties", "docProps/app.xml")),
+        "docProps/app.xml": XML + "<Properties/>",
+        "word/document.xml": XML + "<w:document/>",
+        "word/_rels/document.xml.rels": rels(
+            ("rId1", "styles", "styles.xml"), ("rId2", "header", "header1.xml"),
+            ("rId3", "image", "media/image1.png"), ("rId4", "customXml", "../customXml/item1.xml"),
+            ("rId5", "hyperlink", "http://example.com/", "External")),
+        "word/styles.xml": XML + "<w:styles/>",
+        "word/header1.xml": XML + "<w:hdr/>",
+        "word/_rels/header1.xml.rels": rels(("rId1", "image", "media/image2.png")),
+        "word/media/image1.png": _png("red"),
+        "word/media/image2.png": _png("green"),
+        "customXml/item1.xml": XML + "<item/>",
+        # A header that was unlinked when its section was deleted
+        "word/header2.xml": XML + "<w:hdr/>",
+        "word/_rels/header2.xml.rels": rels(("rId1", "image", "media/image3.png")),
+        "word/media/image3.png": _png("blue"),
+    })
+    with _compress(source, tmp_path) as out_zip, zipfile.ZipFile(source) as in_zip:
+        removed = set(in_zip.namelist()) - set(out_zip.namelist())
+        assert removed == {"word/header2.xml", "word/_rels/header2.xml.rels", "word/media/image3.png"}
+        _assert_consistent(out_zip)
+
+
+def test_orphans_are_removed_from_a_workbook(write_package, tmp_path):
+    rels = write_package.rels
+    source = write_package("book.xlsx", {
+        "[Content_Types].xml": write_package.content_types(
+            "xl/workbook.xml", "xl/worksheets/sheet1.xml", "xl/worksheets/sheet2.xml", "xl/sharedStrings.xml",
+            "xl/drawings/drawing1.xml", "xl/drawings/drawing2.xml"),
+        "_rels/.rels": rels(("rId1", "officeDocument", "xl/workbook.xml")),
+        "xl/workbook.xml": XML + "<workbook/>",
+        # Absolute targets are resolved from the package root
+        "xl/_rels/workbook.xml.rels": rels(("rId1", "worksheet", "/xl/worksheets/sheet1.xml"),
+                                           ("rId2", "sharedStrings", "sharedStrings.xml")),
+        "xl/sharedStrings.xml": XML + "<sst/>",
+        "xl/worksheets/sheet1.xml": XML + "<worksheet/>",
+        "xl/worksheets/_rels/sheet1.xml.rels": rels(("rId1", "drawing", "../drawings/drawing1.xml")),
+        "xl/drawings/drawing1.xml": XML + "<xdr:wsDr/>",
+        "xl/drawings/_rels/drawing1.xml.rels": rels(("rId1", "image", "../media/image1.png")),
+        "xl/media/image1.png": _png("red"),
+        # A deleted sheet with its drawing and picture
+        "xl/worksheets/sheet2.xml": XML + "<worksheet/>",
+        "xl/worksheets/_rels/sheet2.xml.rels": rels(("rId1", "drawing", "../drawings/drawing2.xml")),
+        "xl/drawings/drawing2.xml": XML + "<xdr:wsDr/>",
+        "xl/drawings/_rels/drawing2.xml.rels": rels(("rId1", "image", "../media/image2.png")),
+        "xl/media/image2.png": _png("green"),
+    })
+    with _compress(source, tmp_path) as out_zip, zipfile.ZipFile(source) as in_zip:
+        removed = set(in_zip.namelist()) - set(out_zip.namelist())
+        assert removed == {"xl/worksheets/sheet2.xml", "xl/worksheets/_rels/sheet2.xml.rels",
+                           "xl/drawings/drawing2.xml", "xl/drawings/_rels/drawing2.xml.rels",
+                           "xl/media/image2.png"}
+        _assert_consistent(out_zip)
+
+
+def test_nothing_is_removed_when_pruning_is_off(write_package, tmp_path):
+    source = _pptx(write_package)
+    with _compress(source, tmp_path, prune_orphans=False) as out_zip, zipfile.ZipFile(source) as in_zip:
+        assert set(out_zip.namelist()) == set(in_zip.namelist())
+        assert out_zip.read(opc.CONTENT_TYPES) == in_zip.read(opc.CONTENT_TYPES)
+
+
+@pytest.mark.parametrize("names", [
+    ["word/document.xml", "word/media/image1.png"],
+    ["mimetype", "content.xml"],
+], ids=["no-root-rels", "not-opc"])
+def test_archives_without_root_relationships_keep_everything(names):
+    assert opc.unreachable_parts(names, lambda name: b"") == []
@@ -0,0 +1,85 @@
+import io
+
+import pytest
+from PIL import Image
+
+from office_optimizer_core import _has_actual_transparency
+
+
+def _png(img, **params):
+    """img as it comes back from a PNG part, tRNS chunk included"""
+    buffer = io.BytesIO()
+    img.save(buffer, format='PNG', **params)
+    buffer.seek(0)
+    reopened = Image.open(buffer)
+    reopened.load()
+    return reopened
+
+
+def _palette(indices, size=(64, 64)):
+    img = Image.new('P', size, 0)
+    img.putpalette([value for index in range(256) for value in (index, 255 - index, 128)])
+    for position, index in indices.items():
+        img.putpixel(position, index)
+    return img
+
+
+def test_rgba_with_a_single_transparent_pixel():
+    img = Image.new('RGBA', (1500, 1000), (200, 30, 30, 255))
+    # One pixel in a large image: a sampled check would almost always miss it
+    img.putpixel((1237, 811), (200, 30, 30, 0))
+    assert _has_actual_transparency(_png(img))
+
+
+@pytest.mark.parametrize("alpha", [255, 250], ids=["opaque", "near-opaque"])
+def test_opaque_rgba(alpha):
+    img = Image.new('RGBA', (400, 300), (10, 120, 240, alpha))
+    assert not _has_actual_transparency(_png(img))
+
+
+@pytest.mark.parametrize("alpha, expected", [(0, True), (249, True), (255, False)])
+def test_la(alpha, expected):
+    img = Image.new('LA', (300, 200), (90, 255))
+    img.putpixel((299, 199), (90, alpha))
+    reopened = _png(img)
+    assert reopened.mode == 'LA'
+    assert _has_actual_transparency(reopened) is expected
+
+
+def test_palette_trns_with_alpha_per_entry():
+    img = _palette({(5, 5): 7})
+    reopened = _png(img, transparency=bytes([255] * 7 + [40] + [255] * 248))
+    assert isinstance(reopened.info['transparency'], bytes)
+    assert _has_actual_transparency(reopened)
+
+
+def test_palette_trns_entry_no_pixel_uses():
+    # tRNS makes entry 7 transparent, but the image never uses it
+    img = _palette({(5, 5): 3})
+    reopened = _png(img, transparency=bytes([255] * 7 + [0]))
+    assert 'transparency' in reopened.info
+    assert not _has_actual_transparency(reopened)
+
+
+@pytest.mark.parametrize("used", [True, False], ids=["used", "unused"])
+def test_palette_single_transparent_index(used):
+    img = _palette({(63, 0): 9 if used else 8})
+    assert _has_actual_transparency(_png(img, transparency=9)) is used
+
+
+@pytest.mark.parametrize("used", [True, False], ids=["used", "unused"])
+def test_color_keys(used):
+    grey = Image.new('L', (50, 50), 100)
+    rgb = Image.new('RGB', (50, 50), (1, 2, 3))
+    if used:
+        grey.putpixel((49, 49), 17)
+        rgb.putpixel((0, 49), (4, 5, 6))
+    assert _has_actual_transparency(_png(grey, transparency=17)) is used
+    # (4, 5, 9) shares two bands with the key but is not transparent
+    rgb.putpixel((10, 10), (4, 5, 9))
+    assert _has_actual_transparency(_png(rgb, transparency=(4, 5, 6))) is used
+
+
+def test_images_without_alpha_or_trns():
+    assert not _has_actual_transparency(Image.new('RGB', (20, 20), (0, 0, 0)))
+    assert not _has_actual_transparency(_palette({}))
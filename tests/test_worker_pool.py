@@ -0,0 +1,48 @@
+import concurrent.futures
+import zipfile
+from concurrent.futures.process import BrokenProcessPool
+
+from office_optimizer_core import OfficeCompressor, _PackagePlan
+
+
+class _BrokenPool:
+    def __init__(self):
+        self.shut_down = False
+    
+    def submit(self, *args):
+        raise BrokenProcessPool("a worker died")
+    
+    def shutdown(self, wait=True):
+        self.shut_down = True
+
+
+def test_broken_pool_is_replaced_and_the_part_encoded_in_process(make_docx):
+    engine = OfficeCompressor(enable_backup=False, workers=2)
+    broken = _BrokenPool()
+    engine._pool = broken
+    plan = _PackagePlan()
+    plan.pool = broken
+    
+    future = concurrent.futures.Future()
+    future.set_exception(BrokenProcessPool("a worker died"))
+    with zipfile.ZipFile(make_docx()) as in_zip:
+        item = in_zip.getinfo("word/media/image1.jpeg")
+        optimized, notes, timings = engine._collect_image(item, future, in_zip, plan=plan)
+    
+    assert optimized is not None and len(optimized) < item.file_size
+    assert broken.shut_down
+    assert engine._pool is None
+    engine.close()
+
+
+def test_broken_pool_on_submit_falls_back_in_process(make_docx):
+    engine = OfficeCompressor(enable_backup=False, workers=2)
+    broken = _BrokenPool()
+    engine._pool = broken
+    
+    with zipfile.ZipFile(make_docx()) as in_zip:
+        future, _ = engine._submit_image(in_zip.getinfo("word/media/image1.jpeg"), in_zip, broken)
+        assert future.result()[0] is not None
+    assert broken.shut_down
+    assert engine._pool is None
+    engine.close()